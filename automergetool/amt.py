@@ -1,41 +1,102 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import marshal
 import os
 import sys
-from argparse import ArgumentParser, Namespace
-from configparser import RawConfigParser
-from typing import Optional
+from types import SimpleNamespace
+from typing import Dict, Optional, List, Tuple
 
 from automergetool.amt_analyser import ConflictedFileAnalyser
-from automergetool.amt_launcher import ToolsLauncher
+from automergetool.amt_git import GitRepository, UnmergedFile, STAGE_BASE, STAGE_LOCAL, STAGE_REMOTE
+from automergetool.amt_launcher import ToolsLauncher, ToolSettings, PlannedTool, CURRENT_DIR, DOCUMENT_SOLVERS, \
+    SECT_TOOL_PREFIX
 from automergetool.amt_utils import SUCCESS, ERROR_CONFLICTS, ERROR_EXTENSION, ERROR_INVOCATION, ERROR_NO_TOOL, \
-    ERROR_UNKNOWN
+    ERROR_UNKNOWN, CacheSession, ConflictDocument, ResolutionsMemo
 
 # CONSTANTS
 GLOBAL_CONFIG = os.path.expanduser('~/.gitconfig')
 LOCAL_CONFIG_NAME = 'config'
+CONFIG_SNAPSHOT_PATH = os.path.join('amt', 'config.snapshot')
+# the known tools settings, resolved in the snapshot, are defined there
+LAUNCHER_SOURCE = os.path.join(CURRENT_DIR, 'amt_launcher.py')
 
 SECT_AMT = 'amt'
 OPT_TOOLS = 'tools'
 OPT_VERBOSE = 'verbose'
 OPT_KEEP_REPORTS = 'keepReport'
+OPT_RACE_TOOLS = 'raceTools'
 
+CMD_CENSUS = 'census'
 
-def parse_arguments(args: list) -> Namespace:
+DAEMON_IDLE_TIMEOUT = 600
+
+FILE_OPTIONS = {
+    '-b': 'base', '--base': 'base',
+    '-l': 'local', '--local': 'local',
+    '-r': 'remote', '--remote': 'remote',
+    '-m': 'merged', '--merged': 'merged'
+}
+
+
+def parse_merge_arguments(args: list) -> Optional[SimpleNamespace]:
+    """
+    Parses the usual invocation from git mergetool, with only the base, local, remote and merged file names, without
+    argparse which is slow to import
+    returns None for any other invocation, to be parsed by parse_arguments()
+    """
+    if len(args) != 2 * len(set(FILE_OPTIONS.values())):
+        return None
+    files = {}
+    for (option, value) in zip(args[0::2], args[1::2]):
+        if option not in FILE_OPTIONS:
+            return None
+        files[FILE_OPTIONS[option]] = os.path.abspath(value)
+    if len(files) != len(set(FILE_OPTIONS.values())):
+        return None
+    return SimpleNamespace(all=False, subprocess=False, daemon=False, idle_timeout=DAEMON_IDLE_TIMEOUT, jobs=1,
+                           **files)
+
+
+def parse_arguments(args: list) -> 'Namespace':
     """
     Parses the arguments passed on invocation in a dict and return it
     """
+    # imported here as argparse is slow to import, and the usual invocation is parsed by parse_merge_arguments()
+    from argparse import ArgumentParser
     parser = ArgumentParser(description="A tool to combine multiple merge tools")
 
-    parser.add_argument('-b', '--base', required=True)
-    parser.add_argument('-l', '--local', required=True)
-    parser.add_argument('-r', '--remote', required=True)
-    parser.add_argument('-m', '--merged', required=True)
+    parser.add_argument('-b', '--base', required=False)
+    parser.add_argument('-l', '--local', required=False)
+    parser.add_argument('-r', '--remote', required=False)
+    parser.add_argument('-m', '--merged', required=False)
+    parser.add_argument(
+        '-a', '--all', required=False, action='store_true',
+        help="merge all the unmerged files of the current git repository, instead of the given files")
+    parser.add_argument(
+        '--subprocess', required=False, action='store_true', help="run the AMT solvers in their own process")
+    parser.add_argument(
+        '--daemon', required=False, action='store_true',
+        help="serve the merge requests of amt-client for the current git repository, instead of the given files")
+    parser.add_argument(
+        '--idle-timeout', required=False, type=float, default=DAEMON_IDLE_TIMEOUT,
+        help="with --daemon, the time (in seconds) without request after which the daemon stops")
+    parser.add_argument(
+        '-j', '--jobs', required=False, type=int, default=1,
+        help="with --all, the number of files merged in parallel (0 for one per CPU)")
 
-    # convert to absolute path
     parsed_arg = parser.parse_args(args)
+    if parsed_arg.jobs < 0:
+        parser.error("the number of jobs can't be negative")
+    if parsed_arg.all or parsed_arg.daemon:
+        return parsed_arg
+
+    files = [('base', '-b/--base'), ('local', '-l/--local'), ('remote', '-r/--remote'), ('merged', '-m/--merged')]
+    missing = [option for (name, option) in files if getattr(parsed_arg, name) is None]
+    if len(missing) > 0:
+        parser.error("the following arguments are required: " + ", ".join(missing))
 
+    # convert to absolute path
     parsed_arg.base = os.path.abspath(parsed_arg.base)
     parsed_arg.local = os.path.abspath(parsed_arg.local)
     parsed_arg.remote = os.path.abspath(parsed_arg.remote)
@@ -43,29 +104,43 @@ def parse_arguments(args: list) -> Namespace:
     return parsed_arg
 
 
+def parse_census_arguments(args: list) -> 'Namespace':
+    """
+    Parses the arguments passed to the census command in a dict and return it
+    """
+    from argparse import ArgumentParser
+    parser = ArgumentParser(prog="amt " + CMD_CENSUS, description="Lists the conflicts remaining in files")
+
+    parser.add_argument('files', nargs='+', metavar='file')
+
+    return parser.parse_args(args)
+
+
 def find_local_config_path(config_file: str) -> Optional[str]:
     """
     Finds the nearest parent directory where there is a .git folder
     """
-    parent = os.path.dirname(config_file)
-    if parent == config_file:
-        return None
-
-    git = os.path.join(parent, ".git")
-    if os.path.exists(git):
-        path = os.path.join(git, LOCAL_CONFIG_NAME)
-        if os.path.exists(path):
-            return path
-        else:
+    path = config_file
+    while True:
+        parent = os.path.dirname(path)
+        if parent == path:
             return None
-    else:
-        return find_local_config_path(parent)
 
+        git = os.path.join(parent, ".git")
+        if os.path.exists(git):
+            config_path = os.path.join(git, LOCAL_CONFIG_NAME)
+            if os.path.exists(config_path):
+                return config_path
+            else:
+                return None
+        path = parent
 
-def read_config(config_path: str) -> RawConfigParser:
+
+def read_config(config_path: str) -> 'RawConfigParser':
     """
     Reads the AMT configuration from the given path
     """
+    from configparser import RawConfigParser
     config = RawConfigParser()
     config.optionxform = str
     config.read_file(open(GLOBAL_CONFIG))
@@ -75,8 +150,82 @@ def read_config(config_path: str) -> RawConfigParser:
     return config
 
 
+def load_config(config_path: Optional[str]) -> Tuple['RawConfigParser', ToolsLauncher]:
+    """
+    Reads the AMT configuration from the given path, and prepares the tools launcher with the settings of the tools
+    chain. For a repository's configuration, both are saved in a snapshot in its .git/amt folder, which is reused
+    while the configuration files are unchanged. The snapshot uses the marshal format, as pickle and json are slower
+    to import than the configuration is to read.
+    config_path -- the repository's configuration file (.git/config), or None
+    """
+    if config_path is None:
+        config = read_config(None)
+        return config, ToolsLauncher(config)
+
+    snapshot_path = os.path.join(os.path.dirname(config_path), CONFIG_SNAPSHOT_PATH)
+    key = config_snapshot_key(config_path)
+    try:
+        with open(snapshot_path, 'rb') as snapshot_file:
+            snapshot = marshal.load(snapshot_file)
+        if snapshot['key'] == key:
+            from configparser import RawConfigParser
+            config = RawConfigParser()
+            config.optionxform = str
+            config.read_dict(snapshot['config'])
+            tools = {tool: ToolSettings(*settings) for (tool, settings) in snapshot['tools'].items()}
+            return config, ToolsLauncher(config, tools)
+    except (OSError, EOFError, KeyError, TypeError, ValueError):
+        # missing or unreadable snapshot, the configuration is read again
+        pass
+
+    config = read_config(config_path)
+    launcher = ToolsLauncher(config)
+    tools = {}
+    if config.has_option(SECT_AMT, OPT_TOOLS):
+        for tool in config.get(SECT_AMT, OPT_TOOLS).split(';'):
+            try:
+                settings = launcher.get_tool_settings(tool)
+                tools[tool] = (settings.cmd, settings.trust, settings.extensions, settings.ignored_extensions,
+                               settings.interactive)
+            except ValueError:
+                # invalid setting, reported when the tool is reached
+                pass
+
+    # only the sections amt reads are kept, the rest of the configuration (eg: credentials) isn't copied around
+    snapshot = {'key': key,
+                'config': {section: dict(config.items(section, raw=True)) for section in config.sections()
+                           if section == SECT_AMT or section.startswith(SECT_TOOL_PREFIX)},
+                'tools': tools}
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        # written aside then renamed, as other amt processes may read it meanwhile
+        temp_path = "{0}.{1}".format(snapshot_path, os.getpid())
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as snapshot_file:
+            marshal.dump(snapshot, snapshot_file)
+        os.replace(temp_path, snapshot_path)
+    except OSError:
+        pass
+    return config, launcher
+
+
+def config_snapshot_key(config_path: str) -> tuple:
+    """
+    returns what a configuration snapshot depends on : the configuration files and their modification time, the
+    interpreter and location of AMT which appear in the solvers commands, and the known tools settings (which change
+    when AMT is upgraded in place)
+    """
+    sources = []
+    for path in [GLOBAL_CONFIG, config_path, LAUNCHER_SOURCE]:
+        try:
+            stat = os.stat(path)
+            sources.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            sources.append((path, None, None))
+    return (sys.executable, marshal.version, CURRENT_DIR) + tuple(sources)
+
+
 # noinspection PyUnresolvedReferences
-def expand_arguments(cmd: str, args: Namespace) -> str:
+def expand_arguments(cmd: str, args: 'Namespace') -> str:
     """
     Expands the named arguments in the command line invocation
     cmd -- the command line invocation
@@ -89,15 +238,81 @@ def expand_arguments(cmd: str, args: Namespace) -> str:
     return cmd
 
 
-def merge(config: RawConfigParser,
-          args: Namespace,
+def file_extension(path: str) -> str:
+    """
+    Get the extension of the given file, without the dot (eg: file_extension("foo/bar.java") → "java")
+    """
+    return os.path.splitext(path)[1][1:]
+
+
+class MergedFile:
+    """
+    The merged file along the tools chain : the AMT solvers run in-process share an in-memory document, which is only
+    written when a tool needs the actual file, and at the end of the chain
+    """
+
+    def __init__(self, path: str, memo: Optional[ResolutionsMemo] = None,
+                 preloaded: Optional[ConflictDocument] = None, cache_session: Optional[CacheSession] = None):
+        """
+        :param path: the path of the merged file
+        :param memo: if set, the outcomes of the conflicts met in other files, shared with the in-process solvers
+        :param preloaded: the document already read from the file, used on first use while the file is unchanged
+        :param cache_session: if set, the resolution cache shared with the in-process solvers
+        """
+        self.path = path
+        self.memo = memo
+        self.cache_session = cache_session
+        self.document = None  # type: Optional[ConflictDocument]
+        self.preloaded = preloaded
+
+    def load(self) -> ConflictDocument:
+        """
+        :return: the in-memory document, read from the file on first use
+        """
+        if self.document is None:
+            if self.preloaded is not None:
+                self.document = self.preloaded
+                self.document.memo = self.memo
+                self.preloaded = None
+            else:
+                self.document = ConflictDocument.load(self.path, self.memo)
+            self.document.cache_session = self.cache_session
+        return self.document
+
+    def save(self):
+        """
+        Writes the in-memory document to the file, which becomes the reference again
+        """
+        # the file is about to be handled by a tool, a document read before wouldn't match it anymore
+        self.preloaded = None
+        if self.document is not None:
+            self.document.save(self.path)
+            self.document = None
+
+    def has_remaining_conflicts(self, analyser: ConflictedFileAnalyser) -> bool:
+        if self.document is not None:
+            return self.document.has_conflicts()
+        return analyser.has_remaining_conflicts(self.path)
+
+
+def merge(config: 'RawConfigParser',
+          args: 'Namespace',
           launcher: ToolsLauncher,
-          analyser: ConflictedFileAnalyser) -> int:
+          analyser: ConflictedFileAnalyser,
+          in_process: bool = True,
+          memo: Optional[ResolutionsMemo] = None,
+          document: Optional[ConflictDocument] = None,
+          cache_session: Optional[CacheSession] = None) -> int:
     """
     Handle the merge tools chain for the given argument
     config -- the current amt configuration
     args -- the arguments with the base, local, remote and merged file names
     launcher -- the launcher helper
+    in_process -- whether the AMT solvers can run in the current process
+    memo -- if set, the in-process solvers reuse the outcomes of identical conflicts met before
+    document -- if set, the merged file already read, for the in-process solvers
+    cache_session -- if set, the resolution cache shared by the in-process solvers of a run (otherwise they share one
+    for this file only)
     """
     if not (config.has_option(SECT_AMT, OPT_TOOLS)):
         raise RuntimeError('Missing the {0}.{1} configuration'.format(SECT_AMT, OPT_TOOLS))
@@ -105,24 +320,153 @@ def merge(config: RawConfigParser,
     tools = config.get(SECT_AMT, OPT_TOOLS).split(';')
     merge_result = ERROR_NO_TOOL
 
-    for tool in tools:
-        merge_result = merge_with_tool(tool, config, args, launcher, analyser)
-        if merge_result == 0:
-            return 0
+    # noinspection PyUnresolvedReferences
+    plan = launcher.get_plan(tools, file_extension(args.merged))
+    race_size = 0
+    if config.has_option(SECT_AMT, OPT_RACE_TOOLS):
+        race_size = config.getint(SECT_AMT, OPT_RACE_TOOLS)
+    raced = race_length(plan, race_size)
+
+    own_session = cache_session is None
+    if own_session:
+        cache_session = CacheSession()
+    # noinspection PyUnresolvedReferences
+    merged_file = MergedFile(args.merged, memo, document if raced == 0 else None, cache_session)
+    try:
+        if raced > 0:
+            merge_result = race_tools(config, args, launcher, analyser, plan[:raced])
+            if merge_result == 0:
+                return 0
+        for planned in plan[raced:]:
+            merge_result = merge_with_tool(planned.tool, config, args, launcher, analyser, merged_file, in_process,
+                                           planned)
+            if merge_result == 0:
+                return 0
+    finally:
+        merged_file.save()
+        if own_session:
+            cache_session.close()
 
     print(" [AMT] ⚑ Sorry, it seems we can't solve it this time")
 
     return merge_result
 
 
+def race_length(plan: List[PlannedTool], race_size: int) -> int:
+    """
+    Count the leading tools of the plan which can run concurrently : up to race_size non-interactive tools, until an
+    interactive one (the skipped tools in between are counted too)
+    returns 0 if less than two tools would actually run
+    """
+    length = 0
+    racers = 0
+    for planned in plan:
+        if racers == race_size:
+            break
+        if planned.is_runnable():
+            if planned.interactive:
+                break
+            racers += 1
+        length += 1
+    return length if racers > 1 else 0
+
+
+def race_tools(config: 'RawConfigParser',
+               args: 'Namespace',
+               launcher: ToolsLauncher,
+               analyser: ConflictedFileAnalyser,
+               plan: List[PlannedTool]) -> int:
+    """
+    Run the tools of the plan concurrently, each one on its own copy of the merged file. The copy of the first tool of
+    the chain which solves all the conflicts replaces the merged file, and the tools still running are stopped.
+    plan -- the non-interactive tools to run, in the chain's order (cf race_length())
+    returns SUCCESS if one of the tools merged the file, the error of the last one otherwise
+    """
+    verbose = False
+    if config.has_option(SECT_AMT, OPT_VERBOSE):
+        verbose = config.getboolean(SECT_AMT, OPT_VERBOSE)
+
+    merge_result = ERROR_NO_TOOL
+    racers = []
+    for planned in plan:
+        if planned.is_runnable():
+            racers.append(planned)
+        else:
+            merge_result = merge_with_tool(planned.tool, config, args, launcher, analyser, None, False, planned)
+    if verbose:
+        print(" [AMT] ⇉ Racing tools {0}".format(", ".join(planned.tool for planned in racers)))
+
+    # noinspection PyUnresolvedReferences
+    with open(args.merged, 'rb') as merged:
+        content = merged.read()
+    # the copies keep the file extension, and are named after the merged file (eg: for their reports to be cleaned)
+    # noinspection PyUnresolvedReferences
+    copies = ["{0}.race{1}.{2}{3}".format(args.merged, index, os.getpid(), os.path.splitext(args.merged)[1])
+              for index in range(len(racers))]
+    processes = []
+    try:
+        for (planned, copy) in zip(racers, copies):
+            with open(copy, 'wb') as copy_file:
+                copy_file.write(content)
+            # noinspection PyUnresolvedReferences
+            cmd = expand_arguments(planned.cmd, SimpleNamespace(base=args.base, local=args.local, remote=args.remote,
+                                                                merged=copy))
+            try:
+                processes.append(launcher.start(cmd))
+            except Exception as err:
+                if verbose:
+                    print(" [AMT] ✗ {0} error running command {1}\n $ {2}".format(planned.tool, err, cmd))
+                processes.append(None)
+
+        # the tools are checked in the chain's order, as a tool's result only matters if the previous ones failed
+        for (planned, process, copy) in zip(racers, processes, copies):
+            if process is None:
+                merge_result = ERROR_INVOCATION
+                continue
+            merge_result = check_result(planned.tool, planned.trust, process.wait(), MergedFile(copy), analyser,
+                                        verbose)
+            if merge_result == SUCCESS:
+                with open(copy, 'rb') as copy_file:
+                    content = copy_file.read()
+                # noinspection PyUnresolvedReferences
+                with open(args.merged, 'wb') as merged:
+                    merged.write(content)
+                break
+    finally:
+        for (planned, process) in zip(racers, processes):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+                if verbose:
+                    print(" [AMT] — Stopped {0}".format(planned.tool))
+        for copy in copies:
+            if os.path.exists(copy):
+                os.remove(copy)
+    return merge_result
+
+
 def merge_with_tool(tool: str,
-                    config: RawConfigParser,
-                    args: Namespace,
+                    config: 'RawConfigParser',
+                    args: 'Namespace',
                     launcher: ToolsLauncher,
-                    analyser: ConflictedFileAnalyser) -> int:
+                    analyser: ConflictedFileAnalyser,
+                    merged_file: Optional[MergedFile] = None,
+                    in_process: bool = True,
+                    planned: Optional[PlannedTool] = None) -> int:
     """
     Run the given merge tool with the config and args
+    merged_file -- the merged file shared along the tools chain; when not set, the file is written before returning
+    in_process -- whether an AMT solver can run in the current process
+    planned -- the tool as planned for the merged file's extension (cf ToolsLauncher.get_plan()), planned if not set
     """
+    if merged_file is None:
+        # noinspection PyUnresolvedReferences
+        merged_file = MergedFile(args.merged)
+        try:
+            return merge_with_tool(tool, config, args, launcher, analyser, merged_file, in_process, planned)
+        finally:
+            merged_file.save()
+
     verbose = False
     if config.has_option(SECT_AMT, OPT_VERBOSE):
         verbose = config.getboolean(SECT_AMT, OPT_VERBOSE)
@@ -134,43 +478,57 @@ def merge_with_tool(tool: str,
         return ERROR_NO_TOOL
 
     # check file extension against tool preset / config
-    extensions = launcher.get_tool_extensions(tool)
-    ignored_extensions = launcher.get_tool_ignored_extensions(tool)
-    if extensions or ignored_extensions:
+    if planned is None:
         # noinspection PyUnresolvedReferences
-        file_name, file_ext = os.path.splitext(args.merged)
-        file_ext = file_ext[1:]
-        if (extensions is not None) and (file_ext not in extensions):
-            if verbose:
-                print(" [AMT] — Ignoring tool {0} (bad extension : {1})".format(tool, file_ext))
-            return ERROR_EXTENSION
-        if (ignored_extensions is not None) and (file_ext in ignored_extensions):
-            if verbose:
-                print(" [AMT] — Ignoring tool {0} (ignoring extension : {1})".format(tool,
-                                                                                     file_ext))
-            return ERROR_EXTENSION
+        planned = launcher.plan_tool(tool, file_extension(args.merged))
+    if planned.skip_reason is not None:
+        if verbose:
+            print(" [AMT] — Ignoring tool {0} ({1})".format(tool, planned.skip_reason))
+        return ERROR_EXTENSION
 
     # prepare the command line invocation
     if verbose:
         print(" [AMT] → Trying merge with {0}".format(tool))
-    cmd = launcher.get_tool_cmd(tool)
-    if cmd is None:
+    if planned.cmd is None:
         if verbose:
             print(" [AMT] — Ignoring tool {0} (unknown tool)".format(tool))
         return ERROR_UNKNOWN
 
-    # Run command
-    cmd = expand_arguments(cmd, args)
+    # Run command, or the AMT solver in-process
+    cmd = expand_arguments(planned.cmd, args)
+    solver_args = ToolsLauncher.get_solver_args(tool, cmd) if in_process else None
     try:
-        invocation_result = launcher.invoke(cmd)
+        if solver_args is None:
+            merged_file.save()
+            invocation_result = launcher.invoke(cmd)
+        elif tool in DOCUMENT_SOLVERS:
+            invocation_result = launcher.invoke_solver(tool, solver_args, merged_file.load())
+        else:
+            merged_file.save()
+            invocation_result = launcher.invoke_solver(tool, solver_args)
     except Exception as err:
+        if merged_file.document is not None:
+            merged_file.document.rollback()
         if verbose:
             print(" [AMT] ✗ {0} error running command {1}\n $ {2}".format(tool, err, cmd))
         return ERROR_INVOCATION
 
     # Check result
-    trust_exit_code = launcher.get_tool_trust(tool)
-    if trust_exit_code or invocation_result == ERROR_INVOCATION:
+    return check_result(tool, planned.trust, invocation_result, merged_file, analyser, verbose)
+
+
+def check_result(tool: str,
+                 trust: bool,
+                 invocation_result: int,
+                 merged_file: MergedFile,
+                 analyser: ConflictedFileAnalyser,
+                 verbose: bool) -> int:
+    """
+    Check whether the tool solved the conflicts of the merged file
+    trust -- whether the exit code of the tool can be trusted
+    invocation_result -- the exit code of the tool
+    """
+    if trust or invocation_result == ERROR_INVOCATION:
         if invocation_result == 0:
             if verbose:
                 print(" [AMT] ✓ {0} merged successfully".format(tool))
@@ -182,8 +540,7 @@ def merge_with_tool(tool: str,
     else:
         if verbose:
             print(" [AMT] ? {0} returned, but this should not be trusted".format(tool))
-        # noinspection PyUnresolvedReferences
-        has_remaining = analyser.has_remaining_conflicts(args.merged)
+        has_remaining = merged_file.has_remaining_conflicts(analyser)
         if has_remaining == 0:
             if verbose:
                 print(" [AMT] ✓ {0} merged successfully".format(tool))
@@ -194,7 +551,254 @@ def merge_with_tool(tool: str,
             return ERROR_CONFLICTS
 
 
-def clean_reports(config: RawConfigParser, merged_path: str):
+def merge_all(config: 'RawConfigParser',
+              repository: GitRepository,
+              launcher: ToolsLauncher,
+              analyser: ConflictedFileAnalyser,
+              in_process: bool = True,
+              jobs: int = 1) -> int:
+    """
+    Handle the merge tools chain for every unmerged file of the repository, then prints a summary
+    config -- the current amt configuration
+    repository -- the repository to merge
+    launcher -- the launcher helper
+    in_process -- whether the AMT solvers can run in the current process
+    jobs -- the number of files merged in parallel, each in its own worker process (0 for one per CPU)
+    returns SUCCESS if all the files were merged, ERROR_CONFLICTS otherwise
+    """
+    unmerged_files = repository.unmerged_files()
+    conflicts = [unmerged for unmerged in unmerged_files if unmerged.is_content_conflict()]
+    versions = write_versions(repository, conflicts)
+    try:
+        # files sharing identical conflicts are merged together, so that each solver handles those only once
+        documents = [read_document(args.merged) for args in versions]
+        groups, duplicates = group_identical_conflicts(documents)
+        if jobs == 1 or len(groups) < 2:
+            results, replayed = merge_group(config, versions, launcher, analyser, in_process, documents)
+        else:
+            # the workers aren't attached to the terminal : the files needing an interactive tool are merged here
+            serial_groups = [group for group in groups
+                             if any(runs_interactive_tool(config, launcher, versions[index].merged) for index in group)]
+            parallel_groups = [group for group in groups if group not in serial_groups]
+            results = [ERROR_UNKNOWN] * len(versions)
+            replayed = 0
+            # imported here as multiprocessing is slow to import, and most runs merge a single file
+            from concurrent.futures import ProcessPoolExecutor
+            # each worker gets distinct files, hence distinct merged, versions and report paths
+            with ProcessPoolExecutor(max_workers=jobs if jobs > 0 else None) as executor:
+                futures = [executor.submit(merge_group, config, [versions[index] for index in group], None, None,
+                                           in_process)
+                           for group in parallel_groups]
+                for (group, future) in zip(parallel_groups, futures):
+                    group_results, group_replayed = future.result()
+                    for (index, result) in zip(group, group_results):
+                        results[index] = result
+                    replayed += group_replayed
+            for group in serial_groups:
+                group_results, group_replayed = merge_group(config, [versions[index] for index in group], launcher,
+                                                            analyser, in_process, [documents[index] for index in group])
+                for (index, result) in zip(group, group_results):
+                    results[index] = result
+                replayed += group_replayed
+    finally:
+        for args in versions:
+            # noinspection PyUnresolvedReferences
+            for path in [args.base, args.local, args.remote]:
+                os.remove(path)
+
+    merge_results = dict(zip([unmerged.path for unmerged in conflicts], results))
+    summary = []
+    for unmerged in unmerged_files:
+        if unmerged.path not in merge_results:
+            summary.append((unmerged.path, ERROR_CONFLICTS, "deleted on one side"))
+        elif merge_results[unmerged.path] == SUCCESS:
+            summary.append((unmerged.path, SUCCESS, "merged"))
+        else:
+            summary.append((unmerged.path, merge_results[unmerged.path], "conflicts remaining"))
+
+    # the index is only updated from this process, git doesn't support concurrent writes to it
+    merged_paths = [path for (path, result, status) in summary if result == SUCCESS]
+    if len(merged_paths) > 0:
+        repository.add(*merged_paths)
+
+    for (path, result, status) in summary:
+        if result == SUCCESS:
+            print(" [AMT] ✓ {0} : {1}".format(path, status))
+        else:
+            print(" [AMT] ✗ {0} : {1}".format(path, status))
+    if duplicates > 0:
+        print(" [AMT] {0} duplicate conflict(s), {1} solver call(s) saved".format(duplicates, replayed))
+    print(" [AMT] {0}/{1} file(s) merged".format(len(merged_paths), len(summary)))
+
+    return SUCCESS if len(merged_paths) == len(summary) else ERROR_CONFLICTS
+
+
+def runs_interactive_tool(config: 'RawConfigParser', launcher: ToolsLauncher, merged_path: str) -> bool:
+    """
+    Check whether the merge tools chain of the given file runs a tool which may wait for the user
+    config -- the current amt configuration
+    launcher -- the launcher helper
+    merged_path -- the conflicted file
+    """
+    if not config.has_option(SECT_AMT, OPT_TOOLS):
+        return False
+    plan = launcher.get_plan(config.get(SECT_AMT, OPT_TOOLS).split(';'), file_extension(merged_path))
+    return any(planned.interactive and planned.is_runnable() for planned in plan)
+
+
+def read_document(path: str) -> Optional[ConflictDocument]:
+    """
+    returns the conflicted file read in memory, or None if it can't be read as text
+    """
+    try:
+        return ConflictDocument.load(path)
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def group_identical_conflicts(documents: List[Optional[ConflictDocument]]) -> Tuple[List[List[int]], int]:
+    """
+    Groups the files sharing identical conflicts (same raw text, markers included)
+    documents -- the conflicted files, read in memory (None for the unreadable ones)
+    returns the groups of file indices, in order, and the number of conflicts identical to one found before
+    """
+    first_files = {}  # type: Dict[int, int]
+    parents = list(range(len(documents)))
+    duplicates = 0
+    for (index, document) in enumerate(documents):
+        if document is None:
+            continue
+        for conflict in document.conflicts():
+            raw_hash = hash(conflict.raw)
+            if raw_hash in first_files:
+                duplicates += 1
+                parents[find_group(parents, index)] = find_group(parents, first_files[raw_hash])
+            else:
+                first_files[raw_hash] = index
+
+    groups = {}  # type: Dict[int, List[int]]
+    for index in range(len(documents)):
+        groups.setdefault(find_group(parents, index), []).append(index)
+    return sorted(groups.values()), duplicates
+
+
+def find_group(parents: List[int], index: int) -> int:
+    """
+    returns the index representing the group of the given one, in a disjoint-set forest
+    """
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def merge_group(config: 'RawConfigParser',
+                versions: List['Namespace'],
+                launcher: Optional[ToolsLauncher] = None,
+                analyser: Optional[ConflictedFileAnalyser] = None,
+                in_process: bool = True,
+                documents: Optional[List[Optional[ConflictDocument]]] = None) -> Tuple[List[int], int]:
+    """
+    Handle the merge tools chain for some unmerged files of the repository, sharing the outcomes of identical conflicts
+    config -- the current amt configuration
+    versions -- the arguments with the base, local, remote and merged file names, for each file
+    launcher -- the launcher helper (created from the configuration if None)
+    analyser -- the analyser helper (created if None)
+    in_process -- whether the AMT solvers can run in the current process
+    documents -- if set, the merged files already read, for each file (None for the files read when needed)
+    returns the merge result of each file, and the number of solver calls saved on identical conflicts
+    """
+    if launcher is None:
+        launcher = ToolsLauncher(config)
+    if analyser is None:
+        analyser = ConflictedFileAnalyser()
+
+    if documents is None:
+        documents = [None] * len(versions)
+
+    memo = ResolutionsMemo()
+    cache_session = CacheSession()
+    try:
+        results = [merge_unmerged_file(config, args, launcher, analyser, in_process, memo, document, cache_session)
+                   for (args, document) in zip(versions, documents)]
+    finally:
+        cache_session.close()
+    return results, memo.replayed
+
+
+def merge_unmerged_file(config: 'RawConfigParser',
+                        args: 'Namespace',
+                        launcher: ToolsLauncher,
+                        analyser: ConflictedFileAnalyser,
+                        in_process: bool = True,
+                        memo: Optional[ResolutionsMemo] = None,
+                        document: Optional[ConflictDocument] = None,
+                        cache_session: Optional[CacheSession] = None) -> int:
+    """
+    Handle the merge tools chain for a single unmerged file of the repository ; the file isn't staged
+    config -- the current amt configuration
+    args -- the arguments with the base, local, remote and merged file names
+    launcher -- the launcher helper
+    analyser -- the analyser helper
+    in_process -- whether the AMT solvers can run in the current process
+    memo -- if set, the in-process solvers reuse the outcomes of identical conflicts met before
+    document -- if set, the merged file already read, for the in-process solvers
+    cache_session -- if set, the resolution cache shared by the in-process solvers of a run
+    """
+    # noinspection PyUnresolvedReferences
+    merged_path = args.merged
+    print(" [AMT] * Merging {0}".format(merged_path))
+    try:
+        result = merge(config, args, launcher, analyser, in_process, memo, document, cache_session)
+    except Exception as err:
+        print(" [AMT] ✗ Error merging {0} : {1}".format(merged_path, err))
+        return ERROR_UNKNOWN
+
+    if result == SUCCESS:
+        clean_reports(config, merged_path)
+    return result
+
+
+def write_versions(repository: GitRepository, unmerged_files: List[UnmergedFile]) -> List[SimpleNamespace]:
+    """
+    Writes the base, local and remote versions of the unmerged files next to them, named like git mergetool does
+    (eg: foo_BASE_1234.ext), an empty base being written for files added on both sides. All the blobs are read
+    through a single git process.
+    returns the arguments with the base, local, remote and merged file names, for each file
+    """
+    stages = [('base', STAGE_BASE), ('local', STAGE_LOCAL), ('remote', STAGE_REMOTE)]
+    blob_ids = [unmerged.stages[stage] for unmerged in unmerged_files for (name, stage) in stages
+                if stage in unmerged.stages]
+
+    versions = []
+    written = []
+    try:
+        with repository.blob_reader() as reader:
+            blobs = reader.read_all(blob_ids)
+            for unmerged in unmerged_files:
+                merged_path = os.path.join(repository.root, unmerged.path)
+                root, ext = os.path.splitext(merged_path)
+                args = SimpleNamespace(merged=merged_path)
+                for (name, stage) in stages:
+                    path = "{0}_{1}_{2}{3}".format(root, name.upper(), os.getpid(), ext)
+                    with open(path, 'wb') as version:
+                        written.append(path)
+                        if stage in unmerged.stages:
+                            version.write(next(blobs))
+                    setattr(args, name, path)
+                versions.append(args)
+    except BaseException:
+        # the versions already written would be left behind in the work tree
+        for path in written:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+    return versions
+
+
+def clean_reports(config: 'RawConfigParser', merged_path: str):
     """
     Cleans up the reports for the given file
     """
@@ -210,16 +814,68 @@ def clean_reports(config: RawConfigParser, merged_path: str):
             os.remove(os.path.join(dir_path, file))
 
 
+def census(files: List[str], analyser: ConflictedFileAnalyser) -> int:
+    """
+    Prints the conflicts remaining in each file, with their lines and size
+    files -- the paths of the files to analyse
+    analyser -- the analyser helper
+    returns SUCCESS if no file has a conflict left, ERROR_CONFLICTS otherwise
+    """
+    result = SUCCESS
+    for file in files:
+        file_census = analyser.census(file)
+        print("{0} : {1} conflict(s), {2} bytes".format(file, file_census.count(), file_census.size()))
+        for conflict in file_census.conflicts:
+            print("    {0}".format(conflict))
+        if file_census.count() > 0:
+            result = ERROR_CONFLICTS
+
+    return result
+
+
 def run_main() -> int:
-    cli_args = parse_arguments(sys.argv[1:])
+    if len(sys.argv) > 1 and sys.argv[1] == CMD_CENSUS:
+        census_args = parse_census_arguments(sys.argv[2:])
+        # noinspection PyUnresolvedReferences
+        return census(census_args.files, ConflictedFileAnalyser())
+
+    cli_args = parse_merge_arguments(sys.argv[1:])
+    if cli_args is None:
+        cli_args = parse_arguments(sys.argv[1:])
+
+    # noinspection PyUnresolvedReferences
+    if cli_args.all:
+        repository = GitRepository.find(os.getcwd())
+        if repository is None:
+            print(" [AMT] ✗ Not in a git repository")
+            return ERROR_INVOCATION
+        local_config_path = os.path.join(repository.root, '.git', LOCAL_CONFIG_NAME)
+        if not os.path.exists(local_config_path):
+            local_config_path = None
+        repository_config, tools_launcher = load_config(local_config_path)
+        # noinspection PyUnresolvedReferences
+        return merge_all(repository_config, repository, tools_launcher, ConflictedFileAnalyser(),
+                         not cli_args.subprocess, cli_args.jobs)
+
+    # noinspection PyUnresolvedReferences
+    if cli_args.daemon:
+        repository = GitRepository.find(os.getcwd())
+        if repository is None or not os.path.isdir(os.path.join(repository.root, '.git')):
+            print(" [AMT] ✗ Not in a git repository")
+            return ERROR_INVOCATION
+        # imported here as the daemon needs modules which a regular run doesn't
+        from automergetool.amt_daemon import AMTDaemon
+        # noinspection PyUnresolvedReferences
+        daemon = AMTDaemon(os.path.join(repository.root, '.git'), cli_args.idle_timeout, not cli_args.subprocess)
+        return daemon.serve()
 
     # noinspection PyUnresolvedReferences
     merged_file_path = cli_args.merged
     local_config_path = find_local_config_path(merged_file_path)
-    merged_config = read_config(local_config_path)
-    tools_launcher = ToolsLauncher(merged_config)
+    merged_config, tools_launcher = load_config(local_config_path)
     conflict_analyser = ConflictedFileAnalyser()
-    result = merge(merged_config, cli_args, tools_launcher, conflict_analyser)
+    # noinspection PyUnresolvedReferences
+    result = merge(merged_config, cli_args, tools_launcher, conflict_analyser, not cli_args.subprocess)
 
     if result == SUCCESS:
         clean_reports(merged_config, merged_file_path)
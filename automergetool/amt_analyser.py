@@ -1,10 +1,80 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import mmap
+import os
+import re
 import sys
+from typing import List, Optional
 
 from automergetool.amt_utils import CONFLICT_START, CONFLICT_SEP, CONFLICT_BASE, CONFLICT_END
 
+CONFLICT_START_BYTES = CONFLICT_START.encode()
+CONFLICT_BASE_BYTES = CONFLICT_BASE.encode()
+CONFLICT_SEP_BYTES = CONFLICT_SEP.encode()
+CONFLICT_END_BYTES = CONFLICT_END.encode()
+MARKERS_BYTES = [CONFLICT_START_BYTES, CONFLICT_SEP_BYTES, CONFLICT_BASE_BYTES, CONFLICT_END_BYTES]
+MARKER_LINE_BYTES_PATTERN = re.compile(b"^(?:" + b"|".join(re.escape(m) for m in MARKERS_BYTES) + b")", re.MULTILINE)
+
+
+class ConflictInfo:
+    """
+    Describes where a conflict is in a file, and its size
+    """
+    __slots__ = ('start_line', 'end_line', 'local_lines', 'base_lines', 'remote_lines', 'size')
+
+    def __init__(self, start_line: int, end_line: int, local_lines: int, base_lines: Optional[int], remote_lines: int,
+                 size: int):
+        """
+        :param start_line: the line of the conflict start marker (first line is 1)
+        :param end_line: the line of the conflict end marker
+        :param local_lines: the number of lines in the local version
+        :param base_lines: the number of lines in the base version, or None when the conflict has no base
+        :param remote_lines: the number of lines in the remote version
+        :param size: the size of the whole conflict (with its markers) in bytes
+        """
+        self.start_line = start_line
+        self.end_line = end_line
+        self.local_lines = local_lines
+        self.base_lines = base_lines
+        self.remote_lines = remote_lines
+        self.size = size
+
+    def __repr__(self):
+        return "lines {0}-{1} (local: {2}, base: {3}, remote: {4}, {5} bytes)".format(
+            self.start_line, self.end_line, self.local_lines, self.base_lines, self.remote_lines, self.size)
+
+    def __eq__(self, other):
+        if not isinstance(other, ConflictInfo):
+            return False
+        return all(getattr(self, slot) == getattr(other, slot) for slot in ConflictInfo.__slots__)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class ConflictsCensus:
+    """
+    Lists the conflicts found in a file
+    """
+    __slots__ = ('file_path', 'conflicts')
+
+    def __init__(self, file_path: str, conflicts: List[ConflictInfo]):
+        self.file_path = file_path
+        self.conflicts = conflicts
+
+    def count(self) -> int:
+        """
+        :return: the number of conflicts in the file
+        """
+        return len(self.conflicts)
+
+    def size(self) -> int:
+        """
+        :return: the total size in bytes of the conflicts in the file
+        """
+        return sum(conflict.size for conflict in self.conflicts)
+
 
 class ConflictedFileAnalyser:
     """
@@ -16,15 +86,76 @@ class ConflictedFileAnalyser:
 
     # noinspection PyMethodMayBeStatic
     def has_remaining_conflicts(self, file_path: str) -> bool:
-        with open(file_path, 'r') as f:
-            for line in f:
-                if line.startswith(CONFLICT_START) \
-                        or line.startswith(CONFLICT_SEP) \
-                        or line.startswith(CONFLICT_BASE) \
-                        or line.startswith(CONFLICT_END):
-                    return True
-
-        return False
+        """
+        Checks whether a line of the file starts with a conflict marker.
+        The file is memory mapped and searched as raw bytes in a single pass, stopping at the first marker found
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return MARKER_LINE_BYTES_PATTERN.search(content) is not None
+
+    # noinspection PyMethodMayBeStatic
+    def census(self, file_path: str) -> ConflictsCensus:
+        """
+        Lists the conflicts of a file in a single pass over its memory mapped content.
+        Unlike the ConflictsWalker, this never fails on malformed conflicts : markers that don't form a conflict are
+        ignored, and conflicts without a base are accepted
+        """
+        conflicts = []
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ConflictsCensus(file_path, conflicts)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                line = 1
+                scanned = 0
+                start = None
+                markers_lines = []
+                for match in MARKER_LINE_BYTES_PATTERN.finditer(content):
+                    position = match.start()
+                    line += content[scanned:position].count(b"\n")
+                    scanned = position
+                    marker = match.group()
+                    if marker == CONFLICT_START_BYTES:
+                        start = position
+                        markers_lines = [line]
+                    elif start is None:
+                        continue
+                    elif marker == CONFLICT_BASE_BYTES:
+                        markers_lines.append(line if len(markers_lines) == 1 else None)
+                    elif marker == CONFLICT_SEP_BYTES:
+                        markers_lines.append(line)
+                    else:
+                        end = content.find(b"\n", position) + 1
+                        if end == 0:
+                            end = len(content)
+                        markers_lines.append(line)
+                        info = ConflictedFileAnalyser.__conflict_info(markers_lines, end - start)
+                        if info is not None:
+                            conflicts.append(info)
+                        start = None
+
+        return ConflictsCensus(file_path, conflicts)
+
+    @staticmethod
+    def __conflict_info(markers_lines: List[Optional[int]], size: int) -> Optional[ConflictInfo]:
+        """
+        :param markers_lines: the lines of the start, base (optional), separator and end markers of a conflict
+        :param size: the size of the conflict in bytes
+        :return: the conflict description, or None if the markers don't describe a valid conflict
+        """
+        if len(markers_lines) == 3:
+            start_line, sep_line, end_line = markers_lines
+            base_lines = None
+            local_lines = sep_line - start_line - 1
+        elif len(markers_lines) == 4 and markers_lines[1] is not None:
+            start_line, base_line, sep_line, end_line = markers_lines
+            base_lines = sep_line - base_line - 1
+            local_lines = base_line - start_line - 1
+        else:
+            return None
+        return ConflictInfo(start_line, end_line, local_lines, base_lines, end_line - sep_line - 1, size)
 
 
 if __name__ == '__main__':
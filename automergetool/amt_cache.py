@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from argparse import Namespace
+from typing import Optional, Tuple
+
+CACHE_DIR = "amt"
+CACHE_NAME = "resolutions.db"
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+
+# the solver options which don't change the resolutions
+NEUTRAL_OPTIONS = ['merged', 'report', 'verbose', 'cache']
+
+# the modules the solvers are built on, which content changes the resolutions as much as the solvers' own
+SHARED_MODULES = ['amt_utils.py', 'amt_lcs.py']
+
+
+class ResolutionCache:
+    """
+    A persistent cache of the conflicts resolutions (à la git rerere), stored in the repository's .git/amt folder.
+    Resolutions are keyed by the conflict's content and the solver which resolved it, so that a conflict showing up
+    again (after a rebase, a cherry-pick, …) is solved without any work, nor asking the user again.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, max_age: float = DEFAULT_MAX_AGE):
+        """
+        :param path: the path of the SQLite database
+        :param max_entries: the number of resolutions kept, the least recently used being evicted first
+        :param max_age: the time (in seconds) a resolution is kept after it was last used
+        """
+        # imported here as sqlite3 is slow to import, and the cache is disabled by default
+        import sqlite3
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.__stored = False
+        self.__connection = sqlite3.connect(path, timeout=30)
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS resolutions ("
+                                  "key TEXT PRIMARY KEY, resolved INTEGER, content TEXT, used REAL)")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS resolutions_used ON resolutions (used)")
+        self.__connection.commit()
+
+    @staticmethod
+    def find(merged_path: str) -> Optional['ResolutionCache']:
+        """
+        :return: the cache of the repository containing the given file, or None if it isn't in a git work tree
+        """
+        # the .git of a linked work tree or a submodule is a file : git tells where the shared folder is
+        parent = os.path.dirname(os.path.abspath(merged_path))
+        try:
+            output = subprocess.check_output(['git', 'rev-parse', '--git-common-dir'], cwd=parent,
+                                             stderr=subprocess.DEVNULL)
+        except (subprocess.CalledProcessError, OSError):
+            return None
+        cache_dir = os.path.join(parent, output.decode().strip(), CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        return ResolutionCache(os.path.join(cache_dir, CACHE_NAME))
+
+    @staticmethod
+    def key(solver_key: str, local: str, base: str, remote: str) -> str:
+        """
+        :param solver_key: identifies the solver and its options (cf solver_cache_key())
+        :return: the key of a conflict's resolution
+        """
+        digest = hashlib.sha256()
+        for part in [solver_key, local, base, remote]:
+            encoded = part.encode('utf-8', 'surrogateescape')
+            digest.update(str(len(encoded)).encode() + b':')
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bool, str]]:
+        """
+        :return: None, or whether the cached resolution solves the conflict (otherwise it's a rewrite) and its content
+        """
+        row = self.__connection.execute("SELECT resolved, content FROM resolutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.__connection.execute("UPDATE resolutions SET used = ? WHERE key = ?", (time.time(), key))
+        self.__stored = True
+        return bool(row[0]), row[1]
+
+    def put(self, key: str, resolved: bool, content: str):
+        """
+        Records the resolution of a conflict
+        :param resolved: whether the content solves the conflict (otherwise it's a rewrite)
+        """
+        self.__connection.execute("INSERT OR REPLACE INTO resolutions (key, resolved, content, used) "
+                                  "VALUES (?, ?, ?, ?)", (key, 1 if resolved else 0, content, time.time()))
+        self.__stored = True
+
+    def count(self) -> int:
+        return self.__connection.execute("SELECT COUNT(*) FROM resolutions").fetchone()[0]
+
+    def evict(self):
+        """
+        Removes the resolutions unused for too long, then the least recently used ones above the size limit
+        """
+        self.__connection.execute("DELETE FROM resolutions WHERE used < ?", (time.time() - self.max_age,))
+        self.__connection.execute("DELETE FROM resolutions WHERE key IN "
+                                  "(SELECT key FROM resolutions ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                                  (self.max_entries,))
+
+    def close(self):
+        """
+        Saves the recorded resolutions and closes the cache
+        """
+        if self.__stored:
+            self.evict()
+            self.__connection.commit()
+        self.__connection.close()
+
+
+def solver_cache_key(solver_file: str, parsed: Namespace) -> Optional[str]:
+    """
+    :param solver_file: the path of the solver's module, which content (with the shared modules') acts as the
+    solver's version
+    :param parsed: the solver's parsed arguments
+    :return: a key identifying the solver, its version and its options, or None if the cache isn't enabled
+    """
+    # noinspection PyUnresolvedReferences
+    if parsed.cache != 'true':
+        return None
+    digest = hashlib.sha256()
+    shared_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in [solver_file] + [os.path.join(shared_dir, module) for module in SHARED_MODULES]:
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    version = digest.hexdigest()
+    options = ["{0}={1}".format(name, value) for (name, value) in sorted(vars(parsed).items())
+               if name not in NEUTRAL_OPTIONS]
+    return ";".join([os.path.basename(solver_file), version] + options)
+
+
+if __name__ == '__main__':
+    print("This is just a utility module, not to be launched directly.")
+    sys.exit(1)
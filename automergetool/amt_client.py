@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import sys
+
+SOCKET_NAME = "amt.sock"
+
+CMD_MERGE = "merge"
+CMD_STOP = "stop"
+
+# the response of a daemon which can't merge the file, eg: because of an interactive tool
+RESPONSE_MERGE_LOCALLY = "local"
+
+# same as amt_utils.ERROR_INVOCATION, which isn't imported to keep the client startup fast
+ERROR_INVOCATION = 6
+
+# the fields of a request, separated by NUL characters (which can't appear in a path)
+REQUEST_FIELDS = ['command', 'base', 'local', 'remote', 'merged']
+
+FILE_OPTIONS = {
+    '-b': 'base', '--base': 'base',
+    '-l': 'local', '--local': 'local',
+    '-r': 'remote', '--remote': 'remote',
+    '-m': 'merged', '--merged': 'merged'
+}
+
+
+def daemon_socket_path(git_dir: str) -> str:
+    """
+    :return: the path of the socket the daemon of the given repository listens on
+    """
+    return os.path.join(git_dir, SOCKET_NAME)
+
+
+def find_git_dir(path: str) -> str:
+    """
+    :return: the .git folder of the repository containing the given path, or None
+    """
+    parent = os.path.abspath(path)
+    while True:
+        git = os.path.join(parent, ".git")
+        if os.path.isdir(git):
+            return git
+        if os.path.dirname(parent) == parent:
+            return None
+        parent = os.path.dirname(parent)
+
+
+def receive_message(connection: socket.socket) -> list:
+    """
+    Reads a whole message, sent until the end of the stream
+    :return: the NUL separated fields of the message
+    """
+    chunks = []
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks).decode('utf-8', 'surrogateescape').split('\0')
+
+
+def send_message(connection: socket.socket, fields: list):
+    connection.sendall('\0'.join(fields).encode('utf-8', 'surrogateescape'))
+
+
+def send_request(git_dir: str, request: dict) -> dict:
+    """
+    Sends a request to the daemon of the given repository
+    :return: the daemon's response (its status and output), or None if no daemon is listening or can merge the file
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(daemon_socket_path(git_dir))
+    except OSError:
+        client.close()
+        return None
+    with client:
+        try:
+            send_message(client, [request.get(field, "") for field in REQUEST_FIELDS])
+            client.shutdown(socket.SHUT_WR)
+            response = receive_message(client)
+        except OSError:
+            return None
+    if response[0] == RESPONSE_MERGE_LOCALLY:
+        return None
+    try:
+        status, output = response
+        return {'status': int(status), 'output': output}
+    except ValueError:
+        # truncated response, eg: the daemon stopped while merging
+        return None
+
+
+def parse_arguments(args: list) -> dict:
+    """
+    Parses the base, local, remote and merged file names, without argparse which is slow to import
+    :return: the merge request, or None if the arguments aren't the expected ones
+    """
+    request = {'command': CMD_MERGE}
+    if len(args) % 2 != 0:
+        return None
+    for (option, value) in zip(args[0::2], args[1::2]):
+        if option not in FILE_OPTIONS:
+            return None
+        request[FILE_OPTIONS[option]] = os.path.abspath(value)
+    if len(request) != 5:
+        return None
+    return request
+
+
+def run_main() -> int:
+    """
+    Forwards the merge request to the repository's amt daemon, or merges the file in this process when no daemon is
+    listening. Only a few standard modules are imported until then.
+    """
+    args = sys.argv[1:]
+    if args == ['--stop']:
+        git_dir = find_git_dir(os.getcwd())
+        response = send_request(git_dir, {'command': CMD_STOP}) if git_dir else None
+        if response is None:
+            print(" [AMT] ✗ No daemon running")
+            return ERROR_INVOCATION
+        return response['status']
+
+    request = parse_arguments(args)
+    git_dir = find_git_dir(os.path.dirname(request['merged'])) if request else None
+    response = send_request(git_dir, request) if git_dir else None
+    if response is None:
+        # no daemon to forward to, the file is merged by this process
+        from automergetool.amt import run_main as amt_main
+        return amt_main()
+
+    print(response['output'], end="")
+    return response['status']
+
+
+if __name__ == '__main__':
+    sys.exit(run_main())
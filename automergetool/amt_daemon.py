@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import importlib
+import io
+import os
+import socket
+import sys
+from argparse import Namespace
+from contextlib import redirect_stdout
+from typing import Dict, Optional
+
+from automergetool.amt import GLOBAL_CONFIG, LOCAL_CONFIG_NAME, SECT_AMT, OPT_TOOLS, DAEMON_IDLE_TIMEOUT, load_config, \
+    merge, clean_reports, runs_interactive_tool
+from automergetool.amt_analyser import ConflictedFileAnalyser
+from automergetool.amt_client import CMD_STOP, REQUEST_FIELDS, RESPONSE_MERGE_LOCALLY, daemon_socket_path, receive_message, send_message
+from automergetool.amt_launcher import ToolsLauncher, KNOWN_MODULES
+from automergetool.amt_utils import SUCCESS, ERROR_INVOCATION, ERROR_UNKNOWN
+
+
+class AMTDaemon:
+    """
+    A server merging files on request, keeping the configuration, the tools launcher and the solver modules in memory
+    so that each conflicted file doesn't pay for a new Python interpreter. It stops after being idle for a while.
+    """
+
+    def __init__(self, git_dir: str, idle_timeout: float = DAEMON_IDLE_TIMEOUT, in_process: bool = True):
+        """
+        :param git_dir: the .git folder of the repository, where the socket is created
+        :param idle_timeout: the time (in seconds) without request after which the daemon stops
+        :param in_process: whether the AMT solvers can run in the daemon process
+        """
+        self.git_dir = git_dir
+        self.socket_path = daemon_socket_path(git_dir)
+        self.idle_timeout = idle_timeout
+        self.in_process = in_process
+        self.analyser = ConflictedFileAnalyser()
+        self.config = None
+        self.launcher = None  # type: Optional[ToolsLauncher]
+        self.config_mtimes = {}  # type: Dict[str, Optional[float]]
+
+    def serve(self) -> int:
+        """
+        Listens to the requests until the daemon is idle for too long or asked to stop
+        :return: the exit code of the daemon
+        """
+        if os.path.exists(self.socket_path):
+            if self.__is_running():
+                print(" [AMT] ✗ A daemon is already running on {0}".format(self.socket_path))
+                return ERROR_INVOCATION
+            # left by a daemon which didn't stop properly
+            os.remove(self.socket_path)
+
+        self.reload_config()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.socket_path)
+            server.listen(1)
+            server.settimeout(self.idle_timeout)
+            print(" [AMT] * Daemon listening on {0}".format(self.socket_path))
+            sys.stdout.flush()
+            running = True
+            while running:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    print(" [AMT] * Daemon idle for {0}s, stopping".format(self.idle_timeout))
+                    break
+                with connection:
+                    connection.settimeout(None)
+                    running = self.handle(connection)
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        return SUCCESS
+
+    def handle(self, connection: socket.socket) -> bool:
+        """
+        Handles a single request, and sends back its status and output
+        :return: whether the daemon should keep running
+        """
+        fields = receive_message(connection)
+        if len(fields) != len(REQUEST_FIELDS):
+            return True
+        request = dict(zip(REQUEST_FIELDS, fields))
+
+        if request['command'] == CMD_STOP:
+            send_message(connection, [str(SUCCESS), ""])
+            return False
+
+        if self.has_config_changed():
+            self.reload_config()
+        if self.needs_terminal(request):
+            # the client merges the file itself, where the user can answer the interactive tools
+            send_message(connection, [RESPONSE_MERGE_LOCALLY, ""])
+            return True
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = self.merge(request)
+        send_message(connection, [str(status), output.getvalue()])
+        return True
+
+    def merge(self, request: dict) -> int:
+        """
+        Handle the merge tools chain for the file described in the request
+        """
+        args = Namespace(base=request['base'], local=request['local'], remote=request['remote'],
+                         merged=request['merged'])
+        try:
+            result = merge(self.config, args, self.launcher, self.analyser, self.in_process)
+        except Exception as err:
+            print(" [AMT] ✗ Error merging {0} : {1}".format(args.merged, err))
+            return ERROR_UNKNOWN
+
+        if result == SUCCESS:
+            clean_reports(self.config, args.merged)
+        return result
+
+    def needs_terminal(self, request: dict) -> bool:
+        """
+        :return: whether the merge tools chain of the file described in the request runs an interactive tool
+        """
+        return runs_interactive_tool(self.config, self.launcher, request['merged'])
+
+    def reload_config(self):
+        """
+        Reads the configuration, and loads the modules of the AMT solvers it uses
+        """
+        local_config_path = os.path.join(self.git_dir, LOCAL_CONFIG_NAME)
+        self.config, self.launcher = load_config(local_config_path if os.path.exists(local_config_path) else None)
+        self.config_mtimes = self.__config_mtimes()
+        if self.config.has_option(SECT_AMT, OPT_TOOLS):
+            for tool in self.config.get(SECT_AMT, OPT_TOOLS).split(';'):
+                if tool in KNOWN_MODULES:
+                    importlib.import_module(KNOWN_MODULES[tool])
+
+    def has_config_changed(self) -> bool:
+        return self.__config_mtimes() != self.config_mtimes
+
+    def __config_mtimes(self) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for path in [GLOBAL_CONFIG, os.path.join(self.git_dir, LOCAL_CONFIG_NAME)]:
+            mtimes[path] = os.path.getmtime(path) if os.path.exists(path) else None
+        return mtimes
+
+    def __is_running(self) -> bool:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(self.socket_path)
+            return True
+        except OSError:
+            return False
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    print("This is just a utility module, not to be launched directly.")
+    sys.exit(1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional
+
+STAGE_BASE = 1
+STAGE_LOCAL = 2
+STAGE_REMOTE = 3
+
+
+class UnmergedFile:
+    """
+    Describes a file left unmerged in the git index : the blob ids of its base, local and remote versions
+    """
+    __slots__ = ('path', 'stages')
+
+    def __init__(self, path: str, stages: Dict[int, str]):
+        """
+        :param path: the path of the file, relative to the repository root
+        :param stages: the blob id of each version present in the index, by stage (STAGE_xxx constants)
+        """
+        self.path = path
+        self.stages = stages
+
+    def is_content_conflict(self) -> bool:
+        """
+        :return: whether both sides modified the file (a file deleted on one side can't be merged line by line)
+        """
+        return (STAGE_LOCAL in self.stages) and (STAGE_REMOTE in self.stages)
+
+
+class GitRepository:
+    """
+    A helper to query and update a local git repository
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def find(path: str) -> Optional['GitRepository']:
+        """
+        :return: the repository containing the given path, or None if it isn't in a git work tree
+        """
+        try:
+            output = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=path,
+                                             stderr=subprocess.DEVNULL)
+        except (subprocess.CalledProcessError, OSError):
+            return None
+        return GitRepository(output.decode().strip())
+
+    def unmerged_files(self) -> List[UnmergedFile]:
+        """
+        Lists the unmerged files in the index (cf `git ls-files -u`)
+        """
+        output = self.__git('ls-files', '-u', '-z')
+        files = {}  # type: Dict[str, UnmergedFile]
+        paths = []
+        for entry in output.split(b'\0'):
+            if len(entry) == 0:
+                continue
+            # <mode> SP <object> SP <stage> TAB <path>
+            info, path = entry.split(b'\t', 1)
+            mode, blob_id, stage = info.split(b' ')
+            path = os.fsdecode(path)
+            if path not in files:
+                files[path] = UnmergedFile(path, {})
+                paths.append(path)
+            files[path].stages[int(stage)] = blob_id.decode()
+        return [files[path] for path in paths]
+
+    def blob_reader(self) -> 'BlobReader':
+        """
+        :return: a reader fetching many blobs through a single git process, to be closed after use
+        """
+        return BlobReader(self.root)
+
+    def add(self, *paths: str):
+        """
+        Marks the given files as resolved in the index
+        """
+        self.__git('add', '--', *paths)
+
+    def __git(self, *args: str) -> bytes:
+        return subprocess.check_output(('git',) + args, cwd=self.root)
+
+
+class BlobReader:
+    """
+    Reads blobs through a single long-lived `git cat-file --batch` process, instead of one process per blob
+    """
+
+    def __init__(self, root: str):
+        self.__process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=root,
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def __enter__(self) -> 'BlobReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read_all(self, blob_ids: List[str]) -> Iterator[bytes]:
+        """
+        Streams all the given blob ids to git at once, while their content is read back
+        :return: the content of each given blob, in the same order
+        """
+        # the ids are written from another thread so that neither pipe can fill up and block git
+        writer = threading.Thread(target=self.__write_ids, args=(blob_ids,))
+        writer.start()
+        read_count = 0
+        try:
+            for blob_id in blob_ids:
+                yield self.__read_next(blob_id)
+                read_count += 1
+        finally:
+            if read_count < len(blob_ids):
+                # the remaining output won't be read, git must stop writing it
+                self.__process.kill()
+            writer.join()
+
+    def close(self):
+        """
+        Stops the git process
+        """
+        # closing the output first lets git stop even if some blobs were never read
+        self.__process.stdout.close()
+        try:
+            self.__process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.__process.wait()
+
+    def __write_ids(self, blob_ids: List[str]):
+        try:
+            for blob_id in blob_ids:
+                self.__process.stdin.write(blob_id.encode() + b'\n')
+            self.__process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def __read_next(self, blob_id: str) -> bytes:
+        # <object> SP <type> SP <size> LF <contents> LF, or <object> SP missing LF
+        header = self.__process.stdout.readline().split()
+        if len(header) != 3:
+            raise RuntimeError("Unable to read the blob {0}".format(blob_id))
+        content = self.__process.stdout.read(int(header[2]))
+        self.__process.stdout.read(1)
+        return content
+
+
+if __name__ == '__main__':
+    print("This is just a utility module, not to be launched directly.")
+    sys.exit(1)
@@ -1,22 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import inspect
+import importlib
 import os
 import subprocess
 import sys
-from configparser import RawConfigParser
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
+
+from automergetool.amt_utils import ConflictDocument
 
 SECT_TOOL_FORMAT = 'mergetool "{0}"'
+SECT_TOOL_PREFIX = 'mergetool "'
 OPT_PATH = 'path'
 OPT_CMD = 'cmd'
 OPT_EXTENSIONS = 'extensions'
 OPT_IGNORED_EXTENSIONS = 'ignoreExtensions'
 OPT_TRUST_EXIT_CODE = 'trustExitCode'
+OPT_INTERACTIVE = 'interactive'
 
-CURRENT_FRAME = inspect.getfile(inspect.currentframe())
-CURRENT_DIR = os.path.dirname(os.path.abspath(CURRENT_FRAME))
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 CURRENT_INTERPRETER = sys.executable
 
 KNOWN_PATHS = {  # type: Dict[str, str]
@@ -98,6 +100,20 @@ KNOWN_CMDS = {  # type: Dict[str, str]
     'kotlin_imports_beta': CURRENT_INTERPRETER + ' {0} -b $BASE -l $LOCAL -r $REMOTE -m $MERGED'
 }
 
+KNOWN_MODULES = {  # type: Dict[str, str]
+    'java_imports': 'automergetool.solvers.java_imports',
+    'kotlin_imports_beta': 'automergetool.solvers.kotlin_imports',
+    'gen_additions': 'automergetool.solvers.gen_additions',
+    'gen_deletions': 'automergetool.solvers.gen_deletions',
+    'gen_debug': 'automergetool.solvers.gen_debug',
+    'gen_simplify': 'automergetool.solvers.gen_simplify',
+    'gen_woven': 'automergetool.solvers.gen_woven',
+    'gen_single_line': 'automergetool.solvers.gen_single_line'
+}
+
+# AMT solvers able to work on an in-memory ConflictDocument
+DOCUMENT_SOLVERS = ['gen_additions', 'gen_deletions', 'gen_debug', 'gen_simplify', 'gen_woven', 'gen_single_line']
+
 KNOWN_TRUSTS = {  # type: Dict[str, bool]]
     # 3rd party solvers
     'deltawalker': True,
@@ -122,18 +138,86 @@ KNOWN_TRUSTS = {  # type: Dict[str, bool]]
     'gen_simplify': True
 }
 
+# tools which never wait for the user (the other ones are deemed interactive)
+KNOWN_INTERACTIVES = {  # type: Dict[str, bool]]
+    # AMT solvers
+    'java_imports': False,
+    'kotlin_imports_beta': False,
+    'gen_deletions': False,
+    'gen_debug': False,
+    'gen_simplify': False,
+    'gen_woven': False
+}
+
 KNOWN_EXTENSIONS = {  # type: Dict[str, str]
     'java_imports': 'java',
     'kotlin_imports_beta': 'kt'
 }
 
 
+class ToolSettings:
+    """
+    The settings of a tool, resolved from the configuration and the known tools presets
+    """
+    __slots__ = ('cmd', 'trust', 'extensions', 'ignored_extensions', 'interactive')
+
+    def __init__(self, cmd: Optional[str], trust: bool, extensions: Optional[List[str]],
+                 ignored_extensions: Optional[List[str]], interactive: bool):
+        """
+        :param cmd: the command line invocation, before the file names are expanded (None for an unknown tool)
+        :param trust: whether the exit code of the tool can be trusted
+        :param extensions: the extensions the tool can work on, or None for any
+        :param ignored_extensions: the extensions the tool must not work on, or None
+        :param interactive: whether the tool may wait for the user
+        """
+        self.cmd = cmd
+        self.trust = trust
+        self.extensions = extensions
+        self.ignored_extensions = ignored_extensions
+        self.interactive = interactive
+
+
+class PlannedTool:
+    """
+    A tool of the chain, as planned for a file extension : how to run it, or why it's skipped
+    """
+    __slots__ = ('tool', 'cmd', 'trust', 'skip_reason', 'interactive')
+
+    def __init__(self, tool: str, cmd: Optional[str], trust: bool, skip_reason: Optional[str] = None,
+                 interactive: bool = True):
+        """
+        :param tool: the name of the tool
+        :param cmd: the command line invocation, before the file names are expanded (None for an unknown tool)
+        :param trust: whether the exit code of the tool can be trusted
+        :param skip_reason: why the tool doesn't apply to the extension (eg: "bad extension : txt"), or None
+        :param interactive: whether the tool may wait for the user
+        """
+        self.tool = tool
+        self.cmd = cmd
+        self.trust = trust
+        self.skip_reason = skip_reason
+        self.interactive = interactive
+
+    def is_runnable(self) -> bool:
+        """
+        :return: whether the tool actually runs on the file (rather than being skipped)
+        """
+        return bool(self.tool) and self.skip_reason is None and self.cmd is not None
+
+
 class ToolsLauncher:
     """
+    Resolves the tools settings from the configuration, and runs the tools
     """
 
-    def __init__(self, config: Optional[RawConfigParser] = None):
+    def __init__(self, config: Optional['RawConfigParser'] = None, settings: Optional[Dict[str, ToolSettings]] = None):
+        """
+        :param config: the current amt configuration
+        :param settings: the settings already resolved from this configuration, by tool name (eg: from a snapshot)
+        """
         self.config = config
+        self.settings = settings if settings is not None else {}  # type: Dict[str, ToolSettings]
+        self.plans = {}  # type: Dict[Tuple[Tuple[str, ...], str], List[PlannedTool]]
 
     @staticmethod
     def tool_section_name(tool: str) -> str:
@@ -143,11 +227,85 @@ class ToolsLauncher:
         """
         return SECT_TOOL_FORMAT.format(tool)
 
+    def get_tool_settings(self, tool: str) -> ToolSettings:
+        """
+        Get the settings of the given tool, resolved once from the configuration
+        tool -- the name of the tool
+        """
+        settings = self.settings.get(tool)
+        if settings is None:
+            settings = ToolSettings(self.__resolve_tool_cmd(tool), self.__resolve_tool_trust(tool),
+                                    self.__resolve_tool_extensions(tool), self.__resolve_tool_ignored_extensions(tool),
+                                    self.__resolve_tool_interactive(tool))
+            self.settings[tool] = settings
+        return settings
+
+    def get_plan(self, tools: List[str], extension: str) -> List[PlannedTool]:
+        """
+        Get the tools chain planned for the given file extension, compiled once per extension
+        tools -- the names of the tools in the chain
+        extension -- the extension of the merged file, without the dot (eg: "java")
+        """
+        key = (tuple(tools), extension)
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = [self.plan_tool(tool, extension) for tool in tools]
+            self.plans[key] = plan
+        return plan
+
+    def plan_tool(self, tool: str, extension: str) -> PlannedTool:
+        """
+        Check whether the given tool applies to the file extension, and how to run it
+        tool -- the name of the tool
+        extension -- the extension of the merged file, without the dot (eg: "java")
+        """
+        if (tool is None) or (tool == ""):
+            return PlannedTool(tool, None, False)
+
+        settings = self.get_tool_settings(tool)
+        skip_reason = None
+        if (settings.extensions is not None) and (extension not in settings.extensions):
+            skip_reason = "bad extension : {0}".format(extension)
+        elif (settings.ignored_extensions is not None) and (extension in settings.ignored_extensions):
+            skip_reason = "ignoring extension : {0}".format(extension)
+        return PlannedTool(tool, settings.cmd, settings.trust, skip_reason, settings.interactive)
+
     def get_tool_trust(self, tool: str) -> bool:
         """
         Check whether we should trust the exit code of the given tool
         tool -- the name of the tool
         """
+        return self.get_tool_settings(tool).trust
+
+    def get_tool_interactive(self, tool: str) -> bool:
+        """
+        Check whether the given tool may wait for the user
+        tool -- the name of the tool
+        """
+        return self.get_tool_settings(tool).interactive
+
+    def get_tool_extensions(self, tool: str) -> Optional[List[str]]:
+        """
+        Get the extensions list the given tool can work on
+        tool -- the name of the tool
+        """
+        return self.get_tool_settings(tool).extensions
+
+    def get_tool_ignored_extensions(self, tool: str) -> Optional[List[str]]:
+        """
+        Get the extensions list the given tool must not work on
+        tool -- the name of the tool
+        """
+        return self.get_tool_settings(tool).ignored_extensions
+
+    def get_tool_cmd(self, tool: str) -> Optional[str]:
+        """
+        Get the command line invocation for the givent tool
+        tool -- the name of the tool
+        """
+        return self.get_tool_settings(tool).cmd
+
+    def __resolve_tool_trust(self, tool: str) -> bool:
         section = ToolsLauncher.tool_section_name(tool)
         if self.config.has_option(section, OPT_TRUST_EXIT_CODE):
             return self.config.getboolean(section, OPT_TRUST_EXIT_CODE)
@@ -159,11 +317,19 @@ class ToolsLauncher:
         # Default
         return False
 
-    def get_tool_extensions(self, tool: str) -> Optional[List[str]]:
-        """
-        Get the extensions list the given tool can work on
-        tool -- the name of the tool
-        """
+    def __resolve_tool_interactive(self, tool: str) -> bool:
+        section = ToolsLauncher.tool_section_name(tool)
+        if self.config.has_option(section, OPT_INTERACTIVE):
+            return self.config.getboolean(section, OPT_INTERACTIVE)
+
+        # Known tools
+        if tool in KNOWN_INTERACTIVES:
+            return KNOWN_INTERACTIVES[tool]
+
+        # Default
+        return True
+
+    def __resolve_tool_extensions(self, tool: str) -> Optional[List[str]]:
         extensions = None
 
         # Known tools extensions
@@ -180,11 +346,7 @@ class ToolsLauncher:
         else:
             return None
 
-    def get_tool_ignored_extensions(self, tool: str) -> Optional[List[str]]:
-        """
-        Get the extensions list the given tool can work on
-        tool -- the name of the tool
-        """
+    def __resolve_tool_ignored_extensions(self, tool: str) -> Optional[List[str]]:
         ignored_extensions = None
 
         # Check in config
@@ -213,12 +375,7 @@ class ToolsLauncher:
         # Default
         return tool
 
-    def get_tool_cmd(self, tool: str) -> Optional[str]:
-        """
-        Get the command line invocation for the givent tool
-        tool -- the name of the tool
-        config -- the current amt configuration
-        """
+    def __resolve_tool_cmd(self, tool: str) -> Optional[str]:
         section = ToolsLauncher.tool_section_name(tool)
         if self.config.has_option(section, OPT_CMD):
             return self.config.get(section, OPT_CMD)
@@ -229,7 +386,7 @@ class ToolsLauncher:
             cmd = KNOWN_CMDS[tool].format(path)
             if self.config.has_section(section):
                 for option in self.config.options(section):
-                    if option == OPT_PATH or option == OPT_TRUST_EXIT_CODE:
+                    if option == OPT_PATH or option == OPT_TRUST_EXIT_CODE or option == OPT_INTERACTIVE:
                         pass
                     else:
                         cmd += " --{0} {1}".format(option, self.config.get(section, option))
@@ -247,6 +404,59 @@ class ToolsLauncher:
         sanitized_cmd = ToolsLauncher.sanitize_command(cmd)
         return subprocess.call(sanitized_cmd, shell=False)
 
+    # noinspection PyMethodMayBeStatic
+    def start(self, cmd: str) -> subprocess.Popen:
+        """
+        Starts the given command without waiting for it, nor letting it read the user input
+        :param cmd: the command string
+        :return: the running process
+        """
+        sanitized_cmd = ToolsLauncher.sanitize_command(cmd)
+        return subprocess.Popen(sanitized_cmd, shell=False, stdin=subprocess.DEVNULL)
+
+    # noinspection PyMethodMayBeStatic
+    def invoke_solver(self, tool: str, args: List[str], document: Optional[ConflictDocument] = None) -> int:
+        """
+        Runs the given AMT solver in the current process
+        :param tool: the name of the solver
+        :param args: the arguments of the solver's command line (without the interpreter and script)
+        :param document: the in-memory merged file, for the DOCUMENT_SOLVERS
+        :return: the solver exit code
+        """
+        module = importlib.import_module(KNOWN_MODULES[tool])
+        try:
+            if tool in DOCUMENT_SOLVERS:
+                return module.solve(args, document)
+            else:
+                return module.solve(args)
+        except SystemExit as exit_request:
+            # eg: invalid arguments, the exit code follows the sys.exit() conventions
+            if exit_request.code is None:
+                return 0
+            elif isinstance(exit_request.code, int):
+                return exit_request.code
+            else:
+                return 1
+
+    @staticmethod
+    def get_solver_args(tool: str, cmd: str) -> Optional[List[str]]:
+        """
+        Checks whether the command runs one of the AMT solvers with the current interpreter, in which case the solver
+        can be run in the current process instead
+        :param tool: the name of the tool
+        :param cmd: the expanded command line invocation
+        :return: the arguments to pass to the solver, or None if the command must be invoked
+        """
+        if tool not in KNOWN_MODULES:
+            return None
+
+        tokens = ToolsLauncher.sanitize_command(cmd)
+        if len(tokens) < 2 or tokens[0] != CURRENT_INTERPRETER:
+            return None
+        if os.path.abspath(tokens[1]) != os.path.abspath(KNOWN_PATHS[tool]):
+            return None
+        return tokens[2:]
+
     @staticmethod
     def sanitize_command(cmd: str) -> list:
         """
@@ -2,16 +2,52 @@
 # -*- coding: utf-8 -*-
 
 import sys
-from typing import TypeVar, Generic, List, Any
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import TypeVar, Generic, List, Any, Optional, Tuple, Dict, Hashable, Sequence, Callable
+
+numpy = None  # imported on first use, see load_numpy()
+numpy_missing = False
 
 S = TypeVar('S')  # Generic Sequence
 I = TypeVar('I')  # Generic Item
 
+TABLE_ITEM_SIZE = array('i').itemsize
+
+# the default maximum size of an LCS table, above which the problem is split (cf LCSAnalyser)
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# the number of cells of an LCS search above which the solvers give up, its running time being cubic in the length
+# of the sequences (about 2s in pure python, or 0.2s with NumPy)
+DEFAULT_MAX_CELLS = 4 * 1000 * 1000
+
+# the size (in cells) from which an LCS table is filled with NumPy, smaller ones don't pay off its import time
+NUMPY_MIN_CELLS = 100000
+
+STRATEGY_EXACT = "exact"
+STRATEGY_PATIENCE = "patience"
+
+
+def load_numpy():
+    """
+    Imports NumPy on first use, as it's slow to import and only useful on big LCS tables
+    :return: the numpy module, or None if it isn't installed
+    """
+    global numpy, numpy_missing
+    if numpy is None and not numpy_missing:
+        try:
+            import numpy
+        except ImportError:
+            numpy_missing = True
+    return numpy
+
 
 class SubSeq(Generic[S]):
     """
     Represents a SubSequence
     """
+    __slots__ = ()
 
     def __init__(self):
         pass
@@ -20,14 +56,38 @@ class SubSeq(Generic[S]):
 class CommonSubSeq(Generic[S], SubSeq[S]):
     """
     Represents a sub-sequence in an LCS result, where all three versions are the same
+    The content can be given directly, or computed lazily from a source on first access
     """
-
-    def __init__(self, content: S, pos_b: int, pos_l: int, pos_r: int):
+    __slots__ = ('pos_b', 'pos_l', 'pos_r', 'length', '__content', '__source')
+
+    def __init__(self,
+                 content: Optional[S],
+                 pos_b: int,
+                 pos_l: int,
+                 pos_r: int,
+                 length: Optional[int] = None,
+                 source: Optional[Callable[[int, int], S]] = None):
+        """
+        :param content: the common content, or None when a source is given
+        :param pos_b: the position of the sub-sequence in the base
+        :param pos_l: the position of the sub-sequence in the left
+        :param pos_r: the position of the sub-sequence in the right
+        :param length: the number of items in the sub-sequence (defaults to the content's length)
+        :param source: a function returning the content from the base position and the length
+        """
         super().__init__()
-        self.content = content
+        self.__content = content
+        self.__source = source
         self.pos_b = pos_b
         self.pos_l = pos_l
         self.pos_r = pos_r
+        self.length = len(content) if length is None else length
+
+    @property
+    def content(self) -> S:
+        if self.__content is None:
+            self.__content = self.__source(self.pos_b, self.length)
+        return self.__content
 
     def __str__(self):
         return str(self.content)
@@ -38,7 +98,13 @@ class CommonSubSeq(Generic[S], SubSeq[S]):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            if self.pos_b != other.pos_b or self.pos_l != other.pos_l or self.pos_r != other.pos_r:
+                return False
+            # sub-sequences read from a source are equal by position, the content is only compared otherwise (a given
+            # content may be boxed differently, and its length not be the number of items)
+            if self.__source is not None and other.__source is not None:
+                return self.length == other.length
+            return self.content == other.content
         return False
 
     def __ne__(self, other):
@@ -49,6 +115,7 @@ class DiffSubSeq(Generic[S], SubSeq[S]):
     """
     Represents a sub-sequence in an LCS result, where at least one version is different
     """
+    __slots__ = ('content_b', 'content_l', 'content_r', 'pos_b', 'pos_l', 'pos_r')
 
     def __init__(self, content_b: S, content_l: S, content_r: S, pos_b: int, pos_l: int, pos_r: int):
         super().__init__()
@@ -65,7 +132,9 @@ class DiffSubSeq(Generic[S], SubSeq[S]):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.pos_b == other.pos_b and self.pos_l == other.pos_l and self.pos_r == other.pos_r and \
+                   self.content_b == other.content_b and self.content_l == other.content_l and \
+                   self.content_r == other.content_r
         return False
 
     def __ne__(self, other):
@@ -97,6 +166,16 @@ class Sequencer(Generic[S, I]):
         """
         return a + b
 
+    def concat_all(self, seqs: List[S]) -> S:
+        """
+        :param seqs: a non empty list of sequences
+        :return: a sequence containing the items from all the sequences, in order
+        """
+        result = seqs[0]
+        for seq in seqs[1:]:
+            result = self.concat(result, seq)
+        return result
+
     # noinspection PyMethodMayBeStatic
     def get_item(self, seq: S, pos: int) -> I:
         """
@@ -119,6 +198,15 @@ class Sequencer(Generic[S, I]):
         """
         return a == b
 
+    # noinspection PyMethodMayBeStatic
+    def item_key(self, item: I) -> Hashable:
+        """
+        :param item: an item from an analysed sequence
+        :return: a hashable key for the item; items with the same key must be equal according to are_items_equal,
+        and items with different keys must not (unless are_items_equal is overridden without overriding this method)
+        """
+        return item
+
     # noinspection PyMethodMayBeStatic
     def box(self, item: I) -> S:
         """
@@ -135,6 +223,12 @@ class StringSequencer(Sequencer[str, str]):
     def concat(self, a: str, b: str) -> str:
         return a + b
 
+    def concat_all(self, seqs: List[str]) -> str:
+        # joining is linear, but a custom concat must still be honored
+        if type(self).concat is not StringSequencer.concat:
+            return super().concat_all(seqs)
+        return "".join(seqs)
+
 
 class ListSequencer(Generic[I], Sequencer[List[I], I]):
     def box(self, item: I) -> List[I]:
@@ -143,14 +237,90 @@ class ListSequencer(Generic[I], Sequencer[List[I], I]):
     def concat(self, a: List[I], b: List[I]) -> List[I]:
         return a + b
 
+    def concat_all(self, seqs: List[List[I]]) -> List[I]:
+        # joining is linear, but a custom concat must still be honored
+        if type(self).concat is not ListSequencer.concat:
+            return super().concat_all(seqs)
+        return [item for seq in seqs for item in seq]
+
+
+class Tokenizer(Generic[S, I]):
+    """
+    Maps the items of the analysed sequences to small integers (tokens), so that two items get the same token
+    if and only if they are equal according to the sequencer
+    """
+
+    def __init__(self, sequencer: Sequencer[S, I]):
+        self.sequencer = sequencer
+        self.tokens = {}  # type: Dict[Hashable, int]
+        self.representatives = []  # type: List[I]
+        # a sequencer with a custom equality but no matching key needs items to be compared one by one
+        sequencer_type = type(sequencer)
+        self.compare_items = (sequencer_type.are_items_equal is not Sequencer.are_items_equal) and (
+            sequencer_type.item_key is Sequencer.item_key)
+
+    def tokenize(self, seq: S) -> List[int]:
+        """
+        :param seq: a sequence to analyse
+        :return: the list of tokens for each item in the sequence
+        """
+        return [self.token(self.sequencer.get_item(seq, pos)) for pos in range(len(seq))]
+
+    def token(self, item: I) -> int:
+        """
+        :param item: an item from an analysed sequence
+        :return: the token for the given item
+        """
+        key = self.sequencer.item_key(item)
+        token = self.tokens.get(key)
+        if token is None:
+            if self.compare_items:
+                for other_token, other in enumerate(self.representatives):
+                    if self.sequencer.are_items_equal(other, item):
+                        token = other_token
+                        break
+            if token is None:
+                token = len(self.representatives)
+                self.representatives.append(item)
+            self.tokens[key] = token
+        return token
+
 
 class LCSAnalyser(Generic[S, I]):
     """
     A utility class able to find the LCS between three strings / arrays
     """
 
-    def __init__(self, sequencer: Sequencer[S, I]):
+    def __init__(self,
+                 sequencer: Sequencer[S, I],
+                 memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT,
+                 strategy: str = STRATEGY_EXACT,
+                 use_numpy: bool = True,
+                 max_distance: Optional[int] = None,
+                 max_cells: Optional[int] = None):
+        """
+        :param sequencer: the sequencer used to decompose the analysed objects
+        :param memory_limit: the maximum size (in bytes) of an LCS table, or None for no limit; bigger problems are
+        split in halves (Hirschberg's divide and conquer) so that only a couple of 2D planes are kept in memory at once
+        :param strategy: the alignment strategy, either STRATEGY_EXACT to compute the real LCS, or STRATEGY_PATIENCE
+        to first align the sequences on items appearing exactly once in each (like git's patience diff), and only
+        compute the exact LCS between those anchors
+        :param use_numpy: whether the big LCS tables should be filled with NumPy when it is installed; the result is
+        the same as with the pure python implementation, only faster
+        :param max_distance: when set, the maximum number of items of any sequence which can be left out of the LCS;
+        the search stops as soon as the LCS is known to be too short, and no common sub-sequence is returned
+        :param max_cells: when set, the maximum number of cells of an LCS table (once the common prefix and suffix are
+        trimmed); with STRATEGY_EXACT no common sub-sequence is returned for bigger problems, with STRATEGY_PATIENCE
+        the bigger gaps between anchors are left unaligned
+        """
+        if strategy not in [STRATEGY_EXACT, STRATEGY_PATIENCE]:
+            raise ValueError("Unknown alignment strategy : " + str(strategy))
         self.sequencer = sequencer
+        self.memory_limit = memory_limit
+        self.strategy = strategy
+        self.use_numpy = use_numpy
+        self.max_distance = max_distance
+        self.max_cells = max_cells
 
     def lcs_with_diff(self, base: S, left: S, right: S) -> List[SubSeq[S]]:
         """
@@ -160,116 +330,498 @@ class LCSAnalyser(Generic[S, I]):
         :param right:
         :return:
         """
-        self.__reset_lcs_cache()
+        subs = self.__lcs(base, left, right)
 
-        size = max(len(base), len(left), len(right))
-        subs = self.__lcs(base, len(base) - 1, left, len(left) - 1, right, len(right) - 1, size)
-
-        return self.__compute_diff(self.__concatenate_sub_sequences(subs), base, left, right)
+        return self.__compute_diff(subs, base, left, right)
 
     def lcs(self, base: S, left: S, right: S) -> List[CommonSubSeq[S]]:
         """
         Returns the longest common sub-sequence between three strings/arrays
+        (an empty list when the sequences are further apart than the max_distance, or too long for the max_cells)
         """
-        self.__reset_lcs_cache()
+        return self.__lcs(base, left, right)
 
-        size = max(len(base), len(left), len(right))
-        subs = self.__lcs(base, len(base) - 1, left, len(left) - 1, right, len(right) - 1, size)
+    def __lcs(self, b: S, l: S, r: S) -> List[CommonSubSeq[S]]:
+        """
+        Computes the LCS with a bottom-up dynamic programming table, then walks it back from the end
+        :return: the list of common sub-sequences, in order
+        """
+        tokenizer = Tokenizer(self.sequencer)
+        tokens_b = tokenizer.tokenize(b)
+        tokens_l = tokenizer.tokenize(l)
+        tokens_r = tokenizer.tokenize(r)
+
+        # the common prefix and suffix are part of an LCS, only the core in between needs the costly search
+        prefix = 0
+        max_common = min(len(b), len(l), len(r))
+        while prefix < max_common and tokens_b[prefix] == tokens_l[prefix] == tokens_r[prefix]:
+            prefix += 1
+        suffix = 0
+        max_common -= prefix
+        while suffix < max_common and tokens_b[-1 - suffix] == tokens_l[-1 - suffix] == tokens_r[-1 - suffix]:
+            suffix += 1
+        end_b = len(b) - suffix
+        end_l = len(l) - suffix
+        end_r = len(r) - suffix
+
+        # with a max distance, the core LCS must be long enough to leave few items out of the longest core
+        min_length = 0
+        if self.max_distance is not None:
+            min_length = max(end_b, end_l, end_r) - prefix - self.max_distance
+            if self.__count_common_items(tokens_b, tokens_l, tokens_r, prefix, end_b, end_l, end_r) < min_length:
+                return []
+
+        # all steps append their matches, in order, to a single list
+        matches = [(pos, pos, pos) for pos in range(prefix)]
+        if self.strategy == STRATEGY_PATIENCE:
+            self.__patience_range(tokens_b, tokens_l, tokens_r, prefix, end_b, prefix, end_l, prefix, end_r, matches)
+        elif not self.__lcs_range(tokens_b, tokens_l, tokens_r, prefix, end_b, prefix, end_l, prefix, end_r, matches,
+                                  min_length):
+            return []
+        if len(matches) - prefix < min_length:
+            return []
+        matches.extend((end_b + pos, end_l + pos, end_r + pos) for pos in range(suffix))
+        return self.__concatenate_sub_sequences(matches, lambda pos, length: self.__content(b, pos, length))
 
-        return self.__concatenate_sub_sequences(subs)
+    # noinspection PyMethodMayBeStatic
+    def __count_common_items(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], start: int,
+                             end_b: int, end_l: int, end_r: int) -> int:
+        """
+        :return: the number of items the three ranges (from start to their end) have in common, regardless of their
+        order; this is a cheap upper bound of their LCS length
+        """
+        common = Counter(tokens_b[start:end_b]) & Counter(tokens_l[start:end_l]) & Counter(tokens_r[start:end_r])
+        return sum(common.values())
 
-    def __lcs(self, b: S, pos_b: int, l: S, pos_l: int, r: S, pos_r: int, size: int) -> List[CommonSubSeq[S]]:
-        i = pos_b
-        j = pos_l
-        k = pos_r
+    # noinspection PyMethodMayBeStatic
+    def __lcs_two_way(self, tokens_a: List[int], a0: int, a1: int, tokens_c: List[int], c0: int,
+                      c1: int) -> List[Tuple[int, int]]:
+        """
+        Computes the LCS of the ranges a[a0:a1] and c[c0:c1] with a bit-parallel algorithm (Allison-Dix / Hyyrö) :
+        each row of the LCS table is packed in an integer, where a 0 bit at position j means that the LCS grows when
+        adding c[c0 + j] to the compared range
+        :return: the positions of the common items, in order
+        """
+        len_c = c1 - c0
+        full = (1 << len_c) - 1
+        masks = {}  # type: Dict[int, int]
+        for j in range(len_c):
+            token = tokens_c[c0 + j]
+            masks[token] = masks.get(token, 0) | (1 << j)
+
+        rows = [full]
+        row = full
+        for i in range(a0, a1):
+            matches = row & masks.get(tokens_a[i], 0)
+            row = ((row + matches) | (row - matches)) & full
+            rows.append(row)
+
+        # walk back from the end, the LCS length of a[a0:a0 + i] and c[c0:c0 + j] is the count of 0 bits below j
+        pairs = []
+        i = a1 - a0
+        j = len_c
+        while i > 0 and j > 0:
+            if (rows[i] >> (j - 1)) & 1:
+                j -= 1
+            else:
+                below = (1 << j) - 1
+                if bin(rows[i - 1] & below).count('1') == bin(rows[i] & below).count('1') + 1:
+                    i -= 1
+                    j -= 1
+                    pairs.append((a0 + i, c0 + j))
+                else:
+                    i -= 1
 
-        if (i >= 0) and (j >= 0) and (k >= 0):
-            item_b = self.sequencer.get_item(b, i)
-            item_l = self.sequencer.get_item(l, j)
-            item_r = self.sequencer.get_item(r, k)
+        pairs.reverse()
+        return pairs
+
+    def __patience_range(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], b0: int, b1: int,
+                         l0: int, l1: int, r0: int, r1: int, matches: List[Tuple[int, int, int]]):
+        """
+        Aligns the ranges b[b0:b1], l[l0:l1] and r[r0:r1] on anchors, then aligns the gaps between anchors the
+        same way, until a gap has no anchor and is solved with the exact LCS
+        :param matches: the list where the positions of the common items are appended, in order
+        """
+        # the stack holds either ranges (6-tuples) or anchors (3-tuples), pushed in reverse order
+        stack = [(b0, b1, l0, l1, r0, r1)]
+        while len(stack) > 0:
+            item = stack.pop()
+            if len(item) == 3:
+                matches.append(item)
+                continue
+
+            (start_b, end_b, start_l, end_l, start_r, end_r) = item
+            anchors = self.__find_anchors(tokens_b, tokens_l, tokens_r, start_b, end_b, start_l, end_l, start_r,
+                                          end_r)
+            if len(anchors) == 0:
+                self.__lcs_range(tokens_b, tokens_l, tokens_r, start_b, end_b, start_l, end_l, start_r, end_r,
+                                 matches)
+                continue
+
+            for (i, j, k) in reversed(anchors):
+                stack.append((i + 1, end_b, j + 1, end_l, k + 1, end_r))
+                stack.append((i, j, k))
+                end_b = i
+                end_l = j
+                end_r = k
+            stack.append((start_b, end_b, start_l, end_l, start_r, end_r))
 
-            if self.sequencer.are_items_equal(item_b, item_l) and self.sequencer.are_items_equal(item_b, item_r):
-                return self.__cached_lcs(b, i - 1, l, j - 1, r, k - 1, size) + [
-                    CommonSubSeq(self.sequencer.box(item_b), i, j, k)]
+    # noinspection PyMethodMayBeStatic
+    def __find_anchors(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], b0: int, b1: int,
+                       l0: int, l1: int, r0: int, r1: int) -> List[Tuple[int, int, int]]:
+        """
+        Finds the items appearing exactly once in each of the ranges b[b0:b1], l[l0:l1] and r[r0:r1]
+        :return: the longest chain of such items appearing in the same order in the three ranges
+        """
+        unique_b = self.__unique_positions(tokens_b, b0, b1)
+        unique_l = self.__unique_positions(tokens_l, l0, l1)
+        unique_r = self.__unique_positions(tokens_r, r0, r1)
+        candidates = sorted((i, unique_l[token], unique_r[token]) for token, i in unique_b.items()
+                            if (token in unique_l) and (token in unique_r))
+        if len(candidates) == 0:
+            return []
+
+        # candidates are sorted on the base position : keep the longest chain increasing on the left positions, then
+        # the longest chain of those increasing on the right positions too
+        return self.__longest_increasing(self.__longest_increasing(candidates, 1), 2)
+
+    # noinspection PyMethodMayBeStatic
+    def __longest_increasing(self, candidates: List[Tuple[int, int, int]], axis: int) -> List[Tuple[int, int, int]]:
+        """
+        Finds the longest sub-list of candidates with increasing positions on the given axis (patience sorting)
+        :param candidates: the positions of unique items, as (base, left, right) tuples
+        :return: the longest sub-list, in the candidates order
+        """
+        tails = []  # the smallest last position of an increasing chain, by chain length - 1
+        tail_indices = []
+        previous = []
+        for index, candidate in enumerate(candidates):
+            position = candidate[axis]
+            length = bisect_left(tails, position)
+            if length == len(tails):
+                tails.append(position)
+                tail_indices.append(index)
+            else:
+                tails[length] = position
+                tail_indices[length] = index
+            previous.append(tail_indices[length - 1] if length > 0 else -1)
+
+        chain = []
+        index = tail_indices[-1] if len(tail_indices) > 0 else -1
+        while index >= 0:
+            chain.append(candidates[index])
+            index = previous[index]
+        chain.reverse()
+        return chain
+
+    # noinspection PyMethodMayBeStatic
+    def __unique_positions(self, tokens: List[int], start: int, end: int) -> Dict[int, int]:
+        """
+        :return: the position of each token appearing exactly once in tokens[start:end]
+        """
+        positions = {}
+        for pos in range(start, end):
+            token = tokens[pos]
+            positions[token] = -1 if token in positions else pos
+        return {token: pos for token, pos in positions.items() if pos >= 0}
+
+    def __lcs_range(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], b0: int, b1: int,
+                    l0: int, l1: int, r0: int, r1: int, matches: List[Tuple[int, int, int]],
+                    min_length: int = 0) -> bool:
+        """
+        Computes the LCS of the ranges b[b0:b1], l[l0:l1] and r[r0:r1]
+        :param matches: the list where the positions of the common items are appended, in order
+        :param min_length: the search is aborted as soon as the LCS is known to be shorter
+        :return: False if the search was aborted
+        """
+        len_b = b1 - b0
+        len_l = l1 - l0
+        len_r = r1 - r0
+        if len_b == 0 or len_l == 0 or len_r == 0:
+            return min_length <= 0
+
+        # when two ranges are identical, the problem is a 2-way LCS between the two distinct ranges
+        range_b = tokens_b[b0:b1]
+        range_l = tokens_l[l0:l1]
+        range_r = tokens_r[r0:r1]
+        if range_b == range_l:
+            pairs = self.__lcs_two_way(tokens_b, b0, b1, tokens_r, r0, r1)
+            matches.extend((i, l0 + i - b0, k) for i, k in pairs)
+            return len(pairs) >= min_length
+        if range_b == range_r:
+            pairs = self.__lcs_two_way(tokens_b, b0, b1, tokens_l, l0, l1)
+            matches.extend((i, j, r0 + i - b0) for i, j in pairs)
+            return len(pairs) >= min_length
+        if range_l == range_r:
+            pairs = self.__lcs_two_way(tokens_b, b0, b1, tokens_l, l0, l1)
+            matches.extend((i, j, r0 + j - l0) for i, j in pairs)
+            return len(pairs) >= min_length
+
+        cells = (len_b + 1) * (len_l + 1) * (len_r + 1)
+        if (self.max_cells is not None) and (cells > self.max_cells):
+            return False
+        table_size = cells * TABLE_ITEM_SIZE
+        if (self.memory_limit is None) or (table_size <= self.memory_limit) or (len_b == 1):
+            table = self.__lcs_table(tokens_b, tokens_l, tokens_r, b0, b1, l0, l1, r0, r1, min_length)
+            if table is None:
+                return False
+            self.__traceback(table, tokens_b, tokens_l, tokens_r, b0, b1, l0, l1, r0, r1, matches)
+            return True
+
+        # Hirschberg : find where an optimal path crosses the middle of the base, and solve both halves separately
+        mid = b0 + (len_b // 2)
+        size_r = len_r + 1
+        forward = self.__lcs_plane(tokens_b, tokens_l, tokens_r, range(b0, mid), range(l0, l1), range(r0, r1))
+        backward = self.__lcs_plane(tokens_b, tokens_l, tokens_r, range(b1 - 1, mid - 1, -1),
+                                    range(l1 - 1, l0 - 1, -1), range(r1 - 1, r0 - 1, -1))
+        # on ties, keep the latest split, as the table traceback favours the latest matches
+        best = -1
+        split_l = split_r = 0
+        for j in range(len_l + 1):
+            row_forward = j * size_r
+            row_backward = (len_l - j) * size_r + len_r
+            for k in range(len_r + 1):
+                total = forward[row_forward + k] + backward[row_backward - k]
+                if total >= best:
+                    best = total
+                    split_l = j
+                    split_r = k
+        if best < min_length:
+            return False
+
+        self.__lcs_range(tokens_b, tokens_l, tokens_r, b0, mid, l0, l0 + split_l, r0, r0 + split_r, matches)
+        self.__lcs_range(tokens_b, tokens_l, tokens_r, mid, b1, l0 + split_l, l1, r0 + split_r, r1, matches)
+        return True
+
+    # noinspection PyMethodMayBeStatic
+    def __lcs_plane(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], rows_b: range,
+                    cols_l: range, cols_r: range) -> array:
+        """
+        Computes the last plane of the LCS table, keeping only two planes in memory.
+        The items are read in the order given by the ranges, which can be reversed
+        :return: a flat (len(cols_l) + 1) × (len(cols_r) + 1) plane of LCS lengths
+        """
+        if self.__is_numpy_worth(len(rows_b) * (len(cols_l) + 1) * (len(cols_r) + 1)):
+            return self.__numpy_lcs_plane(tokens_b, tokens_l, tokens_r, rows_b, cols_l, cols_r)
+
+        size_r = len(cols_r) + 1
+        plane_size = (len(cols_l) + 1) * size_r
+        previous = array('i', bytes(TABLE_ITEM_SIZE * plane_size))
+        row_l = [tokens_l[j] for j in cols_l]
+        row_r = [tokens_r[k] for k in cols_r]
+
+        for i in rows_b:
+            current = array('i', bytes(TABLE_ITEM_SIZE * plane_size))
+            token = tokens_b[i]
+            for j in range(1, len(cols_l) + 1):
+                cur = j * size_r
+                prev_l = cur - size_r
+                matches_l = row_l[j - 1] == token
+                for k in range(1, size_r):
+                    if matches_l and row_r[k - 1] == token:
+                        current[cur + k] = previous[prev_l + k - 1] + 1
+                    else:
+                        best = previous[cur + k]
+                        other = current[prev_l + k]
+                        if other > best:
+                            best = other
+                        other = current[cur + k - 1]
+                        if other > best:
+                            best = other
+                        current[cur + k] = best
+            previous = current
+
+        return previous
+
+    # noinspection PyMethodMayBeStatic
+    def __lcs_table(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], b0: int, b1: int,
+                    l0: int, l1: int, r0: int, r1: int, min_length: int = 0) -> Optional[array]:
+        """
+        Fills the (len_b + 1) × (len_l + 1) × (len_r + 1) table of LCS lengths for the given ranges, stored flat.
+        The cell (i, j, k) holds the LCS length of b[b0:b0 + i], l[l0:l0 + j] and r[r0:r0 + k]
+        :param min_length: the filling stops, and None is returned, as soon as the LCS can't reach this length : each
+        remaining base item can at best extend the longest sub-sequence found so far by one
+        """
+        if self.__is_numpy_worth((b1 - b0 + 1) * (l1 - l0 + 1) * (r1 - r0 + 1)):
+            return self.__numpy_lcs_table(tokens_b, tokens_l, tokens_r, b0, b1, l0, l1, r0, r1, min_length)
+
+        len_b = b1 - b0
+        len_l = l1 - l0
+        len_r = r1 - r0
+        size_r = len_r + 1
+        size_plane = (len_l + 1) * size_r
+        table = array('i', bytes(TABLE_ITEM_SIZE * (len_b + 1) * size_plane))
+
+        row_l = tokens_l[l0:l1]
+        row_r = tokens_r[r0:r1]
+
+        for i in range(1, len_b + 1):
+            token = tokens_b[b0 + i - 1]
+            for j in range(1, len_l + 1):
+                cur = (i * (len_l + 1) + j) * size_r
+                prev_b = cur - size_plane
+                prev_l = cur - size_r
+                diag = prev_b - size_r - 1
+                matches_l = row_l[j - 1] == token
+                for k in range(1, len_r + 1):
+                    if matches_l and row_r[k - 1] == token:
+                        table[cur + k] = table[diag + k] + 1
+                    else:
+                        best = table[prev_b + k]
+                        other = table[prev_l + k]
+                        if other > best:
+                            best = other
+                        other = table[cur + k - 1]
+                        if other > best:
+                            best = other
+                        table[cur + k] = best
+            if table[(i + 1) * size_plane - 1] + len_b - i < min_length:
+                return None
+
+        return table
+
+    def __is_numpy_worth(self, cells: int) -> bool:
+        """
+        :return: whether a table with the given number of cells should be filled with NumPy
+        """
+        return self.use_numpy and (cells >= NUMPY_MIN_CELLS) and (load_numpy() is not None)
+
+    def __numpy_lcs_table(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], b0: int, b1: int,
+                          l0: int, l1: int, r0: int, r1: int, min_length: int = 0) -> Optional['numpy.ndarray']:
+        """
+        Fills the same table as __lcs_table, with one vectorized step per base item
+        """
+        len_b = b1 - b0
+        row_l = numpy.array(tokens_l[l0:l1], dtype=numpy.int64)
+        row_r = numpy.array(tokens_r[r0:r1], dtype=numpy.int64)
+        table = numpy.zeros((len_b + 1, l1 - l0 + 1, r1 - r0 + 1), dtype=numpy.int32)
+
+        for i in range(1, len_b + 1):
+            self.__numpy_next_plane(table[i - 1], table[i], tokens_b[b0 + i - 1], row_l, row_r)
+            if table[i, -1, -1] + len_b - i < min_length:
+                return None
+
+        return table.ravel()
+
+    def __numpy_lcs_plane(self, tokens_b: List[int], tokens_l: List[int], tokens_r: List[int], rows_b: range,
+                          cols_l: range, cols_r: range) -> array:
+        """
+        Computes the same plane as __lcs_plane, with one vectorized step per base item
+        """
+        row_l = numpy.array([tokens_l[j] for j in cols_l], dtype=numpy.int64)
+        row_r = numpy.array([tokens_r[k] for k in cols_r], dtype=numpy.int64)
+        previous = numpy.zeros((len(cols_l) + 1, len(cols_r) + 1), dtype=numpy.int32)
+        current = numpy.zeros_like(previous)
+
+        for i in rows_b:
+            self.__numpy_next_plane(previous, current, tokens_b[i], row_l, row_r)
+            previous, current = current, previous
+
+        return array('i', previous.tobytes())
+
+    # noinspection PyMethodMayBeStatic
+    def __numpy_next_plane(self, previous: 'numpy.ndarray', current: 'numpy.ndarray', token: int,
+                           row_l: 'numpy.ndarray', row_r: 'numpy.ndarray'):
+        """
+        Fills the inner cells of the current plane from the previous one (borders are left to 0).
+        Matching an item is always worth at least as much as skipping one, so a cell holds the maximum, over all cells
+        above and before it in the plane, of either the previous plane's value or the diagonal + 1 for matching cells
+        """
+        matches = numpy.logical_and.outer(row_l == token, row_r == token)
+        plane = numpy.where(matches, previous[:-1, :-1] + 1, previous[1:, 1:])
+        numpy.maximum.accumulate(plane, axis=0, out=plane)
+        numpy.maximum.accumulate(plane, axis=1, out=plane)
+        current[1:, 1:] = plane
+
+    # noinspection PyMethodMayBeStatic
+    def __traceback(self, table: Sequence[int], tokens_b: List[int], tokens_l: List[int], tokens_r: List[int],
+                    b0: int, b1: int, l0: int, l1: int, r0: int, r1: int, matches: List[Tuple[int, int, int]]):
+        """
+        Walks the LCS table of the given ranges back from their end.
+        When several paths lead to the same length, the base is preferred, then the left, then the right
+        :param matches: the list where the positions of the common items are appended, in order
+        """
+        len_l = l1 - l0
+        size_r = r1 - r0 + 1
+        size_plane = (len_l + 1) * size_r
+        backward_matches = []
+
+        i, j, k = b1 - b0, len_l, r1 - r0
+        while i > 0 and j > 0 and k > 0:
+            token = tokens_b[b0 + i - 1]
+            if tokens_l[l0 + j - 1] == token and tokens_r[r0 + k - 1] == token:
+                i -= 1
+                j -= 1
+                k -= 1
+                backward_matches.append((b0 + i, l0 + j, r0 + k))
             else:
-                tmp_b = self.__cached_lcs(b, i - 1, l, j, r, k, size)
-                tmp_l = self.__cached_lcs(b, i, l, j - 1, r, k, size)
-                tmp_r = self.__cached_lcs(b, i, l, j, r, k - 1, size)
-
-                if (len(tmp_b) >= len(tmp_l)) and (len(tmp_b) >= len(tmp_r)):
-                    return tmp_b
-                elif (len(tmp_l) >= len(tmp_b)) and (len(tmp_l) >= len(tmp_r)):
-                    return tmp_l
-                elif (len(tmp_r) >= len(tmp_b)) and (len(tmp_r) >= len(tmp_l)):
-                    return tmp_r
+                cur = (i * (len_l + 1) + j) * size_r + k
+                len_prev_b = table[cur - size_plane]
+                len_prev_l = table[cur - size_r]
+                len_prev_r = table[cur - 1]
+                if len_prev_b >= len_prev_l and len_prev_b >= len_prev_r:
+                    i -= 1
+                elif len_prev_l >= len_prev_r:
+                    j -= 1
                 else:
-                    raise RuntimeError("Oops")
-        else:
-            return []
+                    k -= 1
 
-    def __concatenate_sub_sequences(self, subs: List[CommonSubSeq[S]]) -> List[CommonSubSeq[S]]:
+        matches.extend(reversed(backward_matches))
+
+    # noinspection PyMethodMayBeStatic
+    def __concatenate_sub_sequences(self, matches: List[Tuple[int, int, int]],
+                                    source: Callable[[int, int], S]) -> List[CommonSubSeq[S]]:
+        """
+        Groups the positions of consecutive common items in sub-sequences, whose content is only computed when read
+        """
         result = []
-        curr = None
-        last_b = last_l = last_r = -1
-
-        for sub in subs:
-            if curr is None:
-                curr = sub
-                last_b = sub.pos_b
-                last_l = sub.pos_l
-                last_r = sub.pos_r
-            elif (sub.pos_b == last_b + 1) and (sub.pos_l == last_l + 1) and (sub.pos_r == last_r + 1):
-                curr = CommonSubSeq(self.sequencer.concat(curr.content, sub.content), curr.pos_b, curr.pos_l,
-                                    curr.pos_r)
-                last_b = sub.pos_b
-                last_l = sub.pos_l
-                last_r = sub.pos_r
+        start = None
+        length = 0
+
+        for (i, j, k) in matches:
+            if (start is not None) and (i == start[0] + length) and (j == start[1] + length) and (
+                    k == start[2] + length):
+                length += 1
             else:
-                result += [curr]
-                curr = sub
-                last_b = sub.pos_b
-                last_l = sub.pos_l
-                last_r = sub.pos_r
-        if curr is not None:
-            result += [curr]
+                if start is not None:
+                    result.append(CommonSubSeq(None, start[0], start[1], start[2], length, source))
+                start = (i, j, k)
+                length = 1
+        if start is not None:
+            result.append(CommonSubSeq(None, start[0], start[1], start[2], length, source))
 
         return result
 
+    def __content(self, b: S, pos: int, length: int) -> S:
+        """
+        :return: the content of the base items in [pos, pos + length), boxed and concatenated by the sequencer
+        """
+        return self.sequencer.concat_all([self.sequencer.box(self.sequencer.get_item(b, i))
+                                          for i in range(pos, pos + length)])
+
     def __compute_diff(self, subs: List[CommonSubSeq[S]], b: S, l: S, r: S) -> List[SubSeq[S]]:
         result = []
-        prev = CommonSubSeq([], 0, 0, 0)
+        end_b = end_l = end_r = 0
 
         for css in subs:
             if css.pos_b > 0 or css.pos_l > 0 or css.pos_r > 0:
-                lpc = len(prev.content)
-                tmp_b = self.sequencer.sub_sequence(b, prev.pos_b + lpc, css.pos_b)
-                tmp_l = self.sequencer.sub_sequence(l, prev.pos_l + lpc, css.pos_l)
-                tmp_r = self.sequencer.sub_sequence(r, prev.pos_r + lpc, css.pos_r)
-                result += [DiffSubSeq(tmp_b, tmp_l, tmp_r, prev.pos_b + lpc, prev.pos_l + lpc, prev.pos_r + lpc)]
-            result += [css]
-            prev = css
-
-        lpc = len(prev.content)
-        if prev.pos_b + lpc < len(b) or prev.pos_l + lpc < len(l) or prev.pos_r + lpc < len(r):
-            tmp_b = self.sequencer.sub_sequence(b, prev.pos_b + lpc, len(b))
-            tmp_l = self.sequencer.sub_sequence(l, prev.pos_l + lpc, len(l))
-            tmp_r = self.sequencer.sub_sequence(r, prev.pos_r + lpc, len(r))
-            result += [DiffSubSeq(tmp_b, tmp_l, tmp_r, prev.pos_b + lpc, prev.pos_l + lpc, prev.pos_r + lpc)]
+                tmp_b = self.sequencer.sub_sequence(b, end_b, css.pos_b)
+                tmp_l = self.sequencer.sub_sequence(l, end_l, css.pos_l)
+                tmp_r = self.sequencer.sub_sequence(r, end_r, css.pos_r)
+                result.append(DiffSubSeq(tmp_b, tmp_l, tmp_r, end_b, end_l, end_r))
+            result.append(css)
+            end_b = css.pos_b + css.length
+            end_l = css.pos_l + css.length
+            end_r = css.pos_r + css.length
+
+        if end_b < len(b) or end_l < len(l) or end_r < len(r):
+            tmp_b = self.sequencer.sub_sequence(b, end_b, len(b))
+            tmp_l = self.sequencer.sub_sequence(l, end_l, len(l))
+            tmp_r = self.sequencer.sub_sequence(r, end_r, len(r))
+            result.append(DiffSubSeq(tmp_b, tmp_l, tmp_r, end_b, end_l, end_r))
 
         return result
 
-    def __reset_lcs_cache(self):
-        self.__lcs_cache = {}
-
-    def __cached_lcs(self, b, pos_b, l, pos_l, r, pos_r, size):
-        key = (((pos_b * size) + pos_l) * size) + pos_r
-        if key in self.__lcs_cache:
-            return self.__lcs_cache[key]
-        else:
-            res = self.__lcs(b, pos_b, l, pos_l, r, pos_r, size)
-            self.__lcs_cache[key] = res
-            return res
-
 
 if __name__ == '__main__':
     print("This is just a utility module, not to be launched directly.")
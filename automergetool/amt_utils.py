@@ -2,8 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import sys
-from typing import Optional
+from typing import Dict, Optional, List, Tuple, Union
 
 CONFLICT_START = "<<<<<<<"
 CONFLICT_BASE = "|||||||"
@@ -23,6 +24,17 @@ ERROR_CONFLICTS = 4
 ERROR_UNTRUSTED = 5
 ERROR_INVOCATION = 6
 
+# the parse error of a conflict running to the end of the text, which is kept as is rather than failing the solvers
+UNTERMINATED_CONFLICT = "Found conflict starting tag without ending tag"
+
+MARKER_LINE_PATTERN = re.compile(
+    "^(?:" + "|".join(re.escape(m) for m in [CONFLICT_START, CONFLICT_BASE, CONFLICT_SEP, CONFLICT_END]) + ")",
+    re.MULTILINE)
+
+# offsets of a conflict start, local block start, base marker, base block start, separator marker, remote block start,
+# end marker and conflict end
+ConflictBounds = Tuple[int, int, int, int, int, int, int, int]
+
 # TODO add docstrings for this file
 
 
@@ -31,17 +43,57 @@ class Conflict:
     Describes a conflict : it contains the base, local and remote
     versions
     """
+    __slots__ = ('marker_local', 'marker_remote', 'content', 'resolved', '__text', '__bounds', '__blocks',
+                 '__lines_cache')
 
     def __init__(self, local: str, base: str, remote: str, marker_local: str, marker_remote: str):
-        self.local = local
-        self.base = base
-        self.remote = remote
-        self.marker_local = marker_local
-        self.marker_remote = marker_remote
-        self.raw = marker_local + local + CONFLICT_BASE + "\n" + base + CONFLICT_SEP + "\n" + remote + marker_remote
+        raw = marker_local + local + CONFLICT_BASE + "\n" + base + CONFLICT_SEP + "\n" + remote + marker_remote
+        local_start = len(marker_local)
+        base_marker = local_start + len(local)
+        base_start = base_marker + len(CONFLICT_BASE) + 1
+        sep_marker = base_start + len(base)
+        remote_start = sep_marker + len(CONFLICT_SEP) + 1
+        end_marker = remote_start + len(remote)
+        end = len(raw)
+        self.__set_source(raw, (0, local_start, base_marker, base_start, sep_marker, remote_start, end_marker, end))
+
+    @staticmethod
+    def from_text(text: str, bounds: ConflictBounds) -> 'Conflict':
+        """
+        Creates a conflict read from a larger text, its blocks are only sliced from the text when first needed
+        text -- the text containing the conflict
+        bounds -- the offsets of the conflict parts in the text
+        """
+        conflict = Conflict.__new__(Conflict)
+        conflict.__set_source(text, bounds)
+        return conflict
+
+    def __set_source(self, text: str, bounds: ConflictBounds):
+        self.__text = text
+        self.__bounds = bounds
+        self.__blocks = [None, None, None, None]
+        self.__lines_cache = [None, None, None]
+        self.marker_local = text[bounds[0]:bounds[1]]
+        self.marker_remote = text[bounds[6]:bounds[7]]
         self.content = None
         self.resolved = False
 
+    @property
+    def local(self) -> str:
+        return self.__block(0, 1, 2)
+
+    @property
+    def base(self) -> str:
+        return self.__block(1, 3, 4)
+
+    @property
+    def remote(self) -> str:
+        return self.__block(2, 5, 6)
+
+    @property
+    def raw(self) -> str:
+        return self.__block(3, 0, 7)
+
     def resolve(self, resolution: str):
         self.content = resolution
         self.resolved = True
@@ -56,20 +108,179 @@ class Conflict:
         return self.resolved
 
     def local_lines(self) -> list:
-        return Conflict.__lines(self.local)
+        return self.__cached_lines(0)
 
     def base_lines(self) -> list:
-        return Conflict.__lines(self.base)
+        return self.__cached_lines(1)
 
     def remote_lines(self) -> list:
-        return Conflict.__lines(self.remote)
+        return self.__cached_lines(2)
+
+    def __block(self, index: int, start: int, end: int) -> str:
+        """
+        Slices a block from the source text only once
+        """
+        block = self.__blocks[index]
+        if block is None:
+            block = self.__text[self.__bounds[start]:self.__bounds[end]]
+            self.__blocks[index] = block
+        return block
+
+    def __cached_lines(self, index: int) -> list:
+        """
+        Splits the block in lines only once, the returned list is shared and must not be modified
+        """
+        lines = self.__lines_cache[index]
+        if lines is None:
+            lines = Conflict.__lines(self.__block(index, 1 + 2 * index, 2 + 2 * index))
+            self.__lines_cache[index] = lines
+        return lines
 
     @staticmethod
     def __lines(block: str) -> list:
-        lines = block.split('\n')
-        filtered = list(filter(lambda x: len(x) > 0, lines))
-        mapped = list(map(lambda x: x + "\n", filtered))
-        return mapped
+        return [line + "\n" for line in block.split('\n') if len(line) > 0]
+
+
+class ResolutionsMemo:
+    """
+    Remembers how each solver handled the conflicts met during a run, so that identical conflicts (same raw text,
+    markers included) found again in the same or in other files are only handled once by each solver
+    """
+    __slots__ = ('outcomes', 'replayed')
+
+    def __init__(self):
+        # (solver, raw conflict) -> (resolved, content), the content being None for unsolved conflicts
+        self.outcomes = {}  # type: Dict[Tuple[str, str], Tuple[bool, Optional[str]]]
+        self.replayed = 0
+
+
+class CacheSession:
+    """
+    The repository's resolution cache, shared by the walkers of a run : it is found and opened by the first walker
+    using it, and the new resolutions are saved when the run ends
+    """
+    __slots__ = ('cache', 'opened')
+
+    def __init__(self):
+        self.cache = None  # type: Optional[ResolutionCache]
+        self.opened = False
+
+    def get(self, merged_path: str) -> Optional['ResolutionCache']:
+        """
+        :return: the cache of the repository containing the given file, or None if it isn't in a git work tree
+        """
+        if not self.opened:
+            # imported here to keep the cache (and sqlite3) out of the amt startup path
+            from automergetool.amt_cache import ResolutionCache
+            self.cache = ResolutionCache.find(merged_path)
+            self.opened = True
+        return self.cache
+
+    def close(self):
+        """
+        Saves the recorded resolutions and closes the cache, if it was opened
+        """
+        if self.cache is not None:
+            self.cache.close()
+        self.cache = None
+        self.opened = False
+
+
+class ConflictDocument:
+    """
+    An in-memory conflicted file : the plain text between conflicts, and the conflicts themselves.
+    Solvers resolve or rewrite its conflicts, then commit() applies their changes; this way a chain of solvers can
+    work on the same document, which is only written once at the end
+    """
+    __slots__ = ('parts', 'parse_error', 'unparsed', 'memo', 'cache_session')
+
+    def __init__(self, text: str, memo: Optional[ResolutionsMemo] = None):
+        """
+        :param text: the conflicted text; an invalid conflict is only reported when a walker reaches it
+        :param memo: if set, the solvers walking the document reuse the outcomes of identical conflicts met before
+        """
+        self.parts = []  # type: List[Union[str, Conflict]]
+        self.unparsed = ""
+        self.memo = memo
+        # if set, the resolution cache shared by the solvers walking the document
+        self.cache_session = None  # type: Optional[CacheSession]
+        self.parse_error = self.__append(text)
+
+    @staticmethod
+    def load(path: str, memo: Optional[ResolutionsMemo] = None) -> 'ConflictDocument':
+        with open(path) as file:
+            return ConflictDocument(file.read(), memo)
+
+    def save(self, path: str):
+        with open(path, 'w') as file:
+            file.write(self.text())
+
+    def text(self) -> str:
+        """
+        :return: the text of the document, with the conflicts as they were before the last commit
+        """
+        return "".join(part if isinstance(part, str) else part.raw for part in self.parts) + self.unparsed
+
+    def conflicts(self) -> List[Conflict]:
+        return [part for part in self.parts if isinstance(part, Conflict)]
+
+    def has_conflicts(self) -> bool:
+        """
+        :return: whether the document has conflicts left (an invalid conflict being one)
+        """
+        return (self.parse_error is not None) or any(isinstance(part, Conflict) for part in self.parts)
+
+    def commit(self):
+        """
+        Applies the changes made to the conflicts : resolved conflicts become plain text, and rewritten conflicts are
+        replaced by the text and conflicts of their new content
+        """
+        parts = self.parts
+        self.parts = []
+        for part in parts:
+            if isinstance(part, str):
+                self.parts.append(part)
+            elif part.is_resolved():
+                self.parts.append(part.content)
+            elif part.is_rewritten():
+                if self.__append(part.content) is not None:
+                    raise RuntimeError("Conflict rewritten with invalid conflict markers :\n" + part.content)
+            else:
+                self.parts.append(part)
+
+    def rollback(self):
+        """
+        Drops the changes made to the conflicts since the last commit
+        """
+        for part in self.parts:
+            if isinstance(part, Conflict):
+                part.content = None
+                part.resolved = False
+
+    def __append(self, text: str) -> Optional[str]:
+        """
+        Appends the plain text and conflicts found in the text to the parts
+        :return: None, or the error message if an invalid conflict was found, in which case the text from this
+        conflict is kept as unparsed
+        """
+        conflicts_bounds, error = index_conflicts(text)
+        appended = 0
+        for bounds in conflicts_bounds:
+            if bounds[0] > appended:
+                self.parts.append(text[appended:bounds[0]])
+            self.parts.append(Conflict.from_text(text, bounds))
+            appended = bounds[-1]
+
+        if error is None:
+            if appended < len(text):
+                self.parts.append(text[appended:])
+            return None
+
+        offset, message = error
+        if offset > appended:
+            self.parts.append(text[appended:offset])
+        self.unparsed = text[offset:]
+        return message
 
 
 class ConflictsWalker:
@@ -82,15 +293,37 @@ class ConflictsWalker:
                  merged_path: str,
                  report_name: Optional[str]=None,
                  report_type: str=REPORT_NONE,
-                 verbose: bool=False):
+                 verbose: bool=False,
+                 document: Optional[ConflictDocument]=None,
+                 cache_key: Optional[str]=None):
+        """
+        merged_path -- the path of the conflicted file
+        report_name -- the name of the solver, used in logs and in the report file name
+        report_type -- the type of report to write (one of the REPORT_xxx constants)
+        verbose -- whether to log the conflicts and their resolution
+        document -- if set, the in-memory conflicted file to walk : the changes are committed to it when the walk
+        ends, and the file itself is neither read nor written
+        cache_key -- if set, identifies the solver in the repository's resolution cache (cf solver_cache_key()) :
+        conflicts resolved before are solved from the cache without being returned, and new resolutions are recorded
+        """
         self.verbose = verbose
         self.log_tag = report_name
         self.conflicted = merged_path
         self.merged = merged_path + ".resolving.amt"
-        self.conflicted_file = open(self.conflicted)
-        self.merged_file = open(self.merged, 'w')
+        self.in_memory = document is not None
+        self.document = document if self.in_memory else ConflictDocument.load(self.conflicted)
+        self.parts_walked = 0
         self.conflict = None
+        self.conflict_cached = False
         self.has_remaining_conflicts = False
+        self.cache_key = cache_key
+        self.cache_pending = []  # type: List[Tuple[str, bool, str]]
+        # a cache shared by the walkers of a run is saved when the run ends, not by each walker
+        self.cache_session = self.document.cache_session
+        if self.cache_session is None:
+            self.cache_session = CacheSession()
+        self.cache = self.cache_session.get(merged_path) if cache_key is not None else None
+        self.memo = self.document.memo
         if report_name and report_type and report_type != REPORT_NONE:
             self.report_file = open(merged_path + "." + report_name + "-report", 'w')
             self.report_type = report_type
@@ -99,75 +332,54 @@ class ConflictsWalker:
             self.report_type = REPORT_NONE
 
     def has_more_conflicts(self) -> bool:
-        self.write_previous_conflict()
-        self.write_previous_conflict_report()
-        self.log_previous_conflict()
-        self.conflict = None
-
-        # if has current conflict, write it or the resolution to the merged file
-        conflict_started = False
-        conflict_ended = False
-        eof = False
-        raw_conflict = ""
-        sections = ["", "", ""]
-        markers = ["", ""]
-        section_index = 0
-        sections_filled = 0
-        while (not eof) and (not (conflict_started and conflict_ended)):
-            line = self.conflicted_file.readline()
-            if line == "":
-                eof = True
-            if line.startswith(CONFLICT_END):
-                if not conflict_started:
-                    raise RuntimeError("Found conflict ending tag without starting tag")
-                if sections_filled != 3:
-                    raise RuntimeError("Conflict is missing the base content. Try running : \n"
-                                       "$ git config --global merge.conflictstyle diff3")
-                raw_conflict += line
-                markers[1] = line
-                conflict_ended = True
-            elif line.startswith(CONFLICT_START):
-                conflict_started = True
-                markers[0] = line
-                raw_conflict += line
-                section_index = 0
-                sections_filled += 1
-            elif line.startswith(CONFLICT_BASE):
-                if not conflict_started:
-                    raise RuntimeError("Found conflict base tag without starting tag")
-                raw_conflict += line
-                section_index = 1
-                sections_filled += 1
-            elif line.startswith(CONFLICT_SEP):
-                if not conflict_started:
-                    raise RuntimeError("Found conflict separation tag without starting tag")
-                raw_conflict += line
-                section_index = 2
-                sections_filled += 1
-            else:
-                if conflict_started:
-                    raw_conflict += line
-                    sections[section_index] += line
-                else:
-                    self.merged_file.write(line)
-        if eof:
-            return False
-        else:
-            self.conflict = Conflict(sections[0], sections[1], sections[2], markers[0], markers[1])
-            return True
+        self.end_previous_conflict()
+
+        parts = self.document.parts
+        while self.parts_walked < len(parts):
+            part = parts[self.parts_walked]
+            self.parts_walked += 1
+            if isinstance(part, Conflict):
+                self.conflict = part
+                if self.replay_memo() or self.replay_cached_resolution():
+                    self.end_previous_conflict()
+                    continue
+                return True
+
+        if self.document.parse_error == UNTERMINATED_CONFLICT:
+            self.has_remaining_conflicts = True
+        elif self.document.parse_error is not None:
+            raise RuntimeError(self.document.parse_error)
+
+        return False
 
     def next_conflict(self) -> Conflict:
         return self.conflict
 
     def end(self, apply: bool=True):
-        self.conflicted_file.close()
-        self.merged_file.close()
-
-        if apply:
-            os.rename(self.merged, self.conflicted)
+        """
+        Ends the walk : the changes are applied to the document, then the merged file is written
+        apply -- whether the merged file should replace the conflicted one (or, for an in-memory document, whether the
+        changes should be committed)
+        """
+        if self.in_memory:
+            if apply:
+                self.document.commit()
+            else:
+                self.document.rollback()
+        else:
+            self.document.commit()
+            self.document.save(self.merged)
+            if apply:
+                os.rename(self.merged, self.conflicted)
 
         if self.report_file:
             self.report_file.close()
+        if self.cache is not None and apply:
+            # the resolutions of a rejected walk aren't recorded
+            for (key, resolved, content) in self.cache_pending:
+                self.cache.put(key, resolved, content)
+        if self.cache_session is not self.document.cache_session:
+            self.cache_session.close()
 
     def get_merge_status(self) -> int:
         """
@@ -179,15 +391,78 @@ class ConflictsWalker:
         else:
             return SUCCESS
 
-    def write_previous_conflict(self):
+    def end_previous_conflict(self):
         """
-        Writes the last conflict to the merged file (either the resolution or the original conflict)
+        Records, reports and logs the last seen conflict
+        """
+        self.memo_previous_conflict()
+        self.cache_previous_conflict()
+        self.record_previous_conflict()
+        self.write_previous_conflict_report()
+        self.log_previous_conflict()
+        self.conflict = None
+        self.conflict_cached = False
+
+    def replay_memo(self) -> bool:
+        """
+        Applies the outcome of an identical conflict met before by the same solver, if any
+        :return: whether the conflict was handled from the memo (it may have been left unsolved)
+        """
+        if self.memo is None:
+            return False
+        outcome = self.memo.outcomes.get((self.log_tag, self.conflict.raw))
+        if outcome is None:
+            return False
+        resolved, content = outcome
+        if resolved:
+            self.conflict.resolve(content)
+        elif content is not None:
+            self.conflict.rewrite(content)
+        self.memo.replayed += 1
+        self.conflict_cached = True
+        return True
+
+    def memo_previous_conflict(self):
+        """
+        Records the outcome of the last seen conflict in the memo
+        """
+        if self.memo is not None and self.conflict is not None and not self.conflict_cached:
+            self.memo.outcomes[(self.log_tag, self.conflict.raw)] = (self.conflict.is_resolved(),
+                                                                     self.conflict.content)
+
+    def replay_cached_resolution(self) -> bool:
+        """
+        Applies the cached resolution of the current conflict, if any
+        :return: whether the conflict was resolved or rewritten from the cache
+        """
+        if self.cache is None:
+            return False
+        key = self.cache.key(self.cache_key, self.conflict.local, self.conflict.base, self.conflict.remote)
+        cached = self.cache.get(key)
+        if cached is None:
+            return False
+        resolved, content = cached
+        if resolved:
+            self.conflict.resolve(content)
+        else:
+            self.conflict.rewrite(content)
+        self.conflict_cached = True
+        return True
+
+    def cache_previous_conflict(self):
+        """
+        Records the resolution of the last seen conflict in the cache
+        """
+        if self.cache is not None and self.conflict is not None and not self.conflict_cached:
+            if self.conflict.is_resolved() or self.conflict.is_rewritten():
+                key = self.cache.key(self.cache_key, self.conflict.local, self.conflict.base, self.conflict.remote)
+                self.cache_pending.append((key, self.conflict.is_resolved(), self.conflict.content))
+
+    def record_previous_conflict(self):
+        """
+        Records whether the last conflict remains in the merged file
         """
         if self.conflict is not None:
-            if self.conflict.is_rewritten():
-                self.merged_file.write(self.conflict.content)
-            else:
-                self.merged_file.write(self.conflict.raw)
             if not self.conflict.resolved:
                 self.has_remaining_conflicts = True
 
@@ -233,6 +508,54 @@ class ConflictsWalker:
                     print("     ✗ [" + self.log_tag + "] Unsolved")
 
 
+def index_conflicts(text: str) -> Tuple[List[ConflictBounds], Optional[Tuple[int, str]]]:
+    """
+    Finds all the conflicts in a text, in a single scan of its marker lines
+    text -- the text to scan
+    returns the bounds of each conflict (see Conflict.from_text), and if an invalid conflict was found, the offset
+    where the text stops being valid with the error message (the conflicts after it are not indexed); a conflict
+    running to the end of the text is reported with the UNTERMINATED_CONFLICT message
+    """
+    conflicts = []
+    bounds = []
+    for match in MARKER_LINE_PATTERN.finditer(text):
+        marker_start = match.start()
+        marker_end = text.find("\n", marker_start) + 1
+        if marker_end == 0:
+            marker_end = len(text)
+
+        marker = match.group()
+        if marker == CONFLICT_START:
+            # a nested start leaves the conflict invalid, which will be reported at its end
+            bounds.append(marker_start)
+            bounds.append(marker_end)
+        elif marker == CONFLICT_BASE:
+            if len(bounds) == 0:
+                return conflicts, (marker_start, "Found conflict base tag without starting tag")
+            bounds.append(marker_start)
+            bounds.append(marker_end)
+        elif marker == CONFLICT_SEP:
+            if len(bounds) == 0:
+                return conflicts, (marker_start, "Found conflict separation tag without starting tag")
+            bounds.append(marker_start)
+            bounds.append(marker_end)
+        else:
+            if len(bounds) == 0:
+                return conflicts, (marker_start, "Found conflict ending tag without starting tag")
+            if len(bounds) != 6 or not (text.startswith(CONFLICT_BASE, bounds[2])
+                                        and text.startswith(CONFLICT_SEP, bounds[4])):
+                return conflicts, (bounds[0], "Conflict is missing the base content. Try running : \n"
+                                   "$ git config --global merge.conflictstyle diff3")
+            bounds.append(marker_start)
+            bounds.append(marker_end)
+            conflicts.append(tuple(bounds))
+            bounds = []
+
+    if len(bounds) > 0:
+        return conflicts, (bounds[0], UNTERMINATED_CONFLICT)
+    return conflicts, None
+
+
 if __name__ == '__main__':
     print("This is just a utility module, not to be launched directly.")
     sys.exit(1)
@@ -3,11 +3,13 @@
 
 import argparse
 import sys
+from typing import Optional
 
-from automergetool.amt_utils import REPORT_NONE, REPORT_SOLVED, REPORT_UNSOLVED, REPORT_FULL, ConflictsWalker
+from automergetool.amt_utils import REPORT_NONE, REPORT_SOLVED, REPORT_UNSOLVED, REPORT_FULL, ConflictsWalker, \
+    ConflictDocument
 
 
-def parse_arguments():
+def parse_arguments(args: list):
     """Parses the arguments passed on invocation in a dict and return it"""
     parser = argparse.ArgumentParser(description="A tool to resolve dummy conflicts")
 
@@ -20,13 +22,23 @@ def parse_arguments():
         required=False)
     parser.add_argument('-v', '--verbose', required=False, action='store_true')
 
-    return parser.parse_args()
+    return parser.parse_args(args)
 
 
-if __name__ == '__main__':
-    args = parse_arguments()
-    walker = ConflictsWalker(args.merged, 'dbg', args.report, args.verbose)
+def solve(args: list, document: Optional[ConflictDocument] = None) -> int:
+    """
+    Solves the conflicts of the merged file
+    args -- the command line arguments
+    document -- if set, the in-memory merged file to solve, the file itself is then left untouched
+    returns the merge status (SUCCESS or ERROR_CONFLICTS)
+    """
+    parsed = parse_arguments(args)
+    walker = ConflictsWalker(parsed.merged, 'dbg', parsed.report, parsed.verbose, document)
     while walker.has_more_conflicts():
         continue
     walker.end()
-    sys.exit(walker.get_merge_status())
+    return walker.get_merge_status()
+
+
+if __name__ == '__main__':
+    sys.exit(solve(sys.argv[1:]))
@@ -3,8 +3,11 @@
 
 from argparse import ArgumentParser, Namespace
 import sys
+from typing import Optional
 
-from automergetool.amt_utils import REPORT_NONE, REPORT_SOLVED, REPORT_UNSOLVED, REPORT_FULL, ConflictsWalker
+from automergetool.amt_cache import solver_cache_key
+from automergetool.amt_utils import REPORT_NONE, REPORT_SOLVED, REPORT_UNSOLVED, REPORT_FULL, ConflictsWalker, \
+    ConflictDocument
 
 
 def parse_arguments(args: list) -> Namespace:
@@ -19,6 +22,9 @@ def parse_arguments(args: list) -> Namespace:
         default=REPORT_NONE,
         required=False)
     parser.add_argument('-v', '--verbose', required=False, action='store_true')
+    parser.add_argument(
+        '-c', '--cache', choices=['true', 'false'], default='false', required=False,
+        help="replay the resolutions recorded in the repository's cache, and record the new ones")
 
     return parser.parse_args(args)
 
@@ -36,10 +42,21 @@ def handle_conflict(conflict):
     conflict.resolve(resolution)
 
 
-if __name__ == '__main__':
-    args = parse_arguments(sys.argv[1:])
-    walker = ConflictsWalker(args.merged, 'dels', args.report, args.verbose)
+def solve(args: list, document: Optional[ConflictDocument] = None) -> int:
+    """
+    Solves the conflicts of the merged file
+    args -- the command line arguments
+    document -- if set, the in-memory merged file to solve, the file itself is then left untouched
+    returns the merge status (SUCCESS or ERROR_CONFLICTS)
+    """
+    parsed = parse_arguments(args)
+    walker = ConflictsWalker(parsed.merged, 'dels', parsed.report, parsed.verbose, document,
+                             solver_cache_key(__file__, parsed))
     while walker.has_more_conflicts():
         handle_conflict(walker.next_conflict())
     walker.end()
-    sys.exit(walker.get_merge_status())
+    return walker.get_merge_status()
+
+
+if __name__ == '__main__':
+    sys.exit(solve(sys.argv[1:]))
@@ -3,11 +3,14 @@
 
 from argparse import ArgumentParser, Namespace
 import sys
+from typing import Optional
 
-from automergetool.amt_lcs import LCSAnalyser, ListSequencer
+from automergetool.amt_lcs import LCSAnalyser, ListSequencer, STRATEGY_EXACT, STRATEGY_PATIENCE, DEFAULT_MEMORY_LIMIT, \
+    DEFAULT_MAX_CELLS
+from automergetool.amt_cache import solver_cache_key
 from automergetool.amt_utils import REPORT_NONE, REPORT_SOLVED, REPORT_UNSOLVED, REPORT_FULL, CONFLICT_BASE, \
     CONFLICT_SEP, \
-    ConflictsWalker
+    ConflictsWalker, ConflictDocument
 
 
 def parse_arguments(args: list) -> Namespace:
@@ -22,28 +25,51 @@ def parse_arguments(args: list) -> Namespace:
         default=REPORT_NONE,
         required=False)
     parser.add_argument('-v', '--verbose', required=False, action='store_true')
+    parser.add_argument(
+        '-c', '--cache', choices=['true', 'false'], default='false', required=False,
+        help="replay the resolutions recorded in the repository's cache, and record the new ones")
+    parser.add_argument('--memory', type=int, default=DEFAULT_MEMORY_LIMIT // (1024 * 1024), required=False,
+                        help="maximum size of the LCS table, in MB")
+    parser.add_argument(
+        '-s', '--strategy', choices=[STRATEGY_EXACT, STRATEGY_PATIENCE], default=STRATEGY_EXACT, required=False)
+    parser.add_argument(
+        '-d', '--max-distance', type=int, required=False, help="maximum number of lines a side can keep out of the "
+        "common lines for the conflict to be simplified")
+    parser.add_argument(
+        '--max-cells', type=int, default=DEFAULT_MAX_CELLS, required=False, help="maximum size of the LCS search, "
+        "the product of the number of differing lines of the three versions (0 for no limit)")
 
     return parser.parse_args(args)
 
 
-def handle_conflict(conflict):
-    """Handles a conflict which can be simplified"""
+def handle_conflict(conflict,
+                    memory: Optional[int] = DEFAULT_MEMORY_LIMIT // (1024 * 1024),
+                    strategy: str = STRATEGY_EXACT,
+                    max_distance: Optional[int] = None,
+                    max_cells: Optional[int] = DEFAULT_MAX_CELLS):
+    """
+    Handles a conflict which can be simplified
+    conflict -- the conflict to simplify
+    memory -- the maximum size of the LCS table in MB (None for no limit), larger conflicts are analysed in smaller
+    chunks; a conflict too large to be analysed anyway is left untouched
+    strategy -- the strategy used to align the conflict sides (see LCSAnalyser)
+    max_distance -- if set, conflicts where a side has more lines out of the common lines are left untouched, and
+    their analysis stops as soon as this is known
+    max_cells -- the maximum size of the LCS search (None for no limit), larger conflicts are left untouched
+    """
 
     # TODO override comparator to ignore \s+
     lines_local = conflict.local_lines()
     lines_base = conflict.base_lines()
     lines_remote = conflict.remote_lines()
 
-    # Prevent recursion limit
-    limit = sys.getrecursionlimit()
-    max_size = max(len(lines_base), len(lines_local), len(lines_remote))
-    # Arbitrary threshold
-    if max_size * 6 > limit:
-        return
-
     # find common lines
-    analyser = LCSAnalyser(ListSequencer())
-    result = analyser.lcs(base=lines_base, left=lines_local, right=lines_remote)
+    memory_limit = None if memory is None else memory * 1024 * 1024
+    analyser = LCSAnalyser(ListSequencer(), memory_limit, strategy, max_distance=max_distance, max_cells=max_cells)
+    try:
+        result = analyser.lcs(base=lines_base, left=lines_local, right=lines_remote)
+    except MemoryError:
+        return
 
     if len(result) == 0:
         return
@@ -66,8 +92,8 @@ def handle_conflict(conflict):
             resolution += conflict.marker_remote
 
         # write sub-sequence
-        size = len(list(sub.content))
-        for line in list(sub.content):
+        size = sub.length
+        for line in sub.content:
             resolution += line
 
         # increment indices
@@ -90,10 +116,22 @@ def handle_conflict(conflict):
     conflict.rewrite(resolution)
 
 
-if __name__ == '__main__':
-    args = parse_arguments(sys.argv[1:])
-    walker = ConflictsWalker(args.merged, 'simplify', args.report, args.verbose)
+def solve(args: list, document: Optional[ConflictDocument] = None) -> int:
+    """
+    Solves the conflicts of the merged file
+    args -- the command line arguments
+    document -- if set, the in-memory merged file to solve, the file itself is then left untouched
+    returns the merge status (SUCCESS or ERROR_CONFLICTS)
+    """
+    parsed = parse_arguments(args)
+    walker = ConflictsWalker(parsed.merged, 'simplify', parsed.report, parsed.verbose, document,
+                             solver_cache_key(__file__, parsed))
     while walker.has_more_conflicts():
-        handle_conflict(walker.next_conflict())
+        handle_conflict(walker.next_conflict(), parsed.memory, parsed.strategy, parsed.max_distance,
+                        parsed.max_cells if parsed.max_cells > 0 else None)
     walker.end()
-    sys.exit(walker.get_merge_status())
+    return walker.get_merge_status()
+
+
+if __name__ == '__main__':
+    sys.exit(solve(sys.argv[1:]))
@@ -3,9 +3,10 @@
 
 from argparse import ArgumentParser, Namespace
 
-from typing import List
+from typing import List, Optional
+from automergetool.amt_cache import solver_cache_key
 from automergetool.amt_utils import *
-from automergetool.amt_lcs import LCSAnalyser, StringSequencer, CommonSubSeq, DiffSubSeq
+from automergetool.amt_lcs import LCSAnalyser, StringSequencer, CommonSubSeq, DiffSubSeq, DEFAULT_MAX_CELLS
 
 
 def parse_arguments(args: List[str]) -> Namespace:
@@ -20,6 +21,9 @@ def parse_arguments(args: List[str]) -> Namespace:
         default=REPORT_NONE,
         required=False)
     parser.add_argument('-v', '--verbose', required=False, action='store_true')
+    parser.add_argument(
+        '-c', '--cache', choices=['true', 'false'], default='false', required=False,
+        help="replay the resolutions recorded in the repository's cache, and record the new ones")
 
     return parser.parse_args(args)
 
@@ -40,15 +44,8 @@ def handle_conflict(conflict: Conflict, prompt):
 
 # noinspection PyUnresolvedReferences
 def __handle_single_line_conflict(conflict: Conflict, base: str, local: str, remote: str, prompt):
-    # Prevent recursion limit
-    limit = sys.getrecursionlimit()
-    max_size = max(len(base), len(local), len(remote))
-    # Arbitrary threshold
-    if max_size * 6 > limit:
-        return
-
-    # find common lines
-    analyser = LCSAnalyser(StringSequencer())
+    # find common characters, long lines (eg: minified code) being left untouched
+    analyser = LCSAnalyser(StringSequencer(), max_cells=DEFAULT_MAX_CELLS)
     result = analyser.lcs_with_diff(base=base, left=local, right=remote)
 
     if len(result) == 0:
@@ -84,10 +81,21 @@ def prompt_resolution(conflict: Conflict, resolution: str, user_input=lambda msg
         return True
 
 
-if __name__ == '__main__':
-    args = parse_arguments(sys.argv[1:])
-    walker = ConflictsWalker(args.merged, 'single_line', args.report, args.verbose)
+def solve(args: list, document: Optional[ConflictDocument] = None) -> int:
+    """
+    Solves the conflicts of the merged file
+    args -- the command line arguments
+    document -- if set, the in-memory merged file to solve, the file itself is then left untouched
+    returns the merge status (SUCCESS or ERROR_CONFLICTS)
+    """
+    parsed = parse_arguments(args)
+    walker = ConflictsWalker(parsed.merged, 'single_line', parsed.report, parsed.verbose, document,
+                             solver_cache_key(__file__, parsed))
     while walker.has_more_conflicts():
         handle_conflict(walker.next_conflict(), prompt_resolution)
     walker.end()
-    sys.exit(walker.get_merge_status())
+    return walker.get_merge_status()
+
+
+if __name__ == '__main__':
+    sys.exit(solve(sys.argv[1:]))
@@ -128,11 +128,20 @@ def parse_arguments(args: list) -> Namespace:
     return parser.parse_args(args)
 
 
-if __name__ == '__main__':
-    args = parse_arguments(sys.argv[1:])
-
-    solver = KotlinImportSolver(args.order)
-    if solver.solve_import_conflicts(args.base, args.local, args.remote, args.merge):
-        sys.exit(0)
+def solve(args: list) -> int:
+    """
+    Solves the imports conflicts of the merged file
+    args -- the command line arguments
+    returns the exit code (0 if the file is conflict-free)
+    """
+    parsed = parse_arguments(args)
+
+    solver = KotlinImportSolver(parsed.order)
+    if solver.solve_import_conflicts(parsed.base, parsed.local, parsed.remote, parsed.merged):
+        return 0
     else:
-        sys.exit(1)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(solve(sys.argv[1:]))
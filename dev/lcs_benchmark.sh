@@ -0,0 +1,47 @@
+#!/bin/bash
+
+# Measures the time to compute the lcs of a single long common run (with its content), for two run lengths,
+# and fails when the longest run is more than 8 times slower while being 4 times longer (a quadratic
+# implementation would be ~16 times slower)
+SHORT_RUN=${1:-50000}
+
+# make sure we run from the root
+WD=`pwd`
+LOCAL_ROOT=`git rev-parse --show-toplevel`
+
+cd $LOCAL_ROOT
+
+python3 - $SHORT_RUN <<'PYTHON'
+import sys
+import time
+
+from automergetool.amt_lcs import LCSAnalyser, ListSequencer
+
+
+def measure_run(length: int) -> float:
+    """Returns the best time to compute the lcs of a single common run of the given length, with its content"""
+    b = ["x"] + [str(i) for i in range(length)]
+    l = ["y"] + b[1:]
+    r = ["z"] + b[1:]
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        result = LCSAnalyser(ListSequencer()).lcs(b, l, r)
+        assert len(result[0].content) == length
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+short_run = int(sys.argv[1])
+short_time = measure_run(short_run)
+long_time = measure_run(4 * short_run)
+print("lcs of a {0} items run : {1:.1f}ms, of a {2} items run : {3:.1f}ms".format(
+    short_run, short_time * 1000, 4 * short_run, long_time * 1000))
+sys.exit(0 if long_time < short_time * 8 else 1)
+PYTHON
+RESULT=$?
+
+cd $WD
+
+exit $RESULT
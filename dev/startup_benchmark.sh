@@ -0,0 +1,86 @@
+#!/bin/bash
+
+# Measures the time of an amt run solving a simple conflicted file, as launched by git for every conflicted file
+# (configuration included), against the time of a bare python interpreter starting, and fails when the best amt run
+# is more than BUDGET times slower than the best bare run (5 by default : a run took 6.5 to 7.5 times longer before
+# the startup work, and 3.7 to 4.3 times longer after, best of 20 runs)
+BUDGET=${1:-5}
+RUNS=20
+
+# make sure we run from the root
+WD=`pwd`
+LOCAL_ROOT=`git rev-parse --show-toplevel`
+
+cd $LOCAL_ROOT
+
+python3 - $BUDGET $RUNS <<'PYTHON'
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CONFLICT = "a\n<<<<<<< LOCAL\nfoo\n|||||||\n=======\nbar\n>>>>>>> REMOTE\nb\n"
+CONFIG = "[amt]\n\ttools = gen_additions\n[mergetool \"gen_additions\"]\n\torder = localfirst\n"
+AMT = "import sys; from automergetool.amt import run_main; sys.exit(run_main())"
+
+
+def measure(command: list, cwd: str, env: dict, before=None) -> float:
+    """Returns the time taken by the given command, which must succeed"""
+    if before is not None:
+        before()
+    start = time.perf_counter()
+    subprocess.check_call(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+budget = float(sys.argv[1])
+runs = int(sys.argv[2])
+with tempfile.TemporaryDirectory() as root:
+    os.mkdir(os.path.join(root, ".git"))
+    with open(os.path.join(root, ".gitconfig"), 'w'):
+        pass
+    with open(os.path.join(root, ".git", "config"), 'w') as config:
+        config.write(CONFIG)
+    merged = os.path.join(root, "file.txt")
+    files = []
+    for (option, suffix, content) in [('-b', '.base', "a\nb\n"), ('-l', '.local', "a\nfoo\nb\n"),
+                                      ('-r', '.remote', "a\nbar\nb\n"), ('-m', '', CONFLICT)]:
+        with open(merged + suffix, 'w') as f:
+            f.write(content)
+        files += [option, merged + suffix]
+
+    def reset_merged():
+        with open(merged, 'w') as f:
+            f.write(CONFLICT)
+
+    # the global configuration is kept out of the measure, and the bytecode and the repository's configuration
+    # snapshot are written by the first run, as they would be when installing amt and for the first conflicted file
+    env = dict(os.environ, HOME=root, PYTHONPATH=os.getcwd())
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    amt_command = [sys.executable, '-c', AMT] + files
+    bare_command = [sys.executable, '-c', 'pass']
+    measure(amt_command, root, env, reset_merged)
+    with open(merged) as f:
+        assert f.read() == "a\nfoo\nbar\nb\n", "amt didn't solve the conflict"
+
+    amt_times = []
+    bare_times = []
+    for _ in range(runs):
+        bare_times.append(measure(bare_command, root, env))
+        amt_times.append(measure(amt_command, root, env, reset_merged))
+
+amt_best = min(amt_times) * 1000000
+bare_best = min(bare_times) * 1000000
+ratio = amt_best / bare_best
+print("amt run : {0:.0f}µs, bare python : {1:.0f}µs, ratio : {2:.2f} (budget : {3})".format(amt_best, bare_best,
+                                                                                           ratio, budget))
+if ratio > budget:
+    print("Run amt with python3 -X importtime to find the modules to import lazily")
+    sys.exit(1)
+PYTHON
+RESULT=$?
+
+cd $WD
+
+exit $RESULT
@@ -35,5 +35,6 @@ setup(
     keywords=['git merge conflicts'],
     packages=['automergetool', 'automergetool.solvers'],
     # install_requires=['peppercorn'],
-    extras_require={'test': ['nose2', 'coverage'], },
-    entry_points={'console_scripts': ['amt = automergetool.amt:run_main', ], }, )
+    extras_require={'test': ['nose2', 'coverage'], 'numpy': ['numpy'], },
+    entry_points={'console_scripts': ['amt = automergetool.amt:run_main',
+                                      'amt-client = automergetool.amt_client:run_main', ], }, )
@@ -6,7 +6,7 @@ import argparse
 from automergetool.amt_utils import *
 
 
-def parse_arguments():
+def parse_arguments(args: list):
     """Parses the arguments passed on invocation in a dict and return it"""
     parser = argparse.ArgumentParser(description="A tool to resolve dummy conflicts")
 
@@ -18,7 +18,7 @@ def parse_arguments():
         default=REPORT_NONE,
         required=False)
 
-    return parser.parse_args()
+    return parser.parse_args(args)
 
 
 def handle_conflict(conflict):
@@ -33,10 +33,15 @@ def handle_conflict(conflict):
     # If you can't (or don't want to) resolve the conflict, leave the conflict as is
 
 
-if __name__ == '__main__':
-    args = parse_arguments()
-    walker = ConflictsWalker(args.merged, 'mwc', args.report)
+def solve(args: list, document: ConflictDocument = None) -> int:
+    """Solves the conflicts of the merged file, or of the in-memory document if one is given"""
+    parsed = parse_arguments(args)
+    walker = ConflictsWalker(parsed.merged, 'mwc', parsed.report, document=document)
     while walker.has_more_conflicts():
         handle_conflict(walker.next_conflict())
     walker.end()
-    sys.exit(walker.get_merge_status())
+    return walker.get_merge_status()
+
+
+if __name__ == '__main__':
+    sys.exit(solve(sys.argv[1:]))
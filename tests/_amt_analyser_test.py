@@ -42,6 +42,100 @@ class ConflictedFileAnalyserTest(unittest.TestCase):
         # Then
         self.assertEqual(remaining, True)
 
+    def test_empty_file(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = CFA_PATH.format('empty')
+
+        # When
+        remaining = analyser.has_remaining_conflicts(file_path)
+
+        # Then
+        self.assertEqual(remaining, False)
+
+    def test_file_with_conflict_at_start(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = CFA_PATH.format('conflict_at_start')
+
+        # When
+        remaining = analyser.has_remaining_conflicts(file_path)
+
+        # Then
+        self.assertEqual(remaining, True)
+
+    def test_file_with_markers_inside_lines(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = CFA_PATH.format('inline_markers')
+
+        # When
+        remaining = analyser.has_remaining_conflicts(file_path)
+
+        # Then
+        self.assertEqual(remaining, False)
+
+    def test_file_with_crlf_conflict(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = CFA_PATH.format('crlf_conflict')
+
+        # When
+        remaining = analyser.has_remaining_conflicts(file_path)
+
+        # Then
+        self.assertEqual(remaining, True)
+
+    def test_census_with_3_conflicts(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = CFA_PATH.format('three_conflicts')
+
+        # When
+        census = analyser.census(file_path)
+
+        # Then
+        self.assertEqual(census.file_path, file_path)
+        self.assertEqual(census.count(), 3)
+        self.assertEqual(census.size(), 1904)
+        self.assertEqual(census.conflicts, [
+            ConflictInfo(10, 16, 2, 0, 1, 335), ConflictInfo(18, 27, 2, 2, 2, 645), ConflictInfo(32, 42, 2, 3, 2, 924)
+        ])
+
+    def test_census_without_conflicts(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+
+        for file in ['no_conflicts', 'empty', 'inline_markers']:
+            # When
+            census = analyser.census(CFA_PATH.format(file))
+
+            # Then
+            self.assertEqual(census.count(), 0)
+            self.assertEqual(census.size(), 0)
+
+    def test_census_with_crlf_conflict(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = CFA_PATH.format('crlf_conflict')
+
+        # When
+        census = analyser.census(file_path)
+
+        # Then
+        self.assertEqual(census.conflicts, [ConflictInfo(2, 7, 1, 0, 1, 59)])
+
+    def test_census_without_base(self):
+        # Given
+        analyser = ConflictedFileAnalyser()
+        file_path = 'tests/data/conflict_walker/missing_base.txt'
+
+        # When
+        census = analyser.census(file_path)
+
+        # Then
+        self.assertEqual(census.conflicts, [ConflictInfo(10, 15, 2, None, 1, 327)])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from automergetool.amt_cache import *
+from automergetool.amt_utils import CacheSession, ConflictDocument, ConflictsWalker, SUCCESS
+from automergetool.solvers import gen_additions, gen_woven
+
+ADDITIONS = "a\n<<<<<<< LOCAL\nfoo\n|||||||\n=======\nbar\n>>>>>>> REMOTE\nb\n"
+ADDITIONS_TWICE = ADDITIONS + "c\n<<<<<<< HEAD\nfoo\n|||||||\n=======\nbar\n>>>>>>> other\n"
+
+
+class ResolutionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        subprocess.check_call(['git', 'init', '-q'], cwd=self.root)
+        os.mkdir(os.path.join(self.root, "src"))
+        self.merged = os.path.join(self.root, "src", "merged.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_find(self):
+        # When
+        cache = ResolutionCache.find(self.merged)
+        cache.close()
+
+        # Then
+        self.assertTrue(os.path.exists(os.path.join(self.root, ".git", CACHE_DIR, CACHE_NAME)))
+
+    def test_find_in_linked_work_tree(self):
+        # Given a work tree linked to the repository, where .git is a file
+        subprocess.check_call(['git', '-c', 'user.name=amt', '-c', 'user.email=amt@amt', 'commit', '-q',
+                               '--allow-empty', '-m', 'initial'], cwd=self.root)
+        linked = os.path.join(self.root, "linked")
+        subprocess.check_call(['git', 'worktree', 'add', '-q', linked], cwd=self.root)
+
+        # When
+        cache = ResolutionCache.find(os.path.join(linked, "merged.txt"))
+        cache.close()
+
+        # Then
+        self.assertTrue(os.path.isfile(os.path.join(linked, ".git")))
+        self.assertTrue(os.path.exists(os.path.join(self.root, ".git", CACHE_DIR, CACHE_NAME)))
+
+    def test_find_outside_repository(self):
+        # When
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResolutionCache.find(os.path.join(directory, "merged.txt"))
+
+        # Then
+        self.assertIsNone(cache)
+
+    def test_key(self):
+        # When
+        key = ResolutionCache.key("solver", "a\n", "b\n", "c\n")
+
+        # Then
+        self.assertEqual(key, ResolutionCache.key("solver", "a\n", "b\n", "c\n"))
+        self.assertNotEqual(key, ResolutionCache.key("other", "a\n", "b\n", "c\n"))
+        self.assertNotEqual(key, ResolutionCache.key("solver", "a\nb\n", "", "c\n"))
+        self.assertNotEqual(key, ResolutionCache.key("solver", "c\n", "b\n", "a\n"))
+
+    def test_put_and_get(self):
+        # Given
+        cache = ResolutionCache.find(self.merged)
+        cache.put("solved", True, "foo\n")
+        cache.put("rewritten", False, "bar\n")
+        cache.close()
+
+        # When
+        cache = ResolutionCache.find(self.merged)
+        solved = cache.get("solved")
+        rewritten = cache.get("rewritten")
+        unknown = cache.get("unknown")
+        cache.close()
+
+        # Then
+        self.assertEqual(solved, (True, "foo\n"))
+        self.assertEqual(rewritten, (False, "bar\n"))
+        self.assertIsNone(unknown)
+
+    def test_evict_least_recently_used(self):
+        # Given
+        cache = ResolutionCache(os.path.join(self.root, "cache.db"), max_entries=2)
+        now = time.time()
+        with patch('time.time', return_value=now - 4):
+            cache.put("a", True, "a\n")
+        with patch('time.time', return_value=now - 3):
+            cache.put("b", True, "b\n")
+        with patch('time.time', return_value=now - 2):
+            cache.put("c", True, "c\n")
+        with patch('time.time', return_value=now - 1):
+            cache.get("a")
+
+        # When
+        cache.evict()
+
+        # Then
+        self.assertEqual(cache.count(), 2)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        cache.close()
+
+    def test_evict_old_entries(self):
+        # Given
+        cache = ResolutionCache(os.path.join(self.root, "cache.db"), max_age=60)
+        with patch('time.time', return_value=time.time() - 120):
+            cache.put("old", True, "a\n")
+        cache.put("recent", True, "b\n")
+
+        # When
+        cache.evict()
+
+        # Then
+        self.assertIsNone(cache.get("old"))
+        self.assertIsNotNone(cache.get("recent"))
+        cache.close()
+
+    def test_solver_cache_key(self):
+        # Given
+        parsed = gen_additions.parse_arguments(['-m', 'merged.txt', '--cache', 'true', '-o', 'localfirst'])
+        remote_first = gen_additions.parse_arguments(['-m', 'merged.txt', '--cache', 'true', '-o', 'remotefirst'])
+        verbose = gen_additions.parse_arguments(['-m', 'other.txt', '--cache', 'true', '-o', 'localfirst', '-v'])
+        disabled = gen_additions.parse_arguments(['-m', 'merged.txt', '-o', 'localfirst'])
+
+        # When
+        key = solver_cache_key(gen_additions.__file__, parsed)
+
+        # Then
+        self.assertTrue(key.startswith("gen_additions.py;"))
+        self.assertNotEqual(key, solver_cache_key(gen_woven.__file__, parsed))
+        self.assertNotEqual(key, solver_cache_key(gen_additions.__file__, remote_first))
+        self.assertEqual(key, solver_cache_key(gen_additions.__file__, verbose))
+        self.assertIsNone(solver_cache_key(gen_additions.__file__, disabled))
+
+    def test_solver_cache_key_shared_modules(self):
+        # Given
+        parsed = gen_additions.parse_arguments(['-m', 'merged.txt', '--cache', 'true', '-o', 'localfirst'])
+        key = solver_cache_key(gen_additions.__file__, parsed)
+
+        # When the modules the solver is built on differ
+        with patch('automergetool.amt_cache.SHARED_MODULES', ['amt_utils.py']):
+            other_key = solver_cache_key(gen_additions.__file__, parsed)
+
+        # Then
+        self.assertNotEqual(key, other_key)
+
+    def test_replay_interactive_choice(self):
+        # Given a choice recorded for a conflict
+        with open(self.merged, 'w') as merged:
+            merged.write(ADDITIONS)
+        with patch('builtins.input', return_value='2') as user_input:
+            result = gen_additions.solve(['-m', self.merged, '--cache', 'true'])
+        self.assertEqual(result, SUCCESS)
+        self.assertEqual(user_input.call_count, 1)
+
+        # When the same conflict shows up again, twice and with other labels
+        document = ConflictDocument(ADDITIONS_TWICE)
+        with patch('builtins.input', side_effect=AssertionError("the user shouldn't be asked")):
+            result = gen_additions.solve(['-m', self.merged, '--cache', 'true'], document)
+
+        # Then
+        self.assertEqual(result, SUCCESS)
+        self.assertEqual(document.text(), "a\nfoo\nbar\nb\nc\nfoo\nbar\n")
+
+    def test_shared_cache_session(self):
+        # Given documents sharing a cache session
+        session = CacheSession()
+        documents = [ConflictDocument(ADDITIONS), ConflictDocument(ADDITIONS_TWICE)]
+        for document in documents:
+            document.cache_session = session
+
+        # When solving them with two solvers
+        with patch('automergetool.amt_cache.ResolutionCache.find', wraps=ResolutionCache.find) as find:
+            for document in documents:
+                gen_woven.solve(['-m', self.merged, '--cache', 'true'], document)
+                gen_additions.solve(['-m', self.merged, '--cache', 'true', '-o', 'localfirst'], document)
+            stored = session.cache.count()
+            session.close()
+
+        # Then the cache is only found and opened once, then saved when the session ends
+        self.assertEqual(find.call_count, 1)
+        self.assertEqual(stored, 1)
+        cache = ResolutionCache.find(self.merged)
+        self.assertEqual(cache.count(), 1)
+        cache.close()
+
+    def test_rejected_walk_not_cached(self):
+        # Given a walk resolving a conflict
+        document = ConflictDocument(ADDITIONS)
+        walker = ConflictsWalker(self.merged, 'additions', document=document, cache_key="solver")
+        while walker.has_more_conflicts():
+            walker.next_conflict().resolve("foo\n")
+
+        # When the walk is rejected
+        walker.end(apply=False)
+
+        # Then
+        cache = ResolutionCache.find(self.merged)
+        self.assertEqual(cache.count(), 0)
+        cache.close()
+
+    def test_cache_disabled(self):
+        # Given
+        with open(self.merged, 'w') as merged:
+            merged.write(ADDITIONS)
+        with patch('builtins.input', return_value='2'):
+            gen_additions.solve(['-m', self.merged])
+
+        # When
+        document = ConflictDocument(ADDITIONS)
+        with patch('builtins.input', return_value='0') as user_input:
+            gen_additions.solve(['-m', self.merged], document)
+
+        # Then
+        self.assertEqual(user_input.call_count, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, ".git", CACHE_DIR)))
+
+
+if __name__ == '__main__':
+    unittest.main()
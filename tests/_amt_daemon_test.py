@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from automergetool.amt_client import *
+from automergetool.amt_daemon import AMTDaemon
+from automergetool.amt_utils import SUCCESS, ERROR_INVOCATION
+
+CONFIG = """[amt]
+    tools = gen_additions
+[mergetool "gen_additions"]
+    order = {0}
+    interactive = {1}
+"""
+
+ADDITIONS = "a\n<<<<<<< LOCAL\nfoo\n|||||||\n=======\nbar\n>>>>>>> REMOTE\nb\n"
+
+
+class AMTDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.git_dir = os.path.join(self.root, ".git")
+        os.mkdir(self.git_dir)
+        self.global_config = os.path.join(self.root, "gitconfig")
+        with open(self.global_config, 'w'):
+            pass
+        self.write_config('localfirst')
+        self.patchers = [patch('automergetool.amt.GLOBAL_CONFIG', self.global_config),
+                         patch('automergetool.amt_daemon.GLOBAL_CONFIG', self.global_config)]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.directory.cleanup()
+
+    def write_config(self, order: str, mtime: float = None, interactive: bool = False):
+        path = os.path.join(self.git_dir, "config")
+        with open(path, 'w') as config:
+            config.write(CONFIG.format(order, str(interactive).lower()))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def merge_request(self, name: str) -> dict:
+        merged = os.path.join(self.root, name)
+        with open(merged, 'w') as file:
+            file.write(ADDITIONS)
+        return {'command': CMD_MERGE, 'base': merged + ".base", 'local': merged + ".local",
+                'remote': merged + ".remote", 'merged': merged}
+
+    def start_daemon(self, idle_timeout: float = 10) -> threading.Thread:
+        daemon = AMTDaemon(self.git_dir, idle_timeout)
+        thread = threading.Thread(target=daemon.serve)
+        thread.start()
+        for _ in range(100):
+            if os.path.exists(daemon_socket_path(self.git_dir)):
+                break
+            time.sleep(0.05)
+        return thread
+
+    def test_merge_and_stop(self):
+        # Given
+        thread = self.start_daemon()
+
+        # When
+        response = send_request(self.git_dir, self.merge_request("merged.txt"))
+        stop_response = send_request(self.git_dir, {'command': CMD_STOP})
+        thread.join(5)
+
+        # Then
+        self.assertEqual(response['status'], SUCCESS)
+        self.assertIn(" [AMT] * Cleaning up reports", response['output'])
+        with open(os.path.join(self.root, "merged.txt")) as merged:
+            self.assertEqual(merged.read(), "a\nfoo\nbar\nb\n")
+        self.assertEqual(stop_response['status'], SUCCESS)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(daemon_socket_path(self.git_dir)))
+
+    def test_reload_changed_config(self):
+        # Given
+        thread = self.start_daemon()
+        send_request(self.git_dir, self.merge_request("first.txt"))
+
+        # When
+        self.write_config('remotefirst', time.time() + 10)
+        response = send_request(self.git_dir, self.merge_request("second.txt"))
+        send_request(self.git_dir, {'command': CMD_STOP})
+        thread.join(5)
+
+        # Then
+        self.assertEqual(response['status'], SUCCESS)
+        with open(os.path.join(self.root, "first.txt")) as merged:
+            self.assertEqual(merged.read(), "a\nfoo\nbar\nb\n")
+        with open(os.path.join(self.root, "second.txt")) as merged:
+            self.assertEqual(merged.read(), "a\nbar\nfoo\nb\n")
+
+    def test_interactive_chain_merged_locally(self):
+        # Given
+        self.write_config('ask', interactive=True)
+        thread = self.start_daemon()
+
+        # When
+        response = send_request(self.git_dir, self.merge_request("merged.txt"))
+        send_request(self.git_dir, {'command': CMD_STOP})
+        thread.join(5)
+
+        # Then
+        self.assertIsNone(response)
+        with open(os.path.join(self.root, "merged.txt")) as merged:
+            self.assertEqual(merged.read(), ADDITIONS)
+
+    def test_truncated_response(self):
+        # Given a server which doesn't reply
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(daemon_socket_path(self.git_dir))
+        server.listen(1)
+
+        # When
+        with server, patch('automergetool.amt_client.receive_message', side_effect=[["0"], ["x", ""]]):
+            first_response = send_request(self.git_dir, self.merge_request("merged.txt"))
+            second_response = send_request(self.git_dir, self.merge_request("merged.txt"))
+
+        # Then
+        self.assertIsNone(first_response)
+        self.assertIsNone(second_response)
+
+    @patch('sys.stdout')
+    def test_idle_timeout(self, stdout):
+        # When
+        result = AMTDaemon(self.git_dir, 0.1).serve()
+
+        # Then
+        self.assertEqual(result, SUCCESS)
+        self.assertFalse(os.path.exists(daemon_socket_path(self.git_dir)))
+
+    @patch('sys.stdout')
+    def test_already_running(self, stdout):
+        # Given
+        thread = self.start_daemon()
+
+        # When
+        result = AMTDaemon(self.git_dir).serve()
+        send_request(self.git_dir, {'command': CMD_STOP})
+        thread.join(5)
+
+        # Then
+        self.assertEqual(result, ERROR_INVOCATION)
+
+    def test_no_daemon(self):
+        # When
+        response = send_request(self.git_dir, {'command': CMD_STOP})
+
+        # Then
+        self.assertIsNone(response)
+
+
+class AMTClientTest(unittest.TestCase):
+    def test_parse_arguments(self):
+        # When
+        request = parse_arguments(['-b', 'b', '--local', 'l', '-r', 'r', '-m', 'm'])
+
+        # Then
+        self.assertEqual(request, {'command': CMD_MERGE, 'base': os.path.abspath('b'), 'local': os.path.abspath('l'),
+                                   'remote': os.path.abspath('r'), 'merged': os.path.abspath('m')})
+
+    def test_parse_unexpected_arguments(self):
+        self.assertIsNone(parse_arguments(['-b', 'b', '-l', 'l', '-r', 'r']))
+        self.assertIsNone(parse_arguments(['-b', 'b', '-l', 'l', '-r', 'r', '-m']))
+        self.assertIsNone(parse_arguments(['-b', 'b', '-l', 'l', '-r', 'r', '-m', 'm', '--subprocess', 'x']))
+
+    def test_find_git_dir(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, ".git"))
+            os.mkdir(os.path.join(directory, "src"))
+
+            self.assertEqual(find_git_dir(os.path.join(directory, "src")), os.path.join(directory, ".git"))
+
+    def test_fallback_without_daemon(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, ".git"))
+            merged = os.path.join(directory, "merged.txt")
+            argv = ['amt-client', '-b', 'b', '-l', 'l', '-r', 'r', '-m', merged]
+
+            with patch('sys.argv', argv), patch('automergetool.amt.run_main', return_value=42) as amt_main:
+                result = run_main()
+
+        self.assertEqual(result, 42)
+        amt_main.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import subprocess
+import tempfile
+import unittest
+from configparser import ConfigParser
+from unittest.mock import patch
+
+from automergetool.amt import *
+from automergetool.amt_git import *
+from automergetool.amt_utils import ConflictDocument
+
+
+class GitRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.directory.name)
+        create_conflicted_repository(self.root)
+        self.repository = GitRepository(self.root)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_find(self):
+        # When
+        repository = GitRepository.find(os.path.join(self.root, "sub"))
+
+        # Then
+        self.assertEqual(repository.root, self.root)
+
+    def test_find_outside_repository(self):
+        # When
+        repository = GitRepository.find(os.path.dirname(self.root))
+
+        # Then
+        self.assertIsNone(repository)
+
+    def test_unmerged_files(self):
+        # When
+        unmerged = self.repository.unmerged_files()
+
+        # Then
+        self.assertEqual([u.path for u in unmerged], ["deleted.txt", "sub/added.txt", "sub/replaced.txt"])
+        self.assertEqual(sorted(unmerged[0].stages.keys()), [STAGE_BASE, STAGE_LOCAL])
+        self.assertFalse(unmerged[0].is_content_conflict())
+        self.assertEqual(sorted(unmerged[1].stages.keys()), [STAGE_BASE, STAGE_LOCAL, STAGE_REMOTE])
+        self.assertTrue(unmerged[1].is_content_conflict())
+
+    def test_add(self):
+        # When
+        self.repository.add("sub/added.txt")
+
+        # Then
+        self.assertEqual([u.path for u in self.repository.unmerged_files()], ["deleted.txt", "sub/replaced.txt"])
+
+    def test_blob_reader_read_all(self):
+        # Given
+        blob_ids = [blob_id for unmerged in self.repository.unmerged_files()
+                    for (stage, blob_id) in sorted(unmerged.stages.items())]
+
+        # When
+        with self.repository.blob_reader() as reader:
+            blobs = list(reader.read_all(blob_ids + blob_ids))
+
+        # Then
+        expected = [b"d\n", b"e\n", b"a\n", b"a\nlocal\n", b"a\nremote\n", b"x\n", b"y\n", b"z\n"]
+        self.assertEqual(blobs, expected + expected)
+
+    def test_blob_reader_read_all_many(self):
+        # Given
+        blob_id = self.repository.unmerged_files()[1].stages[STAGE_BASE]
+
+        # When
+        with self.repository.blob_reader() as reader:
+            blobs = list(reader.read_all([blob_id] * 50000))
+
+        # Then
+        self.assertEqual(blobs, [b"a\n"] * 50000)
+
+    def test_blob_reader_partially_read(self):
+        # Given
+        blob_id = self.repository.unmerged_files()[1].stages[STAGE_BASE]
+
+        # When
+        with self.repository.blob_reader() as reader:
+            blobs = reader.read_all([blob_id] * 50000)
+            first = next(blobs)
+
+        # Then
+        self.assertEqual(first, b"a\n")
+
+    def test_blob_reader_missing_blob(self):
+        with self.repository.blob_reader() as reader:
+            with self.assertRaises(RuntimeError):
+                list(reader.read_all(["0123456789012345678901234567890123456789"]))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_all(self, stdout):
+        # Given
+        cfg = additions_config()
+
+        # When
+        result = merge_all(cfg, self.repository, ToolsLauncher(cfg), ConflictedFileAnalyser())
+
+        # Then
+        self.assertEqual(result, ERROR_CONFLICTS)
+        with open(os.path.join(self.root, "sub", "added.txt")) as merged:
+            self.assertEqual(merged.read(), "a\nlocal\nremote\n")
+        self.assertEqual([u.path for u in self.repository.unmerged_files()], ["deleted.txt", "sub/replaced.txt"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "sub"))), ["added.txt", "replaced.txt"])
+        self.assertTrue(stdout.getvalue().endswith(" [AMT] ✗ deleted.txt : deleted on one side\n"
+                                                   " [AMT] ✓ sub/added.txt : merged\n"
+                                                   " [AMT] ✗ sub/replaced.txt : conflicts remaining\n"
+                                                   " [AMT] 1/3 file(s) merged\n"))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_all_duplicated_conflicts(self, stdout):
+        # Given
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.realpath(directory)
+            create_conflicted_repository(root, duplicated=True)
+            repository = GitRepository(root)
+
+            # When
+            result = merge_all(additions_config(), repository, ToolsLauncher(additions_config()),
+                               ConflictedFileAnalyser())
+
+            # Then
+            self.assertEqual(result, ERROR_CONFLICTS)
+            with open(os.path.join(root, "sub", "copy.txt")) as merged:
+                self.assertEqual(merged.read(), "a\nlocal\nremote\n")
+            self.assertEqual([u.path for u in repository.unmerged_files()], ["deleted.txt", "sub/replaced.txt"])
+            self.assertTrue(stdout.getvalue().endswith(" [AMT] ✓ sub/copy.txt : merged\n"
+                                                       " [AMT] ✗ sub/replaced.txt : conflicts remaining\n"
+                                                       " [AMT] 1 duplicate conflict(s), 1 solver call(s) saved\n"
+                                                       " [AMT] 2/4 file(s) merged\n"))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_all_duplicated_conflicts_in_parallel(self, stdout):
+        # Given
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.realpath(directory)
+            create_conflicted_repository(root, duplicated=True)
+            repository = GitRepository(root)
+
+            # When
+            result = merge_all(additions_config(), repository, ToolsLauncher(additions_config()),
+                               ConflictedFileAnalyser(), jobs=2)
+
+            # Then
+            self.assertEqual(result, ERROR_CONFLICTS)
+            self.assertEqual(stdout.getvalue(), " [AMT] ✗ deleted.txt : deleted on one side\n"
+                                                " [AMT] ✓ sub/added.txt : merged\n"
+                                                " [AMT] ✓ sub/copy.txt : merged\n"
+                                                " [AMT] ✗ sub/replaced.txt : conflicts remaining\n"
+                                                " [AMT] 1 duplicate conflict(s), 1 solver call(s) saved\n"
+                                                " [AMT] 2/4 file(s) merged\n")
+
+    def test_write_versions_failure(self):
+        # Given a file which versions can't be written after another one's
+        added = self.repository.unmerged_files()[1]
+        missing = UnmergedFile(os.path.join("missing", "added.txt"), added.stages)
+
+        # When
+        with self.assertRaises(OSError):
+            write_versions(self.repository, [added, missing])
+
+        # Then
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "sub"))), ["added.txt", "replaced.txt"])
+
+    def test_group_identical_conflicts(self):
+        # Given
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.realpath(directory)
+            create_conflicted_repository(root, duplicated=True)
+            paths = [os.path.join(root, "sub", name) for name in ["replaced.txt", "added.txt", "copy.txt"]]
+            documents = [read_document(path) for path in paths + [paths[1], os.path.join(root, "missing.txt")]]
+
+            # When
+            groups, duplicates = group_identical_conflicts(documents)
+
+        # Then
+        self.assertEqual(groups, [[0], [1, 2, 3], [4]])
+        self.assertEqual(duplicates, 2)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_all_reads_files_once(self, stdout):
+        # Given
+        cfg = additions_config()
+
+        # When
+        with patch.object(ConflictDocument, 'load', wraps=ConflictDocument.load) as load:
+            result = merge_all(cfg, self.repository, ToolsLauncher(cfg), ConflictedFileAnalyser())
+
+        # Then
+        self.assertEqual(result, ERROR_CONFLICTS)
+        self.assertEqual(sorted(call[0][0] for call in load.call_args_list),
+                         [os.path.join(self.root, "sub", "added.txt"), os.path.join(self.root, "sub", "replaced.txt")])
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_all_in_parallel(self, stdout):
+        # Given
+        cfg = additions_config()
+
+        # When
+        result = merge_all(cfg, self.repository, ToolsLauncher(cfg), ConflictedFileAnalyser(), jobs=3)
+
+        # Then
+        self.assertEqual(result, ERROR_CONFLICTS)
+        with open(os.path.join(self.root, "sub", "added.txt")) as merged:
+            self.assertEqual(merged.read(), "a\nlocal\nremote\n")
+        self.assertEqual([u.path for u in self.repository.unmerged_files()], ["deleted.txt", "sub/replaced.txt"])
+        self.assertEqual(stdout.getvalue(), " [AMT] ✗ deleted.txt : deleted on one side\n"
+                                            " [AMT] ✓ sub/added.txt : merged\n"
+                                            " [AMT] ✗ sub/replaced.txt : conflicts remaining\n"
+                                            " [AMT] 1/3 file(s) merged\n")
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_all_interactive_in_main_process(self, stdout):
+        # Given
+        cfg = additions_config(interactive=True)
+
+        # When
+        with patch('concurrent.futures.ProcessPoolExecutor') as executor:
+            result = merge_all(cfg, self.repository, ToolsLauncher(cfg), ConflictedFileAnalyser(), jobs=3)
+
+        # Then
+        self.assertEqual(result, ERROR_CONFLICTS)
+        executor.return_value.__enter__.return_value.submit.assert_not_called()
+        with open(os.path.join(self.root, "sub", "added.txt")) as merged:
+            self.assertEqual(merged.read(), "a\nlocal\nremote\n")
+        self.assertTrue(stdout.getvalue().endswith(" [AMT] ✓ sub/added.txt : merged\n"
+                                                   " [AMT] ✗ sub/replaced.txt : conflicts remaining\n"
+                                                   " [AMT] 1/3 file(s) merged\n"))
+
+
+def additions_config(interactive: bool = False) -> ConfigParser:
+    cfg = ConfigParser()
+    cfg.optionxform = str
+    cfg.add_section(SECT_AMT)
+    cfg.set(SECT_AMT, OPT_TOOLS, 'gen_additions')
+    cfg.add_section('mergetool "gen_additions"')
+    cfg.set('mergetool "gen_additions"', 'order', 'localfirst')
+    cfg.set('mergetool "gen_additions"', 'interactive', str(interactive).lower())
+    return cfg
+
+
+def git(directory: str, *args: str):
+    subprocess.check_call(['git', '-c', 'user.name=AMT', '-c', 'user.email=amt@example.com'] + list(args),
+                          cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def write(directory: str, path: str, content: str):
+    with open(os.path.join(directory, path), 'w') as f:
+        f.write(content)
+
+
+def create_conflicted_repository(directory: str, duplicated: bool = False):
+    """
+    Creates a repository in the middle of a merge, with an added/added, a modified/modified and a modified/deleted
+    conflicts
+    duplicated -- whether a copy of the file with the added/added conflict is merged too
+    """
+    git(directory, 'init', '-q')
+    git(directory, 'config', 'merge.conflictstyle', 'diff3')
+    os.mkdir(os.path.join(directory, "sub"))
+    write(directory, "sub/added.txt", "a\n")
+    if duplicated:
+        write(directory, "sub/copy.txt", "a\n")
+    write(directory, "sub/replaced.txt", "x\n")
+    write(directory, "deleted.txt", "d\n")
+    git(directory, 'add', '.')
+    git(directory, 'commit', '-q', '-m', 'base')
+
+    git(directory, 'checkout', '-q', '-b', 'other')
+    write(directory, "sub/added.txt", "a\nremote\n")
+    if duplicated:
+        write(directory, "sub/copy.txt", "a\nremote\n")
+    write(directory, "sub/replaced.txt", "z\n")
+    git(directory, 'rm', '-q', 'deleted.txt')
+    git(directory, 'commit', '-q', '-a', '-m', 'remote')
+
+    git(directory, 'checkout', '-q', '-')
+    write(directory, "sub/added.txt", "a\nlocal\n")
+    if duplicated:
+        write(directory, "sub/copy.txt", "a\nlocal\n")
+    write(directory, "sub/replaced.txt", "y\n")
+    write(directory, "deleted.txt", "e\n")
+    git(directory, 'commit', '-q', '-a', '-m', 'local')
+
+    with open(os.devnull, 'w') as devnull:
+        subprocess.call(['git', '-c', 'user.name=AMT', '-c', 'user.email=amt@example.com', 'merge', 'other'],
+                        cwd=directory, stdout=devnull, stderr=devnull)
+
+
+if __name__ == '__main__':
+    unittest.main()
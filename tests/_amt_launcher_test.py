@@ -84,6 +84,83 @@ class ToolsLauncherTest(unittest.TestCase):
         # Then
         self.assertTrue(trust)
 
+    def test_get_tool_settings_resolved_once(self):
+        # Given
+        cfg = ConfigParser()
+        cfg.optionxform = str
+        cfg.add_section(FAKE_TOOL_SECTION)
+        cfg.set(FAKE_TOOL_SECTION, OPT_CMD, 'blu $MERGED')
+        cfg.set(FAKE_TOOL_SECTION, OPT_EXTENSIONS, 'txt;md')
+        launcher = ToolsLauncher(cfg)
+
+        # When
+        settings = launcher.get_tool_settings(FAKE_TOOL)
+        cfg.set(FAKE_TOOL_SECTION, OPT_CMD, 'bla $MERGED')
+
+        # Then
+        self.assertEqual(settings.cmd, 'blu $MERGED')
+        self.assertFalse(settings.trust)
+        self.assertEqual(settings.extensions, ['txt', 'md'])
+        self.assertIsNone(settings.ignored_extensions)
+        self.assertIs(launcher.get_tool_settings(FAKE_TOOL), settings)
+        self.assertEqual(launcher.get_tool_cmd(FAKE_TOOL), 'blu $MERGED')
+
+    def test_get_tool_settings_given(self):
+        # Given
+        settings = ToolSettings('blu $MERGED', True, None, ['java'], False)
+        launcher = ToolsLauncher(None, {FAKE_TOOL: settings})
+
+        # When
+        cmd = launcher.get_tool_cmd(FAKE_TOOL)
+        trust = launcher.get_tool_trust(FAKE_TOOL)
+        ignored_extensions = launcher.get_tool_ignored_extensions(FAKE_TOOL)
+
+        # Then
+        self.assertEqual(cmd, 'blu $MERGED')
+        self.assertTrue(trust)
+        self.assertEqual(ignored_extensions, ['java'])
+
+    def test_get_tool_interactive(self):
+        # Given
+        cfg = ConfigParser()
+        cfg.optionxform = str
+        cfg.add_section('mergetool "gen_simplify"')
+        cfg.set('mergetool "gen_simplify"', OPT_INTERACTIVE, 'true')
+        cfg.add_section(FAKE_TOOL_SECTION)
+        cfg.set(FAKE_TOOL_SECTION, OPT_INTERACTIVE, 'false')
+        launcher = ToolsLauncher(cfg)
+
+        # Then
+        self.assertTrue(launcher.get_tool_interactive('meld'))
+        self.assertFalse(launcher.get_tool_interactive('gen_woven'))
+        self.assertTrue(launcher.get_tool_interactive('gen_simplify'))
+        self.assertFalse(launcher.get_tool_interactive(FAKE_TOOL))
+        self.assertNotIn(OPT_INTERACTIVE, launcher.get_tool_cmd('gen_simplify'))
+
+    def test_get_plan(self):
+        # Given
+        cfg = ConfigParser()
+        cfg.optionxform = str
+        cfg.add_section(FAKE_TOOL_SECTION)
+        cfg.set(FAKE_TOOL_SECTION, OPT_IGNORED_EXTENSIONS, 'txt')
+        launcher = ToolsLauncher(cfg)
+        tools = ['java_imports', FAKE_TOOL, 'gen_debug', '']
+
+        # When
+        plan = launcher.get_plan(tools, 'txt')
+
+        # Then
+        self.assertEqual([planned.tool for planned in plan], tools)
+        self.assertEqual(plan[0].skip_reason, "bad extension : txt")
+        self.assertEqual(plan[1].skip_reason, "ignoring extension : txt")
+        self.assertIsNone(plan[1].cmd)
+        self.assertIsNone(plan[2].skip_reason)
+        self.assertEqual(plan[2].cmd, launcher.get_tool_cmd('gen_debug'))
+        self.assertTrue(plan[2].trust)
+        self.assertIsNone(plan[3].cmd)
+        self.assertIs(launcher.get_plan(tools, 'txt'), plan)
+        self.assertIsNone(launcher.get_plan(tools, 'java')[0].skip_reason)
+
     def test_get_tool_extensions_none(self):
         # Given
         cfg = ConfigParser()
@@ -235,6 +312,41 @@ class ToolsLauncherTest(unittest.TestCase):
         # Then
         self.assertEqual(cmd, interpreter + ' /toto -m $MERGED --breakfast bacon')
 
+    def test_get_solver_args_known(self):
+        # Given
+        cfg = ConfigParser()
+        cfg.add_section('mergetool "gen_simplify"')
+        cfg.set('mergetool "gen_simplify"', 'strategy', 'patience')
+        launcher = ToolsLauncher(cfg)
+        cmd = launcher.get_tool_cmd('gen_simplify').replace('$MERGED', '/dev/null/merged')
+
+        # When
+        args = ToolsLauncher.get_solver_args('gen_simplify', cmd)
+
+        # Then
+        self.assertEqual(args, ['-m', '/dev/null/merged', '--strategy', 'patience'])
+
+    def test_get_solver_args_custom_path(self):
+        # Given
+        cfg = ConfigParser()
+        cfg.add_section('mergetool "gen_debug"')
+        cfg.set('mergetool "gen_debug"', 'path', '/toto')
+        launcher = ToolsLauncher(cfg)
+        cmd = launcher.get_tool_cmd('gen_debug')
+
+        # When
+        args = ToolsLauncher.get_solver_args('gen_debug', cmd)
+
+        # Then
+        self.assertIsNone(args)
+
+    def test_get_solver_args_unknown(self):
+        # When
+        args = ToolsLauncher.get_solver_args(FAKE_TOOL, sys.executable + ' ' + KNOWN_PATHS['gen_debug'])
+
+        # Then
+        self.assertIsNone(args)
+
     def test_sanitize_command_simple(self):
         # Given
         cfg = ConfigParser()
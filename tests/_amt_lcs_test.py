@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
+import subprocess
+import sys
 import unittest
+from unittest.mock import patch
 
 from automergetool.amt_lcs import *
 
@@ -21,6 +25,21 @@ class StringSequencerQuoted(StringSequencer):
         return "‘" + str(item) + "’"
 
 
+class StringSequencerCounted(StringSequencer):
+    def __init__(self):
+        super().__init__()
+        self.boxed = 0
+
+    def box(self, item: str):
+        self.boxed += 1
+        return super().box(item)
+
+
+class StringSequencerLowerKey(StringSequencer):
+    def item_key(self, item: str):
+        return item.lower()
+
+
 class LCSTest(unittest.TestCase):
     def test_empty(self):
         """Tests LCS for 3 empty strings"""
@@ -87,6 +106,24 @@ class LCSTest(unittest.TestCase):
         ]
         self.assertEqual(result, expected)
 
+    def test_custom_item_key(self):
+        """Tests LCS for 3 simple strings with custom item key"""
+        # Given strings to compare
+        a = LCSAnalyser(StringSequencerLowerKey())
+        b = "Hell, this is a bad one !"
+        l = "He called-on me."
+        r = "Hey Li, look out !"
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        expected = [
+            CommonSubSeq("He", 0, 0, 0), CommonSubSeq("l", 2, 5, 4), CommonSubSeq("l", 3, 6, 8),
+            CommonSubSeq("o", 20, 10, 13), CommonSubSeq(" ", 23, 12, 16)
+        ]
+        self.assertEqual(result, expected)
+
     def test_custom_box(self):
         """Tests LCS for 3 simple strings with custom boxing"""
         # Given strings to compare
@@ -117,6 +154,25 @@ class LCSTest(unittest.TestCase):
         expected = [CommonSubSeq("T;E;S;T", 3, 4, 0)]
         self.assertEqual(result, expected)
 
+    def test_lazy_content(self):
+        """Tests LCS results only compute their content when read"""
+        # Given strings to compare
+        sequencer = StringSequencerCounted()
+        a = LCSAnalyser(sequencer)
+        b = "contestant"
+        l = "rightest"
+        r = "testing"
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        self.assertEqual(sequencer.boxed, 0)
+        self.assertEqual(result[0].length, 4)
+        self.assertEqual(result[0].content, "test")
+        self.assertEqual(sequencer.boxed, 4)
+        self.assertFalse(hasattr(result[0], '__dict__'))
+
     def test_reorder(self):
         """Tests LCS for 3 simple strings, checking different order (commutativity)"""
         # Given strings to compare
@@ -136,6 +192,273 @@ class LCSTest(unittest.TestCase):
         self.assertEqual(result, list(map(extract, a.lcs(r, b, l))))
         self.assertEqual(result, list(map(extract, a.lcs(r, l, b))))
 
+    def test_long_sequences(self):
+        """Tests LCS for 3 lists with hundreds of items"""
+        # Given lists to compare
+        a = LCSAnalyser(ListSequencer())
+        b = list(range(0, 600, 2))
+        l = list(range(0, 600, 4))
+        r = list(range(0, 600, 8))
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        expected = [CommonSubSeq([x], x // 2, x // 4, x // 8) for x in range(0, 600, 8)]
+        self.assertEqual(result, expected)
+
+    def test_common_prefix_and_suffix(self):
+        """Tests LCS for 3 long lists only differing in the middle"""
+        # Given lists to compare
+        a = LCSAnalyser(ListSequencer())
+        prefix = ["p" + str(x) for x in range(1000)]
+        suffix = ["s" + str(x) for x in range(1000)]
+        b = prefix + ["b", "x"] + suffix
+        l = prefix + ["l", "x", "y"] + suffix
+        r = prefix + ["x"] + suffix
+
+        # When computing lcs
+        result = a.lcs_with_diff(b, l, r)
+
+        # Then
+        expected = [
+            CommonSubSeq(prefix, 0, 0, 0),
+            DiffSubSeq(["b"], ["l"], [], 1000, 1000, 1000),
+            CommonSubSeq(["x"], 1001, 1001, 1000),
+            DiffSubSeq([], ["y"], [], 1002, 1002, 1001),
+            CommonSubSeq(suffix, 1002, 1003, 1001)
+        ]
+        self.assertEqual(result, expected)
+
+    def test_patience(self):
+        """Tests LCS with the patience strategy aligns lists on unique items"""
+        # Given lists to compare
+        a = LCSAnalyser(ListSequencer(), strategy=STRATEGY_PATIENCE)
+        b = ["unique", "}", "}", "}"]
+        l = ["}", "}", "}", "unique"]
+        r = ["}", "}", "}", "unique"]
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        self.assertEqual(result, [CommonSubSeq(["unique"], 0, 3, 3)])
+
+    def test_patience_between_anchors(self):
+        """Tests LCS with the patience strategy aligns the items between anchors"""
+        # Given lists to compare
+        a = LCSAnalyser(ListSequencer(), strategy=STRATEGY_PATIENCE)
+        b = ["a", "x", "b", "def foo", "c", "y", "def bar", "z"]
+        l = ["x", "a", "def foo", "y", "c", "def bar", "z", "z"]
+        r = ["a", "b", "x", "def foo", "c", "def bar", "y", "z"]
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        expected = [
+            CommonSubSeq(["x"], 1, 0, 2), CommonSubSeq(["def foo"], 3, 2, 3), CommonSubSeq(["c"], 4, 4, 4),
+            CommonSubSeq(["def bar"], 6, 5, 5), CommonSubSeq(["z"], 7, 7, 7)
+        ]
+        self.assertEqual(result, expected)
+
+    def test_patience_many_anchors(self):
+        """Tests LCS with the patience strategy chains thousands of unique items"""
+        # Given lists to compare, with a block moved on each side
+        a = LCSAnalyser(ListSequencer(), strategy=STRATEGY_PATIENCE)
+        b = ["line " + str(i) for i in range(5000)]
+        l = b[1000:1100] + b[:1000] + b[1100:]
+        r = b[:4000] + b[4100:] + b[4000:4100]
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        expected = [CommonSubSeq(b[:1000], 0, 100, 0), CommonSubSeq(b[1100:4000], 1100, 1100, 1100),
+                    CommonSubSeq(b[4100:], 4100, 4100, 4000)]
+        self.assertEqual(result, expected)
+
+    def test_unknown_strategy(self):
+        """Tests the analyser rejects unknown strategies"""
+        with self.assertRaises(ValueError):
+            LCSAnalyser(ListSequencer(), strategy="foo")
+
+    def test_same_base_and_left(self):
+        """Tests LCS when the left is the same as the base"""
+        # Given strings to compare
+        a = LCSAnalyser(StringSequencer())
+        b = "contestant"
+        l = "contestant"
+        r = "testing"
+
+        # When computing lcs
+        result = a.lcs_with_diff(b, l, r)
+
+        # Then
+        expected = [
+            DiffSubSeq("con", "con", "", 0, 0, 0),
+            CommonSubSeq("test", 3, 3, 0),
+            DiffSubSeq("a", "a", "i", 7, 7, 4),
+            CommonSubSeq("n", 8, 8, 5),
+            DiffSubSeq("t", "t", "g", 9, 9, 6)
+        ]
+        self.assertEqual(result, expected)
+
+    def test_same_left_and_right(self):
+        """Tests LCS when the left is the same as the right, on long lists"""
+        # Given lists to compare
+        a = LCSAnalyser(ListSequencer())
+        b = list(range(0, 6000, 2))
+        l = list(range(0, 6000, 3))
+        r = list(range(0, 6000, 3))
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        expected = [CommonSubSeq([x], x // 2, x // 3, x // 3) for x in range(0, 6000, 6)]
+        self.assertEqual(result, expected)
+
+    def test_memory_limit(self):
+        """Tests LCS for 3 medium strings with a memory limit smaller than the whole table"""
+        # Given strings to compare
+        a = LCSAnalyser(StringSequencer(), memory_limit=256)
+        b = "Hell, this is a bad one !"
+        l = "He called-on me."
+        r = "Hey Bill, cook !"
+
+        # When computing lcs
+        result = a.lcs(b, l, r)
+
+        # Then
+        expected = [
+            CommonSubSeq("He", 0, 0, 0), CommonSubSeq("ll", 2, 5, 6), CommonSubSeq("o", 20, 10, 12),
+            CommonSubSeq(" ", 23, 12, 14)
+        ]
+        self.assertEqual(result, expected)
+
+    def test_memory_limit_same_length(self):
+        """Tests LCS with a memory limit finds a sub-sequence as long as the one without limit"""
+        # Given strings to compare
+        b = "acegikmoqsuwyacegikmoqsuwy"
+        l = "abdeghjkmnpqstvwyzabdeghjk"
+        r = "bcdfghjklnoprstvwxbcdfghjk"
+
+        # When computing lcs
+        result = LCSAnalyser(StringSequencer()).lcs(b, l, r)
+        result_limited = LCSAnalyser(StringSequencer(), memory_limit=1024).lcs(b, l, r)
+
+        # Then
+        extract = lambda x: x.content
+        self.assertEqual(len("".join(map(extract, result_limited))), len("".join(map(extract, result))))
+        for css in result_limited:
+            self.assertEqual(b[css.pos_b:css.pos_b + len(css.content)], css.content)
+            self.assertEqual(l[css.pos_l:css.pos_l + len(css.content)], css.content)
+            self.assertEqual(r[css.pos_r:css.pos_r + len(css.content)], css.content)
+
+    @unittest.skipIf(load_numpy() is None, "NumPy is not installed")
+    @patch('automergetool.amt_lcs.NUMPY_MIN_CELLS', 0)
+    def test_numpy_same_result(self):
+        """Tests LCS computed with NumPy is the same as the pure python one"""
+        # Given strings to compare
+        b = "acegikmoqsuwyacegikmoqsuwy"
+        l = "abdeghjkmnpqstvwyzabdeghjk"
+        r = "bcdfghjklnoprstvwxbcdfghjk"
+
+        for memory_limit in [None, 1024]:
+            # When computing lcs
+            result = LCSAnalyser(StringSequencer(), memory_limit, use_numpy=True).lcs_with_diff(b, l, r)
+            result_python = LCSAnalyser(StringSequencer(), memory_limit, use_numpy=False).lcs_with_diff(b, l, r)
+
+            # Then
+            self.assertEqual(result, result_python)
+
+    def test_max_distance(self):
+        """Tests LCS with a max distance reached by the sequences"""
+        # Given strings to compare
+        b = "Hell, this is a bad one !"
+        l = "He called-on me."
+        r = "Hey Bill, cook !"
+
+        # When computing lcs
+        result = LCSAnalyser(StringSequencer(), max_distance=19).lcs(b, l, r)
+
+        # Then
+        self.assertEqual(result, LCSAnalyser(StringSequencer()).lcs(b, l, r))
+
+    def test_max_distance_exceeded(self):
+        """Tests LCS with a max distance exceeded by the sequences"""
+        # Given strings to compare
+        b = "Hell, this is a bad one !"
+        l = "He called-on me."
+        r = "Hey Bill, cook !"
+
+        # When computing lcs
+        result = LCSAnalyser(StringSequencer(), max_distance=18).lcs(b, l, r)
+
+        # Then
+        self.assertEqual(result, [])
+
+    def test_max_cells(self):
+        """Tests LCS of sequences fitting in the max cells, once their common prefix and suffix are trimmed"""
+        # Given strings to compare
+        b = "prefix bad suffix"
+        l = "prefix cad suffix"
+        r = "prefix bag suffix"
+
+        # When computing lcs
+        result = LCSAnalyser(StringSequencer(), max_cells=64).lcs(b, l, r)
+
+        # Then
+        self.assertEqual(result, LCSAnalyser(StringSequencer()).lcs(b, l, r))
+
+    def test_max_cells_exceeded(self):
+        """Tests LCS of sequences too long for the max cells"""
+        # Given strings to compare
+        b = "prefix bad suffix"
+        l = "prefix cad suffix"
+        r = "prefix bag suffix"
+
+        # When computing lcs
+        result = LCSAnalyser(StringSequencer(), max_cells=63).lcs(b, l, r)
+        patience_result = LCSAnalyser(StringSequencer(), strategy=STRATEGY_PATIENCE, max_cells=1).lcs(b, l, r)
+
+        # Then the whole search is given up, or only the gaps between anchors are left unaligned
+        self.assertEqual(result, [])
+        self.assertEqual(patience_result, [CommonSubSeq("prefix ", 0, 0, 0), CommonSubSeq("a", 8, 8, 8),
+                                           CommonSubSeq(" suffix", 10, 10, 10)])
+
+    @patch('automergetool.amt_lcs.NUMPY_MIN_CELLS', 0)
+    def test_max_distance_exceeded_with_common_items(self):
+        """Tests LCS with a max distance exceeded by sequences sharing all their items in a different order"""
+        # Given strings to compare
+        b = "abcd"
+        l = "dcba"
+        r = "bdca"
+
+        for use_numpy in [False, True]:
+            for memory_limit in [None, 0]:
+                # When computing lcs
+                a = LCSAnalyser(StringSequencer(), memory_limit, use_numpy=use_numpy, max_distance=2)
+                result = a.lcs_with_diff(b, l, r)
+
+                # Then
+                self.assertEqual(result, [DiffSubSeq(b, l, r, 0, 0, 0)])
+
+    def test_numpy_not_imported_for_small_tables(self):
+        """Tests NumPy, which is slow to import, isn't imported for small LCS tables"""
+        # Given
+        script = ("import sys\nfrom automergetool.amt_lcs import *\n"
+                  "LCSAnalyser(StringSequencer()).lcs('abcdefgh', 'abdcefhg', 'bacdefgh')\n"
+                  "print('numpy' in sys.modules)")
+
+        # When computing a small LCS in a fresh interpreter
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        # Then
+        self.assertEqual(output.decode().strip(), "False")
+
     def test_simple_with_diff(self):
         """Tests LCS for 3 simple strings"""
         # Given strings to compare
@@ -179,5 +502,68 @@ class LCSTest(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class LCSScalingTest(unittest.TestCase):
+    def test_single_long_run(self):
+        """Tests a long common run between differing items is found as a single sub-sequence"""
+        # Given lists differing at both ends, so that the run isn't trimmed as a common prefix or suffix
+        run = [str(i) for i in range(200)]
+        b = ["b"] + run + ["b"]
+        l = ["l"] + run + ["l"]
+        r = ["r"] + run + ["r"]
+
+        # When computing lcs
+        result = LCSAnalyser(ListSequencer()).lcs(b, l, r)
+
+        # Then
+        self.assertEqual(len(result), 1)
+        self.assertEqual((result[0].pos_b, result[0].pos_l, result[0].pos_r, result[0].length), (1, 1, 1, len(run)))
+        self.assertEqual(result[0].content, run)
+
+
+class CommonSubSeqTest(unittest.TestCase):
+    def test_equal_by_position(self):
+        """Tests sub-sequences read from a source are compared without reading their content"""
+        # Given sub-sequences with a lazy content
+        read = []
+        source = lambda pos, length: read.append(pos) or "abc"[pos:pos + length]
+        first = CommonSubSeq(None, 0, 1, 2, 2, source)
+
+        # Then
+        self.assertEqual(first, CommonSubSeq(None, 0, 1, 2, 2, source))
+        self.assertNotEqual(first, CommonSubSeq(None, 0, 1, 2, 1, source))
+        self.assertNotEqual(first, CommonSubSeq(None, 1, 1, 2, 2, source))
+        self.assertEqual(read, [])
+        self.assertEqual(first, CommonSubSeq("ab", 0, 1, 2))
+        self.assertNotEqual(first, CommonSubSeq("ac", 0, 1, 2))
+        self.assertEqual(read, [0])
+
+
+class TokenizerTest(unittest.TestCase):
+    def test_tokenize(self):
+        """Tests equal items share the same token across sequences"""
+        # Given a tokenizer
+        t = Tokenizer(ListSequencer())
+
+        # When tokenizing
+        tokens_b = t.tokenize(["foo\n", "bar\n", "foo\n"])
+        tokens_l = t.tokenize(["bar\n", "baz\n"])
+
+        # Then
+        self.assertEqual(tokens_b, [0, 1, 0])
+        self.assertEqual(tokens_l, [1, 2])
+        self.assertEqual(t.representatives, ["foo\n", "bar\n", "baz\n"])
+
+    def test_tokenize_custom_comparator(self):
+        """Tests items equal with a custom comparator share the same token"""
+        # Given a tokenizer
+        t = Tokenizer(StringSequencerLower())
+
+        # When tokenizing
+        tokens = t.tokenize("aAbBa")
+
+        # Then
+        self.assertEqual(tokens, [0, 0, 1, 1, 0])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
+import marshal
+import subprocess
 import unittest
+from argparse import Namespace
 from configparser import ConfigParser
 from unittest.mock import *
 
 import tempfile
+import time
 
 from automergetool.amt import *
+from automergetool.amt_launcher import ToolsLauncher, PlannedTool, OPT_CMD, OPT_EXTENSIONS, OPT_IGNORED_EXTENSIONS, \
+    OPT_INTERACTIVE, OPT_TRUST_EXIT_CODE
 from automergetool.amt_utils import *
 
 FAKE_TOOL = 'blu'
@@ -52,8 +59,9 @@ class AMTTest(unittest.TestCase):
         cfg.add_section(SECT_AMT)
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
-        launcher_args = {'get_tool_extensions.return_value': 'bacon;spam'}
-        launcher = Mock(**launcher_args)
+        cfg.add_section(FAKE_TOOL_SECTION)
+        cfg.set(FAKE_TOOL_SECTION, OPT_EXTENSIONS, 'bacon;spam')
+        launcher = ToolsLauncher(cfg)
         analyser = Mock()
 
         # When
@@ -69,11 +77,9 @@ class AMTTest(unittest.TestCase):
         cfg.add_section(SECT_AMT)
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
-        launcher_args = {
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': 'bacon;spam;ext'
-        }
-        launcher = Mock(**launcher_args)
+        cfg.add_section(FAKE_TOOL_SECTION)
+        cfg.set(FAKE_TOOL_SECTION, OPT_IGNORED_EXTENSIONS, 'bacon;spam;ext')
+        launcher = ToolsLauncher(cfg)
         analyser = Mock()
 
         # When
@@ -89,12 +95,9 @@ class AMTTest(unittest.TestCase):
         cfg.add_section(SECT_AMT)
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
-        launcher_args = {
-            'get_tool_extensions.return_value': 'bacon;ext;spam',
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.return_value': None
-        }
-        launcher = Mock(**launcher_args)
+        cfg.add_section(FAKE_TOOL_SECTION)
+        cfg.set(FAKE_TOOL_SECTION, OPT_EXTENSIONS, 'bacon;ext;spam')
+        launcher = ToolsLauncher(cfg)
         analyser = Mock()
 
         # When
@@ -112,10 +115,7 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
         launcher_args = {
-            'get_tool_trust.return_value': True,
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.return_value': 'MY_CMD $MERGED',
+            'plan_tool.return_value': PlannedTool(tool, 'MY_CMD $MERGED', True),
             'invoke.return_value': 0
         }
         launcher = Mock(**launcher_args)
@@ -137,10 +137,7 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
         launcher_args = {
-            'get_tool_trust.return_value': True,
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.return_value': 'MY_CMD $MERGED',
+            'plan_tool.return_value': PlannedTool(tool, 'MY_CMD $MERGED', True),
             'invoke.return_value': 6
         }
         launcher = Mock(**launcher_args)
@@ -161,10 +158,7 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
         launcher_args = {
-            'get_tool_trust.return_value': False,
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.return_value': 'MY_CMD $MERGED',
+            'plan_tool.return_value': PlannedTool(tool, 'MY_CMD $MERGED', False),
             'invoke.return_value': 0
         }
         launcher = Mock(**launcher_args)
@@ -186,10 +180,7 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
         launcher_args = {
-            'get_tool_trust.return_value': False,
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.return_value': 'MY_CMD $MERGED',
+            'plan_tool.return_value': PlannedTool(tool, 'MY_CMD $MERGED', False),
             'invoke.return_value': 0
         }
         launcher = Mock(**launcher_args)
@@ -212,11 +203,8 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
         args = create_args()
         launcher_args = {
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.return_value': 'MY_CMD $MERGED',
-            'invoke.side_effect': Exception("Oops"),
-            'get_tool_trust.return_value': True
+            'plan_tool.return_value': PlannedTool(tool, 'MY_CMD $MERGED', True),
+            'invoke.side_effect': Exception("Oops")
         }
         launcher = Mock(**launcher_args)
         analyser_args = {'has_remaining_conflicts.return_value': True}
@@ -236,11 +224,11 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_TOOLS, 'foo;bar;baz')
         args = create_args()
         launcher_args = {
-            'get_tool_trust.return_value': True,
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.side_effect':
-            ['MY_CMD1 $MERGED', 'MY_CMD2 --out $MERGED', 'MY_CMD3 $BASE $MERGED'],
+            'get_plan.return_value': [
+                PlannedTool('foo', 'MY_CMD1 $MERGED', True),
+                PlannedTool('bar', 'MY_CMD2 --out $MERGED', True),
+                PlannedTool('baz', 'MY_CMD3 $BASE $MERGED', True)
+            ],
             'invoke.return_value': 1
         }
         launcher = Mock(**launcher_args)
@@ -264,11 +252,11 @@ class AMTTest(unittest.TestCase):
         cfg.set(SECT_AMT, OPT_TOOLS, 'foo;bar;baz')
         args = create_args()
         launcher_args = {
-            'get_tool_trust.return_value': True,
-            'get_tool_extensions.return_value': None,
-            'get_tool_ignored_extensions.return_value': None,
-            'get_tool_cmd.side_effect':
-                ['MY_CMD1 $MERGED', 'MY_CMD2 --out $MERGED', 'MY_CMD3 $BASE $MERGED'],
+            'get_plan.return_value': [
+                PlannedTool('foo', 'MY_CMD1 $MERGED', True),
+                PlannedTool('bar', 'MY_CMD2 --out $MERGED', True),
+                PlannedTool('baz', 'MY_CMD3 $BASE $MERGED', True)
+            ],
             'invoke.return_value': 0
         }
         launcher = Mock(**launcher_args)
@@ -287,7 +275,7 @@ class AMTTest(unittest.TestCase):
         cfg.add_section(SECT_AMT)
         cfg.set(SECT_AMT, OPT_TOOLS, '')
         args = create_args()
-        launcher = Mock()
+        launcher = ToolsLauncher(cfg)
         analyser = Mock()
 
         # When
@@ -312,6 +300,70 @@ class AMTTest(unittest.TestCase):
         # Then
         launcher.assert_not_called()
 
+    def test_race_length(self):
+        # Given
+        plan = [
+            PlannedTool('foo', 'MY_CMD1 $MERGED', True, interactive=False),
+            PlannedTool('bar', 'MY_CMD2 $MERGED', True, skip_reason="bad extension : ext"),
+            PlannedTool('baz', 'MY_CMD3 $MERGED', True, interactive=False),
+            PlannedTool('qux', 'MY_CMD4 $MERGED', True),
+            PlannedTool('quux', 'MY_CMD5 $MERGED', True, interactive=False)
+        ]
+
+        # Then
+        self.assertEqual(race_length(plan, 0), 0)
+        self.assertEqual(race_length(plan, 1), 0)
+        self.assertEqual(race_length(plan, 2), 3)
+        self.assertEqual(race_length(plan, 5), 3)
+        self.assertEqual(race_length(plan[2:], 5), 0)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_merge_race(self, stdout):
+        with tempfile.TemporaryDirectory() as directory:
+            # Given tools racing on the merged file : a failing one, a successful one and a slow one
+            cfg = ConfigParser()
+            cfg.optionxform = str
+            cfg.add_section(SECT_AMT)
+            cfg.set(SECT_AMT, OPT_TOOLS, 'failing;solving;slow;last')
+            cfg.set(SECT_AMT, OPT_RACE_TOOLS, '3')
+            cfg.set(SECT_AMT, OPT_VERBOSE, 'true')
+            scripts = {
+                'failing': "import sys, time\ntime.sleep(0.5)\n"
+                           "open(sys.argv[1], 'w').write('failing\\n')\nsys.exit(1)\n",
+                'solving': "import sys\nopen(sys.argv[1], 'w').write('solving\\n')\n",
+                'slow': "import sys, time\ntime.sleep(60)\nopen(sys.argv[1], 'w').write('slow\\n')\n",
+                'last': "import sys\nopen(sys.argv[1], 'w').write('last\\n')\n"
+            }
+            for (tool, script) in scripts.items():
+                script_path = os.path.join(directory, tool + ".py")
+                with open(script_path, 'w') as script_file:
+                    script_file.write(script)
+                section = ToolsLauncher.tool_section_name(tool)
+                cfg.add_section(section)
+                cfg.set(section, OPT_CMD, '"{0}" "{1}" $MERGED'.format(sys.executable, script_path))
+                cfg.set(section, OPT_TRUST_EXIT_CODE, 'true')
+                cfg.set(section, OPT_INTERACTIVE, 'false')
+            args = Namespace(base="base.txt", local="local.txt", remote="remote.txt",
+                             merged=os.path.join(directory, "merged.txt"))
+            with open(args.merged, 'w') as merged:
+                merged.write("<<<<<<<\nfoo\n=======\nbar\n>>>>>>>\n")
+
+            # When
+            start = time.time()
+            result = merge(cfg, args, ToolsLauncher(cfg), Mock())
+
+            # Then
+            self.assertEqual(result, SUCCESS)
+            self.assertLess(time.time() - start, 30)
+            with open(args.merged) as merged:
+                self.assertEqual(merged.read(), "solving\n")
+            self.assertEqual(sorted(os.listdir(directory)), ["failing.py", "last.py", "merged.txt", "slow.py",
+                                                             "solving.py"])
+            self.assertIn(" [AMT] ⇉ Racing tools failing, solving, slow\n"
+                          " [AMT] ✗ failing didn't solve all conflicts\n"
+                          " [AMT] ✓ solving merged successfully\n"
+                          " [AMT] — Stopped slow\n", stdout.getvalue())
+
     def test_find_local_config_not_a_git_folder(self):
         # Given
         path = '/foo/bar/spam'
@@ -365,6 +417,101 @@ class AMTTest(unittest.TestCase):
         # Then
         self.assertEqual(config, None)
 
+    def test_load_config_snapshot(self):
+        # Given a repository configuration
+        with tempfile.TemporaryDirectory() as parent:
+            global_config = os.path.join(parent, "gitconfig")
+            open(global_config, 'w').close()
+            os.mkdir(os.path.join(parent, ".git"))
+            local_config = os.path.join(parent, ".git", "config")
+            with open(local_config, 'w') as config_file:
+                config_file.write('[amt]\n    tools = gen_woven;meld\n[mergetool "meld"]\n    extensions = txt\n')
+
+            with patch('automergetool.amt.GLOBAL_CONFIG', global_config):
+                # When loading it twice
+                config, launcher = load_config(local_config)
+                with patch('automergetool.amt.read_config', side_effect=AssertionError("config read again")):
+                    snapshot_config, snapshot_launcher = load_config(local_config)
+
+                # Then check the second time comes from the snapshot
+                self.assertTrue(os.path.exists(os.path.join(parent, ".git", CONFIG_SNAPSHOT_PATH)))
+                self.assertEqual(snapshot_config.get(SECT_AMT, OPT_TOOLS), 'gen_woven;meld')
+                self.assertEqual(sorted(snapshot_launcher.settings.keys()), ['gen_woven', 'meld'])
+                self.assertEqual(snapshot_launcher.get_tool_extensions('meld'), ['txt'])
+                self.assertEqual(snapshot_launcher.get_tool_cmd('gen_woven'), launcher.get_tool_cmd('gen_woven'))
+                self.assertTrue(snapshot_launcher.get_tool_trust('gen_woven'))
+
+    def test_load_config_upgraded(self):
+        # Given a repository configuration already loaded
+        with tempfile.TemporaryDirectory() as parent:
+            global_config = os.path.join(parent, "gitconfig")
+            open(global_config, 'w').close()
+            os.mkdir(os.path.join(parent, ".git"))
+            local_config = os.path.join(parent, ".git", "config")
+            with open(local_config, 'w') as config_file:
+                config_file.write('[amt]\n    tools = meld\n')
+            launcher_source = os.path.join(parent, "amt_launcher.py")
+            with open(launcher_source, 'w') as source:
+                source.write("KNOWN_TRUSTS = {'meld': False}\n")
+
+            with patch('automergetool.amt.GLOBAL_CONFIG', global_config), \
+                    patch('automergetool.amt.LAUNCHER_SOURCE', launcher_source):
+                load_config(local_config)
+
+                # When AMT is upgraded with other known settings
+                with open(launcher_source, 'w') as source:
+                    source.write("KNOWN_TRUSTS = {'meld': True}\n")
+                with patch.dict('automergetool.amt_launcher.KNOWN_TRUSTS', {'meld': True}):
+                    config, launcher = load_config(local_config)
+
+                # Then
+                self.assertTrue(launcher.get_tool_trust('meld'))
+
+    def test_load_config_snapshot_content(self):
+        # Given a repository configuration with other sections
+        with tempfile.TemporaryDirectory() as parent:
+            global_config = os.path.join(parent, "gitconfig")
+            with open(global_config, 'w') as config_file:
+                config_file.write('[user]\n    email = foo@bar.com\n[credential]\n    helper = store\n')
+            os.mkdir(os.path.join(parent, ".git"))
+            local_config = os.path.join(parent, ".git", "config")
+            with open(local_config, 'w') as config_file:
+                config_file.write('[amt]\n    tools = meld\n[mergetool "meld"]\n    extensions = txt\n')
+
+            # When
+            with patch('automergetool.amt.GLOBAL_CONFIG', global_config):
+                load_config(local_config)
+
+            # Then
+            snapshot_path = os.path.join(parent, ".git", CONFIG_SNAPSHOT_PATH)
+            with open(snapshot_path, 'rb') as snapshot_file:
+                snapshot = marshal.load(snapshot_file)
+            self.assertEqual(sorted(snapshot['config'].keys()), ['amt', 'mergetool "meld"'])
+            self.assertEqual(os.stat(snapshot_path).st_mode & 0o777, 0o600)
+
+    def test_load_config_changed(self):
+        # Given a repository configuration already loaded
+        with tempfile.TemporaryDirectory() as parent:
+            global_config = os.path.join(parent, "gitconfig")
+            open(global_config, 'w').close()
+            os.mkdir(os.path.join(parent, ".git"))
+            local_config = os.path.join(parent, ".git", "config")
+            with open(local_config, 'w') as config_file:
+                config_file.write('[amt]\n    tools = gen_woven\n')
+
+            with patch('automergetool.amt.GLOBAL_CONFIG', global_config):
+                load_config(local_config)
+
+                # When the configuration changes
+                with open(local_config, 'w') as config_file:
+                    config_file.write('[amt]\n    tools = gen_additions\n')
+                os.utime(local_config, (0, 0))
+                config, launcher = load_config(local_config)
+
+                # Then
+                self.assertEqual(config.get(SECT_AMT, OPT_TOOLS), 'gen_additions')
+                self.assertEqual(list(launcher.settings.keys()), ['gen_additions'])
+
     # noinspection PyUnresolvedReferences
     def test_path_arguments_shorts(self):
         # Given
@@ -382,6 +529,15 @@ class AMTTest(unittest.TestCase):
         self.assertEqual(parsed.remote, base_path + os.sep + r)
         self.assertEqual(parsed.merged, base_path + os.sep + m)
 
+    # noinspection PyUnresolvedReferences
+    def test_subprocess_argument(self):
+        # When
+        parsed = parse_arguments(['-b', 'b', '-m', 'm', '-l', 'l', '-r', 'r', '--subprocess'])
+        default = parse_arguments(['-b', 'b', '-m', 'm', '-l', 'l', '-r', 'r'])
+
+        self.assertTrue(parsed.subprocess)
+        self.assertFalse(default.subprocess)
+
     # noinspection PyUnresolvedReferences
     def test_path_arguments_long(self):
         # Given
@@ -399,6 +555,22 @@ class AMTTest(unittest.TestCase):
         self.assertEqual(parsed.remote, base_path + os.sep + r)
         self.assertEqual(parsed.merged, base_path + os.sep + m)
 
+    def test_merge_arguments(self):
+        # Given
+        args = ['-b', 'b', '--merged', 'm', '-l', 'l', '--remote', 'r']
+
+        # When
+        parsed = parse_merge_arguments(args)
+
+        # Then
+        self.assertEqual(vars(parsed), vars(parse_arguments(args)))
+
+    def test_merge_arguments_other_invocations(self):
+        self.assertIsNone(parse_merge_arguments(['-b', 'b', '-m', 'm', '-l', 'l', '-r', 'r', '--subprocess']))
+        self.assertIsNone(parse_merge_arguments(['-b', 'b', '-m', 'm', '-l', 'l', '-l', 'r']))
+        self.assertIsNone(parse_merge_arguments(['-b', 'b', '-m', 'm', '-l', 'l', 'r', '-r']))
+        self.assertIsNone(parse_merge_arguments(['--all']))
+
     def test_missing_arguments(self):
         b = "b"
         l = "l"
@@ -408,6 +580,39 @@ class AMTTest(unittest.TestCase):
         with self.assertRaises(SystemExit) as context:
             parse_arguments(['--base', b, '--merged', m, '--remote', r])
 
+    def test_all_argument(self):
+        parsed = parse_arguments(['--all'])
+
+        self.assertTrue(parsed.all)
+        self.assertIsNone(parsed.merged)
+
+    def test_all_argument_default(self):
+        parsed = parse_arguments(['-b', 'b', '-m', 'm', '-l', 'l', '-r', 'r'])
+
+        self.assertFalse(parsed.all)
+
+    def test_jobs_argument(self):
+        parsed = parse_arguments(['--all', '--jobs', '4'])
+        default = parse_arguments(['--all'])
+
+        self.assertEqual(parsed.jobs, 4)
+        self.assertEqual(default.jobs, 1)
+
+    def test_negative_jobs_argument(self):
+        with self.assertRaises(SystemExit) as context:
+            parse_arguments(['--all', '-j', '-2'])
+
+    def test_daemon_argument(self):
+        parsed = parse_arguments(['--daemon', '--idle-timeout', '30'])
+
+        self.assertTrue(parsed.daemon)
+        self.assertEqual(parsed.idle_timeout, 30)
+        self.assertIsNone(parsed.merged)
+
+    def test_missing_arguments_without_all(self):
+        with self.assertRaises(SystemExit) as context:
+            parse_arguments([])
+
     def test_unknown_argument(self):
         b = "b"
         l = "l"
@@ -418,6 +623,114 @@ class AMTTest(unittest.TestCase):
             parse_arguments(
                 ['--base', b, '--merged', m, '--local', l, '--remote', r, '--kamoulox', '-p'])
 
+    def test_census_arguments(self):
+        parsed = parse_census_arguments(['a.txt', 'b.txt'])
+
+        self.assertEqual(parsed.files, ['a.txt', 'b.txt'])
+
+    def test_census_missing_arguments(self):
+        with self.assertRaises(SystemExit) as context:
+            parse_census_arguments([])
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_census(self, stdout):
+        # Given
+        files = ['tests/data/analyser/no_conflicts.txt', 'tests/data/analyser/three_conflicts.txt']
+
+        # When
+        result = census(files, ConflictedFileAnalyser())
+
+        # Then
+        self.assertEqual(result, ERROR_CONFLICTS)
+        self.assertEqual(stdout.getvalue(), "tests/data/analyser/no_conflicts.txt : 0 conflict(s), 0 bytes\n"
+                         "tests/data/analyser/three_conflicts.txt : 3 conflict(s), 1904 bytes\n"
+                         "    lines 10-16 (local: 2, base: 0, remote: 1, 335 bytes)\n"
+                         "    lines 18-27 (local: 2, base: 2, remote: 2, 645 bytes)\n"
+                         "    lines 32-42 (local: 2, base: 3, remote: 2, 924 bytes)\n")
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_census_without_conflicts(self, stdout):
+        # Given
+        files = ['tests/data/analyser/no_conflicts.txt']
+
+        # When
+        result = census(files, ConflictedFileAnalyser())
+
+        # Then
+        self.assertEqual(result, SUCCESS)
+
+
+class AMTInProcessTest(unittest.TestCase):
+    CONFLICT = "x\n<<<<<<< LOCAL\nA\nb\nc\n|||||||\na\nb\nc\n=======\na\nb\nC\n>>>>>>> REMOTE\ny\n"
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.merged = os.path.join(self.directory.name, "merged.txt")
+        with open(self.merged, 'w') as f:
+            f.write(AMTInProcessTest.CONFLICT)
+        self.cfg = ConfigParser()
+        self.cfg.add_section(SECT_AMT)
+        self.cfg.set(SECT_AMT, OPT_TOOLS, 'gen_simplify;gen_woven')
+        self.args = parse_arguments(['-b', 'b', '-l', 'l', '-r', 'r', '-m', self.merged])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @patch('subprocess.call')
+    def test_merge_in_process(self, subprocess_call):
+        # When
+        result = merge(self.cfg, self.args, ToolsLauncher(self.cfg), ConflictedFileAnalyser())
+
+        # Then
+        self.assertEqual(result, SUCCESS)
+        subprocess_call.assert_not_called()
+        with open(self.merged) as f:
+            self.assertEqual(f.read(), "x\nA\nb\nC\ny\n")
+        self.assertEqual(os.listdir(self.directory.name), ["merged.txt"])
+
+    @patch('subprocess.call')
+    def test_merge_in_process_unsolved(self, subprocess_call):
+        # Given
+        self.cfg.set(SECT_AMT, OPT_TOOLS, 'gen_simplify;gen_deletions')
+
+        # When
+        result = merge(self.cfg, self.args, ToolsLauncher(self.cfg), ConflictedFileAnalyser())
+
+        # Then the conflict is written simplified
+        self.assertEqual(result, ERROR_CONFLICTS)
+        subprocess_call.assert_not_called()
+        with open(self.merged) as f:
+            self.assertEqual(f.read(), "x\n<<<<<<< LOCAL\nA\n|||||||\na\n=======\na\n>>>>>>> REMOTE\nb\n"
+                             "<<<<<<< LOCAL\nc\n|||||||\nc\n=======\nC\n>>>>>>> REMOTE\ny\n")
+
+    def test_merge_in_process_unterminated_conflict(self):
+        # Given a file ending inside a conflict
+        unterminated = "a\n<<<<<<< HEAD\nfoo\n||||||| base\nbar\n"
+        with open(self.merged, 'w') as f:
+            f.write(unterminated)
+        self.cfg.set(SECT_AMT, OPT_TOOLS, 'gen_single_line')
+
+        # When
+        in_process = merge(self.cfg, self.args, ToolsLauncher(self.cfg), ConflictedFileAnalyser())
+        with_subprocess = merge(self.cfg, self.args, ToolsLauncher(self.cfg), ConflictedFileAnalyser(), False)
+
+        # Then
+        self.assertEqual(in_process, ERROR_CONFLICTS)
+        self.assertEqual(with_subprocess, ERROR_CONFLICTS)
+        with open(self.merged) as f:
+            self.assertEqual(f.read(), unterminated)
+
+    @patch('subprocess.call', return_value=1)
+    def test_merge_with_subprocess(self, subprocess_call):
+        # When
+        result = merge(self.cfg, self.args, ToolsLauncher(self.cfg), ConflictedFileAnalyser(), in_process=False)
+
+        # Then
+        self.assertEqual(result, ERROR_CONFLICTS)
+        self.assertEqual(subprocess_call.call_count, 2)
+        with open(self.merged) as f:
+            self.assertEqual(f.read(), AMTInProcessTest.CONFLICT)
+
 
 def create_args():
     args = lambda: None
@@ -428,5 +741,35 @@ def create_args():
     return args
 
 
+class AMTStartupTest(unittest.TestCase):
+    def test_heavy_modules_not_imported(self):
+        # Given a conflict solved by the first tool, and the modules only needed once other tools are reached in the
+        # chain (the configuration and the solver's arguments are always parsed, so configparser and argparse are not)
+        heavy_modules = ['automergetool.amt_lcs', 'automergetool.solvers.gen_simplify',
+                         'automergetool.solvers.java_imports', 'concurrent.futures', 'inspect', 'numpy', 'sqlite3']
+        script = ("import sys; from automergetool.amt import run_main; result = run_main(); "
+                  "print(result, ' '.join(m for m in {0} if m in sys.modules))")
+        with tempfile.TemporaryDirectory() as root:
+            os.mkdir(os.path.join(root, ".git"))
+            with open(os.path.join(root, ".gitconfig"), 'w'):
+                pass
+            with open(os.path.join(root, ".git", "config"), 'w') as config:
+                config.write("[amt]\n\ttools = gen_additions\n[mergetool \"gen_additions\"]\n\torder = localfirst\n")
+            merged = os.path.join(root, "file.txt")
+            with open(merged, 'w') as f:
+                f.write("a\n<<<<<<< LOCAL\nfoo\n|||||||\n=======\nbar\n>>>>>>> REMOTE\nb\n")
+            files = ['-b', merged + ".base", '-l', merged + ".local", '-r', merged + ".remote", '-m', merged]
+
+            # When running amt in a fresh interpreter, as git does
+            output = subprocess.check_output([sys.executable, '-c', script.format(heavy_modules)] + files,
+                                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             env=dict(os.environ, HOME=root))
+
+            # Then
+            self.assertEqual(output.decode().strip().splitlines()[-1].strip(), str(SUCCESS))
+            with open(merged) as f:
+                self.assertEqual(f.read(), "a\nfoo\nbar\nb\n")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -222,6 +222,78 @@ class ConflictTest(unittest.TestCase):
         walker.end(False)
         os.remove(walker.merged)
 
+    def test_labelled_conflict(self):
+        """Tests a walker against a file with labels on all the conflict markers"""
+
+        # Given a file to merge
+        file = CW_PATH.format('labelled_conflict')
+        walker = ConflictsWalker(file, 'test', REPORT_NONE, False)
+
+        # When walking the conflicts
+        self.assertTrue(walker.has_more_conflicts())
+        conflict = walker.next_conflict()
+        self.assertFalse(walker.has_more_conflicts())
+        walker.end(False)
+
+        # Then check the conflict and the output
+        self.assertEqual(conflict.marker_local, "<<<<<<< HEAD\n")
+        self.assertEqual(conflict.local, "local line\n")
+        self.assertEqual(conflict.base, "base line\n")
+        self.assertEqual(conflict.remote, "remote line\n")
+        self.assertEqual(conflict.marker_remote, ">>>>>>> feature\n")
+        self.assertEqual(conflict.raw, "<<<<<<< HEAD\nlocal line\n||||||| merged common ancestors\nbase line\n"
+                         "=======\nremote line\n>>>>>>> feature\n")
+        self.assertTrue(filecmp.cmp(walker.merged, file))
+        os.remove(walker.merged)
+
+    def test_unterminated_conflict(self):
+        """Tests a walker against a file ending in the middle of a conflict"""
+
+        # Given a file to merge
+        file = CW_PATH.format('unterminated_conflict')
+        walker = ConflictsWalker(file, 'test', REPORT_NONE, False)
+
+        # When walking the conflicts
+        self.assertFalse(walker.has_more_conflicts())
+        walker.end(False)
+
+        # Then check the output is left untouched
+        self.assertTrue(filecmp.cmp(walker.merged, file))
+        os.remove(walker.merged)
+
+    def test_index_many_conflicts(self):
+        """Tests indexing a text with many conflicts"""
+
+        # Given a text with many conflicts
+        conflict = "<<<<<<<\nlocal\n|||||||\nbase\n=======\nremote\n>>>>>>>\n"
+        text = ("common\n" + conflict) * 5000
+
+        # When indexing the conflicts
+        bounds, error = index_conflicts(text)
+
+        # Then check the conflicts were all found
+        self.assertIsNone(error)
+        self.assertEqual(len(bounds), 5000)
+        last = Conflict.from_text(text, bounds[-1])
+        self.assertEqual(last.raw, conflict)
+        self.assertEqual(last.local_lines(), ["local\n"])
+        self.assertEqual(last.base_lines(), ["base\n"])
+        self.assertEqual(last.remote_lines(), ["remote\n"])
+
+    def test_index_unterminated_conflict(self):
+        """Tests indexing a text ending inside a conflict"""
+
+        # Given a text ending inside a conflict
+        conflict = "<<<<<<<\nlocal\n|||||||\nbase\n=======\nremote\n>>>>>>>\n"
+        text = "a\n" + conflict + "b\n<<<<<<< HEAD\nfoo\n||||||| base\nbar\n"
+
+        # When indexing the conflicts
+        bounds, error = index_conflicts(text)
+
+        # Then check the unterminated conflict is reported
+        self.assertEqual(len(bounds), 1)
+        self.assertEqual(error, (len("a\n" + conflict + "b\n"), UNTERMINATED_CONFLICT))
+
     def test_extract_lines(self):
         """Tests how a conflict extracts lines from blocks"""
 
@@ -237,5 +309,172 @@ class ConflictTest(unittest.TestCase):
         self.assertEqual(conflict.remote_lines(), ["hello world\n"])
 
 
+class ConflictDocumentTest(unittest.TestCase):
+    def test_parse(self):
+        """Tests a document splits the text between plain text and conflicts"""
+
+        # Given a conflicted text
+        text = "foo\n<<<<<<<\nbar\n|||||||\nbaz\n=======\nspam\n>>>>>>>\neggs\n"
+
+        # When creating the document
+        document = ConflictDocument(text)
+
+        # Then
+        self.assertEqual(len(document.parts), 3)
+        self.assertEqual(document.parts[0], "foo\n")
+        self.assertEqual(document.parts[2], "eggs\n")
+        self.assertEqual(len(document.conflicts()), 1)
+        self.assertEqual(document.conflicts()[0].local, "bar\n")
+        self.assertTrue(document.has_conflicts())
+        self.assertEqual(document.text(), text)
+
+    def test_parse_unterminated_conflict(self):
+        """Tests a document ending inside a conflict has conflicts left, without failing its walkers"""
+
+        # Given a text ending inside a conflict
+        text = "a\n<<<<<<< HEAD\nfoo\n||||||| base\nbar\n"
+
+        # When creating the document and walking it
+        document = ConflictDocument(text)
+        walker = ConflictsWalker("merged.txt", document=document)
+        more_conflicts = walker.has_more_conflicts()
+        walker.end()
+
+        # Then
+        self.assertTrue(document.has_conflicts())
+        self.assertFalse(more_conflicts)
+        self.assertEqual(walker.get_merge_status(), ERROR_CONFLICTS)
+        self.assertEqual(document.text(), text)
+
+    def test_commit(self):
+        """Tests committing a document applies resolutions and parses rewritten conflicts"""
+
+        # Given a document with two conflicts
+        conflict = "<<<<<<<\nbar\n|||||||\nbaz\n=======\nspam\n>>>>>>>\n"
+        document = ConflictDocument("foo\n" + conflict + "eggs\n" + conflict)
+
+        # When solving one and rewriting the other
+        document.conflicts()[0].resolve("bacon\n")
+        document.conflicts()[1].rewrite("sausage\n" + conflict)
+        document.commit()
+
+        # Then
+        self.assertEqual(document.text(), "foo\nbacon\neggs\nsausage\n" + conflict)
+        self.assertEqual(len(document.conflicts()), 1)
+        self.assertTrue(document.has_conflicts())
+
+        # When solving the last one
+        document.conflicts()[0].resolve("ham\n")
+        document.commit()
+
+        # Then
+        self.assertEqual(document.text(), "foo\nbacon\neggs\nsausage\nham\n")
+        self.assertFalse(document.has_conflicts())
+
+    def test_rollback(self):
+        """Tests rolling back a document drops the pending resolutions"""
+
+        # Given a document with a resolved conflict
+        text = "<<<<<<<\nbar\n|||||||\nbaz\n=======\nspam\n>>>>>>>\n"
+        document = ConflictDocument(text)
+        document.conflicts()[0].resolve("bacon\n")
+
+        # When
+        document.rollback()
+        document.commit()
+
+        # Then
+        self.assertEqual(document.text(), text)
+        self.assertTrue(document.has_conflicts())
+
+    def test_invalid_conflict(self):
+        """Tests a document with an invalid conflict keeps the text and reports it to walkers"""
+
+        # Given a file to merge
+        file = CW_PATH.format('missing_base')
+        with open(file) as f:
+            text = f.read()
+
+        # When creating the document
+        document = ConflictDocument(text)
+
+        # Then
+        self.assertEqual(document.text(), text)
+        self.assertTrue(document.has_conflicts())
+        walker = ConflictsWalker(file, document=document)
+        with self.assertRaises(RuntimeError):
+            walker.has_more_conflicts()
+
+    def test_walk_in_memory(self):
+        """Tests a walker over an in-memory document leaves the file untouched"""
+
+        # Given a document
+        file = CW_PATH.format('single_conflict')
+        document = ConflictDocument.load(file)
+
+        # When walking the conflicts
+        walker = ConflictsWalker(file, 'test', REPORT_NONE, False, document)
+        self.assertTrue(walker.has_more_conflicts())
+        walker.next_conflict().resolve(RESOLUTION)
+        self.assertFalse(walker.has_more_conflicts())
+        walker.end()
+
+        # Then check the document was updated, but not the file
+        self.assertFalse(os.path.exists(walker.merged))
+        with open(CW_PATH.format('single_conflict_resolved')) as resolved:
+            self.assertEqual(document.text(), resolved.read())
+        self.assertFalse(document.has_conflicts())
+        self.assertEqual(walker.get_merge_status(), SUCCESS)
+
+    def test_walk_with_memo(self):
+        """Tests identical conflicts are only returned once by walkers sharing a memo"""
+
+        # Given two documents sharing a memo
+        file = CW_PATH.format('single_conflict')
+        memo = ResolutionsMemo()
+        with open(file) as conflicted:
+            text = conflicted.read()
+        first = ConflictDocument(text + text, memo)
+        second = ConflictDocument(text, memo)
+
+        # When walking the conflicts
+        walked = 0
+        for document in [first, second]:
+            walker = ConflictsWalker(file, 'test', REPORT_NONE, False, document)
+            while walker.has_more_conflicts():
+                walker.next_conflict().resolve(RESOLUTION)
+                walked += 1
+            walker.end()
+
+        # Then check the duplicated conflicts were resolved from the memo
+        self.assertEqual(walked, 1)
+        self.assertEqual(memo.replayed, 2)
+        with open(CW_PATH.format('single_conflict_resolved')) as resolved:
+            expected = resolved.read()
+        self.assertEqual(first.text(), expected + expected)
+        self.assertEqual(second.text(), expected)
+
+    def test_walk_with_memo_unsolved(self):
+        """Tests an unsolved conflict stays unsolved when met again"""
+
+        # Given a document with a conflict met twice
+        file = CW_PATH.format('single_conflict')
+        memo = ResolutionsMemo()
+        with open(file) as conflicted:
+            text = conflicted.read()
+        document = ConflictDocument(text + text, memo)
+
+        # When walking the conflicts without solving them
+        walker = ConflictsWalker(file, 'test', REPORT_NONE, False, document)
+        self.assertTrue(walker.has_more_conflicts())
+        self.assertFalse(walker.has_more_conflicts())
+        walker.end()
+
+        # Then
+        self.assertEqual(memo.replayed, 1)
+        self.assertEqual(document.text(), text + text)
+        self.assertEqual(walker.get_merge_status(), ERROR_CONFLICTS)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import random
 import string
 import unittest
+from unittest.mock import patch
 
-from automergetool.amt_utils import Conflict
+from automergetool.amt_utils import Conflict, ConflictDocument, ERROR_CONFLICTS
 from automergetool.solvers.gen_simplify import *
 
 
@@ -68,6 +70,73 @@ class SolverTest(unittest.TestCase):
         self.assertEqual(conflict.content, "<<<<<<<\na\n|||||||\na\n=======\n>>>>>>>\n" + "b\n" +
                          "<<<<<<<\n|||||||\nc\n=======\nc\n>>>>>>>\n")
 
+    def test_simplify_with_memory_limit(self):
+        """Test a conflict which can be shrunk, with a bounded memory"""
+        # Given a conflict
+        conflict = fake_conflict("foo\nbar\nspam\nbacon\n", "foo\nbacon\n",
+                                 "foo\nbaz\neggs\nbacon\n")
+
+        # When handling the conflict
+        handle_conflict(conflict, memory=0)
+
+        # Then check the conflict is resolved
+        self.assertFalse(conflict.is_resolved())
+        self.assertEqual(
+            conflict.content,
+            "foo\n" + "<<<<<<<\nbar\nspam\n|||||||\n=======\nbaz\neggs\n>>>>>>>\n" + "bacon\n")
+
+    def test_simplify_out_of_memory(self):
+        """Test a conflict too large to be analysed is left unsolved"""
+        # Given a conflict
+        conflict = fake_conflict("foo\nbar\nspam\nbacon\n", "foo\nbacon\n", "foo\nbaz\neggs\nbacon\n")
+
+        # When handling the conflict without enough memory
+        with patch.object(LCSAnalyser, 'lcs', side_effect=MemoryError("Unable to allocate 12.6 GiB")):
+            handle_conflict(conflict)
+
+        # Then check the conflict is left untouched
+        self.assertFalse(conflict.is_resolved())
+        self.assertFalse(conflict.is_rewritten())
+
+    def test_simplify_with_patience(self):
+        """Test a conflict which can be shrunk, aligned on unique lines"""
+        # Given a conflict
+        conflict = fake_conflict("foo\n}\nbar\n}\n", "foo\n}\n", "}\nfoo\n}\n")
+
+        # When handling the conflict
+        handle_conflict(conflict, strategy=STRATEGY_PATIENCE)
+
+        # Then check the conflict is resolved
+        self.assertFalse(conflict.is_resolved())
+        self.assertEqual(
+            conflict.content,
+            "<<<<<<<\n|||||||\n=======\n}\n>>>>>>>\n" + "foo\n" + "<<<<<<<\n}\nbar\n|||||||\n=======\n>>>>>>>\n" + "}\n")
+
+    def test_simplify_with_max_distance(self):
+        """Test a conflict which could be shrunk, with too many different lines"""
+        # Given a conflict
+        conflict = fake_conflict("foo\nbar\nspam\nbacon\n", "foo\nbacon\n", "foo\nbaz\neggs\nbacon\n")
+
+        # When handling the conflict
+        handle_conflict(conflict, max_distance=1)
+
+        # Then check the conflict is not simplified
+        self.assertFalse(conflict.is_resolved())
+        self.assertFalse(conflict.is_rewritten())
+
+    def test_solve_in_memory(self):
+        """Test solving an in-memory document"""
+        # Given a document
+        document = ConflictDocument("<<<<<<<\nfoo\nbar\n|||||||\nfoo\n=======\nfoo\nbaz\n>>>>>>>\n")
+
+        # When solving it
+        result = solve(['-m', 'merged.txt'], document)
+
+        # Then check the conflict is split
+        self.assertEqual(result, ERROR_CONFLICTS)
+        self.assertEqual(document.text(), "foo\n" + "<<<<<<<\nbar\n|||||||\n=======\nbaz\n>>>>>>>\n")
+        self.assertFalse(os.path.exists('merged.txt.resolving.amt'))
+
     def test_cant_simplify(self):
         """Test a conflict which can be shrunk"""
         # Given a conflict
@@ -80,17 +149,43 @@ class SolverTest(unittest.TestCase):
         self.assertFalse(conflict.is_resolved())
         self.assertFalse(conflict.is_rewritten())
 
-    def test_stack_overflow(self):
-        """Test a conflict which too many lines"""
+    def test_large_conflict(self):
+        """Test a conflict with more lines than the recursion limit allows"""
+        # Given a conflict
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(100)
+        size = 60
+        local = generateLines("l", size) + "common\n" + generateLines("l", size)
+        base = generateLines("b", size) + "common\n" + generateLines("b", size)
+        remote = generateLines("r", size) + "common\n" + generateLines("r", size)
+        conflict = fake_conflict(local, base, remote)
+
+        # When handling the conflict
+        try:
+            handle_conflict(conflict)
+        finally:
+            sys.setrecursionlimit(limit)
+
+        # Then check the conflict is split around the common line
+        half_local = generateLines("l", size)
+        half_base = generateLines("b", size)
+        half_remote = generateLines("r", size)
+        split = "<<<<<<<\n" + half_local + "|||||||\n" + half_base + "=======\n" + half_remote + ">>>>>>>\n"
+        self.assertFalse(conflict.is_resolved())
+        self.assertEqual(conflict.content, split + "common\n" + split)
+
+    @patch('automergetool.amt_lcs.LCSAnalyser._LCSAnalyser__lcs_plane', side_effect=AssertionError("searched"))
+    @patch('automergetool.amt_lcs.LCSAnalyser._LCSAnalyser__lcs_table', side_effect=AssertionError("searched"))
+    def test_oversized_conflict(self, lcs_table, lcs_plane):
+        """Test a conflict too large to be analysed in a reasonable time"""
         # Given a conflict
-        sys.setrecursionlimit(500)
-        size = 100
-        conflict = fake_conflict(generateRandom(size), generateRandom(size), generateRandom(size))
+        size = 200
+        conflict = fake_conflict(generateLines("l", size), generateLines("b", size), generateLines("r", size))
 
         # When handling the conflict
         handle_conflict(conflict)
 
-        # Then check the conflict is not resolved
+        # Then check the conflict is left untouched, without searching its common lines
         self.assertFalse(conflict.is_resolved())
         self.assertFalse(conflict.is_rewritten())
 
@@ -101,8 +196,10 @@ class SolverTest(unittest.TestCase):
         m = "m"
 
         # When
-        parsed = parse_arguments(['-m', m, '-r', r, '-v'])
+        parsed = parse_arguments(['-m', m, '-r', r, '-v', '-s', STRATEGY_PATIENCE, '-d', '3'])
 
+        self.assertEqual(parsed.max_distance, 3)
+        self.assertEqual(parsed.strategy, STRATEGY_PATIENCE)
         self.assertEqual(parsed.report, r)
         self.assertEqual(parsed.merged, m)
         self.assertEqual(parsed.verbose, True)
@@ -131,6 +228,10 @@ class SolverTest(unittest.TestCase):
         self.assertEqual(parsed.report, REPORT_NONE)
         self.assertEqual(parsed.merged, m)
         self.assertEqual(parsed.verbose, False)
+        self.assertEqual(parsed.memory, 64)
+        self.assertEqual(parsed.strategy, STRATEGY_EXACT)
+        self.assertEqual(parsed.max_distance, None)
+        self.assertEqual(parsed.max_cells, DEFAULT_MAX_CELLS)
 
     def test_missing_arguments(self):
         r = REPORT_NONE
@@ -157,6 +258,13 @@ def fake_conflict(local, base, remote):
     return Conflict(local, base, remote, "<<<<<<<\n", ">>>>>>>\n")
 
 
+def generateLines(prefix, lines):
+    result = ""
+    for i in range(0, lines, 1):
+        result += prefix + str(i) + "\n"
+    return result
+
+
 def generateRandom(lines):
     result = ""
     for i in range(0, lines, 1):
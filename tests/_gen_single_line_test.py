@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+from unittest.mock import patch
 
 from automergetool.amt_utils import Conflict
 from automergetool.solvers.gen_single_line import *
@@ -73,6 +74,21 @@ class SolverTest(unittest.TestCase):
         self.assertFalse(conflict.is_resolved())
         self.assertFalse(conflict.is_rewritten())
 
+    @patch('automergetool.amt_lcs.LCSAnalyser._LCSAnalyser__lcs_plane', side_effect=AssertionError("searched"))
+    @patch('automergetool.amt_lcs.LCSAnalyser._LCSAnalyser__lcs_table', side_effect=AssertionError("searched"))
+    def test_cant_solve_long_line(self, lcs_table, lcs_plane):
+        """Test a conflict on a line too long to be analysed in a reasonable time (eg: minified code)"""
+        # Given a conflict
+        size = 1200
+        conflict = fake_conflict("l" * size + "\n", "b" * size + "\n", "r" * size + "\n")
+
+        # When handling the conflict
+        handle_conflict(conflict, prompt_accept)
+
+        # Then check the conflict is left untouched, without searching its common characters
+        self.assertFalse(conflict.is_resolved())
+        self.assertFalse(conflict.is_rewritten())
+
     def test_prompt_accept(self):
         """Test the prompt is done correctly"""
         # Given a conflict and resolution